@@ -0,0 +1,83 @@
+"""
+追问时的连接复用：原实现的默认同步客户端 vs 共享的AsyncOpenAI客户端（utils/ai_handler.py）
+
+模拟服务器为每个新连接增加CONNECT_DELAY（相当于TLS握手），每次追问之间间隔THINK_TIME
+（用户阅读回复的时间，默认超过httpx默认的5秒keep-alive）。统计服务器看到的连接数和追问的平均延迟。
+
+运行方式（项目根目录）:
+    python -m benchmarks.bench_ai_connections [思考时间秒数]
+"""
+import os
+import sys
+import time
+
+from benchmarks.mock_openai_server import MockOpenAIServer
+
+REPLY = "Das Wort bedeutet hier „unverletzlich“."
+CONNECT_DELAY = 0.15
+FOLLOW_UPS = 4
+THINK_TIME = 6.0
+
+
+def run(server, ask, think_time):
+    """依次发送FOLLOW_UPS个问题，返回(新建连接数, 第一个之后的平均延迟ms)"""
+    server.connections.clear()
+    latencies = []
+    for i in range(FOLLOW_UPS):
+        if i:
+            time.sleep(think_time)
+        start = time.perf_counter()
+        ask(f"Frage {i}")
+        latencies.append(time.perf_counter() - start)
+    follow_up_ms = sum(latencies[1:]) / (len(latencies) - 1) * 1000
+    return len(server.connections), follow_up_ms
+
+
+def main():
+    think_time = float(sys.argv[1]) if len(sys.argv) > 1 else THINK_TIME
+
+    server = MockOpenAIServer(REPLY, connect_delay=CONNECT_DELAY).start()
+    os.environ["OPENAI_API_KEY"] = "mock-key"
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+
+    import openai
+
+    from utils.ai_handler import AIHandler
+
+    def messages(prompt):
+        return [{"role": "user", "content": prompt}]
+
+    # 原实现：每个AIHandler一个默认配置的同步客户端
+    sync_client = openai.OpenAI()
+
+    def ask_sync(prompt):
+        sync_client.chat.completions.create(model="mock", messages=messages(prompt))
+
+    # 极端情况：每个请求新建客户端
+    def ask_new_client(prompt):
+        with openai.OpenAI() as client:
+            client.chat.completions.create(model="mock", messages=messages(prompt))
+
+    handler = AIHandler.shared()
+    handler.cache_enabled = False
+
+    def ask_shared(prompt):
+        handler.get_response(prompt)
+
+    print(f"每次追问间隔 {think_time:.1f} 秒，新连接耗时 {CONNECT_DELAY * 1000:.0f} ms")
+    print(f"{'客户端':>20} {'连接数':>6} {'追问平均延迟(ms)':>16}")
+    for name, ask, wait in [
+        ("每次新建客户端", ask_new_client, 0.0),
+        ("默认同步客户端", ask_sync, think_time),
+        ("共享AsyncOpenAI", ask_shared, think_time),
+    ]:
+        connections, follow_up_ms = run(server, ask, wait)
+        print(f"{name:>20} {connections:>6} {follow_up_ms:>16.0f}")
+
+    handler.close()
+    sync_client.close()
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
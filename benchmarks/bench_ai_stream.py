@@ -0,0 +1,54 @@
+"""
+AI回复的首字延迟（TTFT）与总耗时：普通请求 vs 流式请求
+
+使用本地模拟服务器（benchmarks/mock_openai_server.py），不需要网络和真实API密钥。
+
+运行方式（项目根目录）:
+    python -m benchmarks.bench_ai_stream
+"""
+import os
+import time
+
+from benchmarks.mock_openai_server import MockOpenAIServer
+
+REPLY = "**Bedeutung**: Das Wort *unantastbar* bedeutet „不可侵犯的“。\n\n" * 12
+FIRST_TOKEN_DELAY = 0.3
+CHUNK_DELAY = 0.01
+REPEAT = 3
+
+
+def main():
+    server = MockOpenAIServer(REPLY, first_token_delay=FIRST_TOKEN_DELAY, chunk_delay=CHUNK_DELAY).start()
+    os.environ["OPENAI_API_KEY"] = "mock-key"
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+
+    from utils.ai_handler import AIHandler
+    handler = AIHandler()
+    handler.cache_enabled = False  # 每次都要真正请求服务器
+
+    blocking_total = 0.0
+    stream_first = 0.0
+    stream_total = 0.0
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        handler.get_response("Was bedeutet unantastbar?")
+        blocking_total += time.perf_counter() - start
+
+        start = time.perf_counter()
+        first = None
+        for _delta in handler.stream_response("Was bedeutet unantastbar?"):
+            if first is None:
+                first = time.perf_counter() - start
+        stream_first += first
+        stream_total += time.perf_counter() - start
+
+    handler.close()
+    server.stop()
+
+    print(f"{'模式':>8} {'首字(ms)':>10} {'总耗时(ms)':>12}")
+    print(f"{'普通':>8} {blocking_total / REPEAT * 1000:>10.0f} {blocking_total / REPEAT * 1000:>12.0f}")
+    print(f"{'流式':>8} {stream_first / REPEAT * 1000:>10.0f} {stream_total / REPEAT * 1000:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+本地词典查询延迟（utils/dictionary.py + utils/lemmatizer.py）
+
+生成一个合成词典（默认30万个词条，接近dict.cc德语词条数），查询带屈折词尾的单词，
+统计首次查询（不命中内存缓存）和重复查询的延迟。单击单词弹出卡片的目标是5 ms以内。
+
+运行方式（项目根目录）:
+    python -m benchmarks.bench_dictionary [词条数]
+"""
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+from utils.dictionary import Dictionary
+
+REAL_ENTRIES = [
+    ("Haus", "noun", "das", "house", ["Häuser"]),
+    ("Mensch", "noun", "der", "human being", []),
+    ("Lehrerin", "noun", "die", "teacher", []),
+    ("anfangen", "verb", "", "to begin", []),
+    ("fahren", "verb", "", "to drive", []),
+    ("gehen", "verb", "", "to go", []),
+    ("machen", "verb", "", "to make", []),
+    ("groß", "adj", "", "big", []),
+    ("alt", "adj", "", "old", []),
+    ("schön", "adj", "", "beautiful", []),
+]
+QUERIES = [
+    ("Häuser", None), ("Menschen", None), ("Lehrerinnen", None), ("fange", "an"),
+    ("angefangen", None), ("fährt", None), ("gingen", None), ("gemacht", None),
+    ("größer", None), ("ältesten", None), ("schönen", None), ("Unbekanntes", None),
+]
+
+
+def synthetic_entries(count):
+    rng = random.Random(0)
+    yield from REAL_ENTRIES
+    for _ in range(count - len(REAL_ENTRIES)):
+        lemma = "".join(rng.choices(string.ascii_lowercase + "äöü", k=rng.randint(4, 12)))
+        pos = rng.choice(["noun", "verb", "adj"])
+        if pos == "noun":
+            yield lemma.capitalize(), pos, rng.choice(["der", "die", "das"]), "gloss", [lemma.capitalize() + "en"]
+        else:
+            yield lemma + ("en" if pos == "verb" else ""), pos, "", "gloss", []
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dictionary.sqlite")
+        dictionary = Dictionary(path)
+
+        start = time.perf_counter()
+        dictionary.import_entries(synthetic_entries(count))
+        import_s = time.perf_counter() - start
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"导入{count}个词条：{import_s:.1f} s，文件 {size_mb:.1f} MB")
+
+        cold, warm = [], []
+        print(f"{'单词':>12} {'结果':>14} {'首次(ms)':>9}")
+        for word, particle in QUERIES:
+            start = time.perf_counter()
+            entries = dictionary.lookup(word, particle)
+            cold.append((time.perf_counter() - start) * 1000)
+            label = entries[0].headword if entries else "-"
+            print(f"{word:>12} {label:>14} {cold[-1]:>9.3f}")
+
+        for _ in range(100):
+            for word, particle in QUERIES:
+                start = time.perf_counter()
+                dictionary.lookup(word, particle)
+                warm.append((time.perf_counter() - start) * 1000)
+
+        print(f"首次查询：中位数 {percentile(cold, 0.5):.3f} ms，最大 {max(cold):.3f} ms")
+        print(f"重复查询：中位数 {percentile(warm, 0.5):.4f} ms，p99 {percentile(warm, 0.99):.4f} ms")
+        dictionary.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+流式Markdown渲染：每次更新都整段重新转换 vs 增量渲染（utils/markdown_renderer.py）
+
+构造约20KB的AI回复（段落、列表、表格、围栏代码块），按每5个token（约20个字符）
+一段的方式逐步追加，统计两种方式的总耗时，并检查最终HTML是否一致。
+
+运行方式（项目根目录）:
+    python -m benchmarks.bench_markdown
+"""
+import time
+
+import markdown
+
+from utils.markdown_renderer import IncrementalMarkdownRenderer, MARKDOWN_EXTENSIONS
+
+CHUNK_CHARS = 20  # 约5个token
+TARGET_BYTES = 20 * 1024
+
+SECTION = """## Wort: *unantastbar*
+
+Das Adjektiv **unantastbar** bedeutet „不可侵犯的“。Es wird oft in juristischen Texten verwendet, z. B. im Grundgesetz.
+
+1. Wortart: Adjektiv
+2. Bildung: un- + antasten + -bar
+
+   Die Vorsilbe *un-* verneint die Bedeutung.
+
+3. Verwendung: gehoben
+
+| Form | Beispiel |
+|------|----------|
+| Positiv | unantastbar |
+| Prädikativ | Die Würde ist unantastbar. |
+
+```python
+wort = "unantastbar"
+print(wort.upper())
+```
+
+- Synonym: unverletzlich
+- Gegenteil: verletzbar
+
+"""
+
+
+def make_reply():
+    parts = []
+    size = 0
+    while size < TARGET_BYTES:
+        parts.append(SECTION)
+        size += len(SECTION.encode("utf-8"))
+    return "".join(parts)
+
+
+def full_render(md, text):
+    html = md.convert(text)
+    md.reset()
+    return html
+
+
+def main():
+    reply = make_reply()
+    prefixes = [reply[:end] for end in range(CHUNK_CHARS, len(reply), CHUNK_CHARS)] + [reply]
+
+    md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    start = time.perf_counter()
+    for text in prefixes:
+        full_html = full_render(md, text)
+    full_ms = (time.perf_counter() - start) * 1000
+
+    renderer = IncrementalMarkdownRenderer()
+    start = time.perf_counter()
+    for text in prefixes:
+        incremental_html = renderer.render(text)
+    incremental_ms = (time.perf_counter() - start) * 1000
+
+    print(f"回复大小: {len(reply.encode('utf-8')) / 1024:.1f} KB, 更新次数: {len(prefixes)}")
+    print(f"整段重新转换: {full_ms:>8.0f} ms")
+    print(f"增量渲染:     {incremental_ms:>8.0f} ms  ({full_ms / incremental_ms:.1f}x)")
+    print(f"最终HTML一致: {full_html == incremental_html}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+OCR后端冷启动/热启动单张图像耗时对比（pytesseract vs tesserocr）
+
+冷启动：新建后端后的第一次识别（tesserocr包含加载语言模型的时间）
+热启动：同一后端后续识别的平均耗时
+
+运行方式（项目根目录，需要已安装Tesseract及德语语言包，tesserocr可选）:
+    python -m benchmarks.bench_ocr_backends
+"""
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from utils.ocr_handler import OCRHandler, PytesseractBackend, TesserocrBackend, DEFAULT_STRATEGIES
+
+REPEAT = 5
+TEXT = [
+    "Die Würde des Menschen ist unantastbar.",
+    "Sie zu achten und zu schützen ist Verpflichtung",
+    "aller staatlichen Gewalt.",
+]
+
+
+def make_image():
+    image = Image.new("L", (900, 160), 255)
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 28)
+    except OSError:
+        font = ImageFont.load_default()
+    for i, line in enumerate(TEXT):
+        draw.text((20, 15 + i * 45), line, fill=0, font=font)
+    return image
+
+
+def bench(backend_class, lang, image, strategy):
+    start = time.perf_counter()
+    backend = backend_class(lang)
+    backend.image_to_data(image, strategy)
+    cold_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        backend.image_to_data(image, strategy)
+    warm_ms = (time.perf_counter() - start) / REPEAT * 1000
+
+    backend.close()
+    return cold_ms, warm_ms
+
+
+def main():
+    lang = OCRHandler(backend="pytesseract").lang
+    image = make_image()
+    strategy = DEFAULT_STRATEGIES[0]
+
+    print(f"{'后端':>12} {'冷启动(ms)':>12} {'热启动(ms)':>12}")
+    for backend_class in (PytesseractBackend, TesserocrBackend):
+        try:
+            cold_ms, warm_ms = bench(backend_class, lang, image, strategy)
+        except Exception as e:
+            print(f"{backend_class.name:>12} 不可用：{e}")
+            continue
+        print(f"{backend_class.name:>12} {cold_ms:>12.1f} {warm_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+大截图分块识别：第一段可点击的时间和总耗时（utils/layout.py + OCRHandler.recognize_tiles）
+
+用PIL生成一张报纸式的页面（跨栏标题 + 两栏正文），分别整张识别和分块并行识别，
+统计第一次显示文本的时间（整张识别时就是总耗时）和总耗时。没有安装Tesseract时只统计版面分析的耗时。
+
+运行方式（项目根目录）:
+    python -m benchmarks.bench_ocr_tiles
+"""
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from benchmarks.fixtures import load_font
+from utils.layout import analyze
+from utils.ocr_handler import OCRHandler
+
+SENTENCE = "Die Würde des Menschen ist unantastbar. Sie zu achten und zu schützen"
+
+
+def newspaper_page(width=1600, height=2200):
+    """跨栏标题和两栏正文，每段6行"""
+    title, body = load_font("DejaVuSans.ttf", 44), load_font("DejaVuSans.ttf", 20)
+    page = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(page)
+    draw.text((40, 30), "Grundgesetz für die Bundesrepublik Deutschland", font=title, fill="black")
+    column_width = (width - 120) // 2
+    for x in (40, 80 + column_width):
+        y = 130
+        paragraph = 0
+        while y < height - 200:
+            for line in range(6):
+                draw.text((x, y), f"{paragraph}.{line} {SENTENCE}", font=body, fill="black")
+                y += 30
+            y += 26
+            paragraph += 1
+    return page
+
+
+def main():
+    page = newspaper_page()
+    gray = np.asarray(page.convert("L"))
+    handler = OCRHandler()
+
+    start = time.perf_counter()
+    tiles = analyze(gray, handler.tile_max_lines)
+    layout_ms = (time.perf_counter() - start) * 1000
+    print(f"版面分析：{page.width}x{page.height}，{len(tiles)}个图块，{layout_ms:.1f} ms")
+
+    if not handler.tesseract_installed:
+        print("未安装Tesseract，跳过识别耗时")
+        return
+
+    print(f"{'方式':>8} {'首次显示(ms)':>12} {'总耗时(ms)':>10} {'单词数':>6}")
+    for name, tiling in (("整张", False), ("分块", True)):
+        handler.tiling = tiling
+        handler.cache.clear()
+        first = []
+        start = time.perf_counter()
+        result = handler.recognize(page, partial=lambda text: first.append(time.perf_counter() - start))
+        total_ms = (time.perf_counter() - start) * 1000
+        first_ms = first[0] * 1000 if first else total_ms
+        print(f"{name:>8} {first_ms:>12.0f} {total_ms:>10.0f} {len(result.words):>6}")
+    handler.shutdown()
+
+
+if __name__ == "__main__":
+    main()
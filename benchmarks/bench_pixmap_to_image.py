@@ -0,0 +1,55 @@
+"""
+QPixmap -> PIL Image 转换耗时对比（内存缓冲区 vs 临时PNG文件）
+
+运行方式（项目根目录）:
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.bench_pixmap_to_image
+"""
+import time
+
+from PySide6.QtWidgets import QApplication
+from PySide6.QtGui import QPixmap, QPainter, QColor, QFont
+from PySide6.QtCore import Qt
+
+from utils.ocr_handler import OCRHandler
+
+SIZES = [(1280, 720), (1920, 1080), (3840, 2160)]
+REPEAT = 10
+
+
+def make_pixmap(width, height):
+    """生成带文字的测试截图，避免纯色图像让PNG编码过于轻松"""
+    pixmap = QPixmap(width, height)
+    pixmap.fill(Qt.white)
+    painter = QPainter(pixmap)
+    painter.setFont(QFont("Arial", 18))
+    painter.setPen(QColor(20, 20, 20))
+    line = "Die Würde des Menschen ist unantastbar. Sie zu achten und zu schützen ist Verpflichtung aller staatlichen Gewalt."
+    for y in range(30, height, 32):
+        painter.drawText(10, y, line)
+    painter.end()
+    return pixmap
+
+
+def measure(func, pixmap):
+    func(pixmap)  # 预热
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        func(pixmap)
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main():
+    app = QApplication.instance() or QApplication([])
+    handler = OCRHandler()
+
+    print(f"{'尺寸':>12} {'临时文件(ms)':>14} {'内存缓冲(ms)':>14} {'加速比':>8}")
+    for width, height in SIZES:
+        pixmap = make_pixmap(width, height)
+        file_ms = measure(handler._pixmap_to_image_file, pixmap)
+        buffer_ms = measure(handler._pixmap_to_image_buffer, pixmap)
+        size = f"{width}x{height}"
+        print(f"{size:>12} {file_ms:>14.2f} {buffer_ms:>14.2f} {file_ms / buffer_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+图像预处理耗时与内存对比：原PIL链（灰度 + ImageEnhance.Contrast + SHARPEN）vs NumPy流水线
+
+每种方法在独立子进程中运行，输出：
+- 平均耗时
+- 峰值内存：处理前后ru_maxrss的增量（包括流水线常驻复用的缓冲区）
+- 每次调用的内存分配（预热之后）：PIL新建的图像数、NumPy分配的峰值，
+  以及新分配内存的总字节数（PIL图像、NumPy数组和临时的bytes对象都计算在内）
+
+新分配内存的总量用缺页次数统计：子进程固定mmap阈值（大块内存总是单独mmap、释放时归还系统）
+并关闭透明大页，每次调用中首次写入的每一页都计一次缺页，复用的缓冲区不计。
+
+运行方式（项目根目录，仅支持Linux/macOS；新分配内存总量只在Linux上准确）:
+    python -m benchmarks.bench_preprocess
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+SIZES = [(1920, 1080), (3840, 2160)]
+METHODS = ["pil", "default", "binary", "document", "small_text"]
+REPEAT = 5
+
+
+def make_image(width, height):
+    from PIL import Image, ImageDraw, ImageFont
+
+    image = Image.new("RGB", (width, height), (245, 242, 235))
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 18)
+    except OSError:
+        font = ImageFont.load_default()
+    line = "Die Würde des Menschen ist unantastbar. Sie zu achten und zu schützen ist Verpflichtung."
+    for y in range(10, height, 28):
+        draw.text((10, y), line, fill=(30, 30, 30), font=font)
+    return image
+
+
+def pil_chain(image):
+    """原OCRHandler.preprocess_image的实现"""
+    from PIL import ImageEnhance, ImageFilter
+
+    gray_image = image.convert("L")
+    gray_image = ImageEnhance.Contrast(gray_image).enhance(2.0)
+    return gray_image.filter(ImageFilter.SHARPEN)
+
+
+def run_child(method, width, height):
+    """子进程：处理REPEAT次，输出平均耗时、峰值内存增量和单次调用的内存分配"""
+    import mmap
+    import resource
+    import tracemalloc
+
+    from PIL import Image
+
+    if sys.platform.startswith("linux"):
+        import ctypes
+        ctypes.CDLL(None).prctl(41, 1, 0, 0, 0)  # PR_SET_THP_DISABLE
+
+    from utils.preprocess import PreprocessPipeline
+
+    image = make_image(width, height)
+    if method == "pil":
+        func = pil_chain
+    else:
+        func = PreprocessPipeline.from_profile(method).run
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    func(image)  # 预热（流水线会在这里分配可复用的缓冲区）
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        func(image)
+    elapsed_ms = (time.perf_counter() - start) / REPEAT * 1000
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # 稳态下单次调用的分配情况
+    faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+    func(image)
+    faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt - faults
+
+    Image.core.reset_stats()
+    tracemalloc.start()
+    func(image)
+    numpy_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    pil_images = Image.core.get_stats()["new_count"]
+
+    # Linux上ru_maxrss单位是KB，macOS上是字节
+    scale = 1 if sys.platform == "darwin" else 1024
+    print(json.dumps({
+        "ms": elapsed_ms,
+        "peak_mb": (peak - baseline) * scale / 1024 / 1024,
+        "pil_images": pil_images,
+        "numpy_mb": numpy_peak / 1024 / 1024,
+        "allocated_mb": faults * mmap.PAGESIZE / 1024 / 1024,
+    }))
+
+
+def main():
+    print(
+        f"{'尺寸':>10} {'方法':>10} {'耗时(ms)':>10} {'峰值增量(MB)':>14} {'PIL新建图像/次':>14} "
+        f"{'NumPy峰值(MB)/次':>16} {'新分配(MB)/次':>14}"
+    )
+    env = dict(os.environ, MALLOC_MMAP_THRESHOLD_="131072")
+    for width, height in SIZES:
+        for method in METHODS:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_preprocess", "--child", method, str(width), str(height)],
+                capture_output=True, text=True, check=True, env=env
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            size = f"{width}x{height}"
+            print(
+                f"{size:>10} {method:>10} {result['ms']:>10.1f} {result['peak_mb']:>14.1f} "
+                f"{result['pil_images']:>14} {result['numpy_mb']:>16.1f} {result['allocated_mb']:>14.1f}"
+            )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == "--child":
+        run_child(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+    else:
+        main()
@@ -0,0 +1,76 @@
+"""
+同一页文本上连续查询多个单词时的提示缓存命中率：原消息结构 vs 稳定前缀结构
+
+原结构把选中的单词插在原文所在的系统消息里，问题中又重复了一遍原文，每换一个单词前缀就变化；
+新结构（AIHandler._build_messages）为"系统提示 + 原文"前缀加"选中单词 + 问题"后缀。
+模拟服务器按与之前请求的最长公共前缀计算cached_tokens（规则见mock_openai_server.py）。
+
+运行方式（项目根目录）:
+    python -m benchmarks.bench_prompt_cache
+"""
+import os
+
+from benchmarks.mock_openai_server import MockOpenAIServer
+
+PASSAGE = (
+    "Die Würde des Menschen ist unantastbar. Sie zu achten und zu schützen ist Verpflichtung "
+    "aller staatlichen Gewalt. Das Deutsche Volk bekennt sich darum zu unverletzlichen und "
+    "unveräußerlichen Menschenrechten als Grundlage jeder menschlichen Gemeinschaft, des Friedens "
+    "und der Gerechtigkeit in der Welt. "
+) * 24
+WORDS = ["Würde", "unantastbar", "achten", "schützen", "Verpflichtung", "staatlichen", "Gewalt",
+         "bekennt", "unverletzlichen", "unveräußerlichen"]
+PERSONA = "你是一位精通德语的语言学家和教师，专门帮助中文学习者理解德语文本。"
+
+
+def legacy_messages(word):
+    """原MainWindow.ask_ai + AIHandler._build_messages生成的消息"""
+    question = f"请参考以下原文：{PASSAGE}。在这段文本中，'{word}' 的含义和用法是什么？"
+    return [
+        {"role": "system", "content": PERSONA},
+        {"role": "system", "content": question},
+        {"role": "user", "content": question},
+    ]
+
+
+def main():
+    server = MockOpenAIServer("Erklärung").start()
+    os.environ["OPENAI_API_KEY"] = "mock-key"
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+
+    import openai
+
+    from utils.ai_handler import AIHandler
+
+    client = openai.OpenAI()
+    prompt_tokens = cached_tokens = 0
+    for word in WORDS:
+        response = client.chat.completions.create(model="mock", messages=legacy_messages(word))
+        prompt_tokens += response.usage.prompt_tokens
+        cached_tokens += response.usage.prompt_tokens_details.cached_tokens
+    legacy = (prompt_tokens, cached_tokens)
+
+    # 新结构：与MainWindow.ask_ai相同的调用方式
+    server._prompts.clear()
+    handler = AIHandler()
+    handler.cache_enabled = False
+    for word in WORDS:
+        handler.get_response(
+            f"在这段文本中，'{word}' 的含义和用法是什么？",
+            {"original_text": PASSAGE, "selected_text": word}
+        )
+    stats = handler.token_stats()
+    stable = (stats["prompt_tokens"], stats["cached_tokens"])
+
+    handler.close()
+    client.close()
+    server.stop()
+
+    print(f"同一段原文上查询{len(WORDS)}个单词")
+    print(f"{'消息结构':>10} {'输入tokens':>10} {'缓存命中tokens':>14} {'命中率':>8}")
+    for name, (total, cached) in [("原结构", legacy), ("稳定前缀", stable)]:
+        print(f"{name:>10} {total:>10} {cached:>14} {cached / total:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
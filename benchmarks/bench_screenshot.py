@@ -0,0 +1,170 @@
+"""
+截图选择框拖动的帧耗时：原实现（每次移动都缩放绘制整屏截图、整屏遮罩并全窗口重绘）
+vs 预先变暗的背景 + 只重绘变化区域（gui/screenshot_widget.py）
+
+用合成的屏幕截图模拟1080p、4K和4K@200%（HiDPI）屏幕，发送一串模拟拖动的鼠标移动事件，
+统计每次移动到重绘完成的耗时（QT_QPA_PLATFORM=offscreen，每种屏幕在独立子进程中运行）。
+
+运行方式（项目根目录）:
+    python -m benchmarks.bench_screenshot
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# (名称, 逻辑宽, 逻辑高, 设备像素比)
+SCREENS = [
+    ("1080p", 1920, 1080, 1.0),
+    ("4K", 3840, 2160, 1.0),
+    ("4K@200%", 1920, 1080, 2.0),
+]
+MOVES = 200
+
+
+def legacy_widget_class():
+    """原ScreenshotWidget的绘制方式"""
+    from PySide6.QtCore import QPoint, QRect, Qt
+    from PySide6.QtGui import QColor, QPainter, QPen
+    from PySide6.QtWidgets import QWidget
+
+    class LegacyScreenshotWidget(QWidget):
+        def __init__(self, pixmap):
+            super().__init__()
+            self.setAttribute(Qt.WA_TranslucentBackground)
+            self.screen_pixmap = pixmap
+            self.start_point = QPoint()
+            self.end_point = QPoint()
+            self.is_drawing = False
+            self.background_color = QColor(0, 0, 0, 100)
+            self.border_color = QColor(0, 174, 255)
+            self.mask_color = QColor(0, 120, 215, 30)
+
+        def get_selected_rect(self):
+            x1, y1 = self.start_point.x(), self.start_point.y()
+            x2, y2 = self.end_point.x(), self.end_point.y()
+            return QRect(min(x1, x2), min(y1, y2), abs(x2 - x1), abs(y2 - y1))
+
+        def paintEvent(self, event):
+            painter = QPainter(self)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.drawPixmap(self.rect(), self.screen_pixmap)
+            painter.fillRect(self.rect(), self.background_color)
+            if not self.start_point.isNull() and not self.end_point.isNull():
+                rect = self.get_selected_rect()
+                painter.setCompositionMode(QPainter.CompositionMode_Clear)
+                painter.fillRect(rect, Qt.transparent)
+                painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+                painter.fillRect(rect, self.mask_color)
+                painter.setPen(QPen(self.border_color, 2))
+                painter.drawRect(rect)
+                m = 6
+                for x, dx in ((rect.left(), m), (rect.right(), -m)):
+                    for y, dy in ((rect.top(), m), (rect.bottom(), -m)):
+                        painter.drawLine(x, y, x + dx, y)
+                        painter.drawLine(x, y, x, y + dy)
+                painter.setPen(Qt.white)
+                painter.drawText(rect.right() - 70, rect.bottom() + 20, f"{rect.width()} × {rect.height()}")
+
+        def mousePressEvent(self, event):
+            pos = event.position()
+            self.start_point = self.end_point = QPoint(int(pos.x()), int(pos.y()))
+            self.is_drawing = True
+            self.update()
+
+        def mouseMoveEvent(self, event):
+            if self.is_drawing:
+                pos = event.position()
+                self.end_point = QPoint(int(pos.x()), int(pos.y()))
+                self.update()
+
+    return LegacyScreenshotWidget
+
+
+def synthetic_screen(width, height, ratio):
+    """模拟屏幕内容：浅色背景上的多行文字（原始分辨率，设置设备像素比）"""
+    from PySide6.QtCore import Qt
+    from PySide6.QtGui import QFont, QPainter, QPixmap
+
+    pixmap = QPixmap(int(width * ratio), int(height * ratio))
+    pixmap.fill(Qt.white)
+    painter = QPainter(pixmap)
+    painter.setFont(QFont("Sans", int(11 * ratio)))
+    line = "Die Würde des Menschen ist unantastbar. Sie zu achten und zu schützen ist Verpflichtung. " * 3
+    for y in range(int(30 * ratio), pixmap.height(), int(24 * ratio)):
+        painter.drawText(int(20 * ratio), y, line)
+    painter.end()
+    pixmap.setDevicePixelRatio(ratio)
+    return pixmap
+
+
+def run_child(method, width, height, ratio):
+    from PySide6.QtCore import QEvent, QPointF, QRect, Qt
+    from PySide6.QtGui import QMouseEvent
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication([])
+    pixmap = synthetic_screen(width, height, ratio)
+
+    if method == "legacy":
+        widget = legacy_widget_class()(pixmap)
+    else:
+        from gui.screenshot_widget import ScreenshotWidget
+        widget = ScreenshotWidget()
+        widget.setWindowState(Qt.WindowNoState)
+        widget.set_grabs([(QRect(0, 0, width, height), pixmap)])
+    widget.setGeometry(0, 0, width, height)
+    widget.show()
+    app.processEvents()
+
+    def send(kind, x, y):
+        buttons = Qt.LeftButton if kind != QEvent.MouseButtonRelease else Qt.NoButton
+        point = QPointF(x, y)
+        QApplication.sendEvent(widget, QMouseEvent(kind, point, point, Qt.LeftButton, buttons, Qt.NoModifier))
+
+    # 从屏幕左上部拖到右下部，选择框逐渐变大
+    x0, y0 = width * 0.1, height * 0.1
+    send(QEvent.MouseButtonPress, x0, y0)
+    app.processEvents()
+
+    frames = []
+    for i in range(1, MOVES + 1):
+        start = time.perf_counter()
+        send(QEvent.MouseMove, x0 + (width * 0.7) * i / MOVES, y0 + (height * 0.6) * i / MOVES)
+        app.processEvents()
+        frames.append((time.perf_counter() - start) * 1000)
+
+    frames.sort()
+    return {"mean": sum(frames) / len(frames), "p95": frames[int(len(frames) * 0.95)]}
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        method, width, height, ratio = sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), float(sys.argv[5])
+        print(json.dumps(run_child(method, width, height, ratio)))
+        return
+
+    print(f"{'屏幕':>8} {'实现':>8} {'平均帧耗时(ms)':>14} {'p95(ms)':>8}")
+    for name, width, height, ratio in SCREENS:
+        # 离屏平台的屏幕大小和设备像素比由配置文件指定
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump({"screens": [{"name": name, "x": 0, "y": 0, "width": width, "height": height,
+                                    "logicalDpi": 96, "logicalBaseDpi": 96, "dpr": ratio}]}, f)
+        env = dict(os.environ, QT_QPA_PLATFORM=f"offscreen:configfile={f.name}")
+        try:
+            for method in ["legacy", "cached"]:
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_screenshot", "--child",
+                     method, str(width), str(height), str(ratio)],
+                    env=env, capture_output=True, text=True, check=True
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f"{name:>8} {method:>8} {result['mean']:>14.2f} {result['p95']:>8.2f}")
+        finally:
+            os.unlink(f.name)
+
+
+if __name__ == "__main__":
+    main()
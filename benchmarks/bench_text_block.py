@@ -0,0 +1,172 @@
+"""
+文本块构建耗时与内存对比：原实现（每个单词一个QLabel）vs 自绘文本块（gui/text_block_widget.py）
+
+每种实现、每种单词数在独立子进程中运行（QT_QPA_PLATFORM=offscreen），输出：
+- set_text到首次绘制完成的耗时
+- 构建前后ru_maxrss的增量
+- 控件对象数
+
+另外测量1000个单词的文本在小幅变化后重新set_text（差异更新）与清空重建的耗时。
+
+运行方式（项目根目录，仅支持Linux/macOS）:
+    python -m benchmarks.bench_text_block
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+TOKEN_COUNTS = [100, 1000, 10000]
+METHODS = ["labels", "canvas"]
+WORDS = "Die Würde des Menschen ist unantastbar. Sie zu achten und zu schützen ist Verpflichtung aller staatlichen Gewalt.".split()
+
+
+def make_text(count, words_per_line=12):
+    words = [WORDS[i % len(WORDS)] for i in range(count)]
+    lines = [" ".join(words[i:i + words_per_line]) for i in range(0, count, words_per_line)]
+    return "\n".join(lines)
+
+
+def legacy_widget_class():
+    """原TextBlockWidget的构建方式：每个单词一个带样式表的QLabel，每行一个QWidget + QHBoxLayout"""
+    from PySide6.QtCore import Qt
+    from PySide6.QtWidgets import QFrame, QHBoxLayout, QLabel, QVBoxLayout, QWidget
+
+    style = "background-color: white; border: 1px solid #cccccc; border-radius: 3px;"
+
+    class LegacyTextBlockWidget(QWidget):
+        def __init__(self):
+            super().__init__()
+            self.layout = QVBoxLayout(self)
+            self.layout.setSpacing(10)
+            self.layout.setContentsMargins(10, 10, 10, 10)
+            self.setMinimumWidth(400)
+            self.setMaximumWidth(600)
+
+        def new_row(self):
+            row = QWidget()
+            row_layout = QHBoxLayout(row)
+            row_layout.setSpacing(5)
+            row_layout.setContentsMargins(0, 0, 0, 0)
+            return row, row_layout
+
+        def set_text(self, text):
+            for line in text.split("\n"):
+                row, row_layout = self.new_row()
+                width = 0
+                for word in line.split():
+                    label = QLabel(word)
+                    label.setContentsMargins(5, 2, 5, 2)
+                    label.setAlignment(Qt.AlignCenter)
+                    label.setFrameShape(QFrame.Box)
+                    label.setStyleSheet(style)
+                    label.setMouseTracking(True)
+                    word_width = label.sizeHint().width()
+                    if width + word_width > 550:
+                        row_layout.addStretch(1)
+                        self.layout.addWidget(row)
+                        row, row_layout = self.new_row()
+                        width = 0
+                    row_layout.addWidget(label)
+                    width += word_width + 5
+                row_layout.addStretch(1)
+                self.layout.addWidget(row)
+            self.layout.addStretch(1)
+
+    return LegacyTextBlockWidget
+
+
+def run_child(method, count):
+    import resource
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication, QScrollArea, QWidget
+
+    app = QApplication([])
+    if method == "labels":
+        widget = legacy_widget_class()()
+    else:
+        from gui.text_block_widget import TextBlockWidget
+        widget = TextBlockWidget()
+
+    # 与MainWindow相同的嵌入方式
+    area = QScrollArea()
+    area.setWidget(widget)
+    area.setWidgetResizable(True)
+    area.resize(520, 600)
+    area.show()
+    app.processEvents()
+
+    text = make_text(count)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    widget.set_text(text)
+    app.processEvents()
+    area.viewport().repaint()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    scale = 1 if sys.platform == "darwin" else 1024
+    print(json.dumps({
+        "ms": elapsed_ms,
+        "rss_mb": (peak - baseline) * scale / 1024 / 1024,
+        "widgets": len(widget.findChildren(QWidget)) + 1,
+    }))
+
+
+def bench_update(changes=(1, 10, 100), count=1000, repeat=20):
+    """差异更新 vs 清空后重建"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+
+    from gui.text_block_widget import TextBlockWidget
+
+    app = QApplication.instance() or QApplication([])
+    widget = TextBlockWidget()
+    widget.resize(520, 600)
+    base = make_text(count).split(" ")
+
+    print(f"{'变化单词数':>10} {'差异更新(ms)':>14} {'清空重建(ms)':>14}")
+    for change in changes:
+        middle = len(base) // 2
+        changed = " ".join(base[:middle] + ["neu"] * change + base[middle:])
+        original = " ".join(base)
+
+        diff_ms = rebuild_ms = 0.0
+        for _ in range(repeat):
+            widget.set_text(original)
+            start = time.perf_counter()
+            widget.set_text(changed)
+            diff_ms += time.perf_counter() - start
+
+            widget.set_text(original)
+            start = time.perf_counter()
+            widget.clear()
+            widget.set_text(changed)
+            rebuild_ms += time.perf_counter() - start
+        app.processEvents()
+        print(f"{change:>10} {diff_ms / repeat * 1000:>14.2f} {rebuild_ms / repeat * 1000:>14.2f}")
+
+
+def main():
+    print(f"{'单词数':>8} {'实现':>8} {'耗时(ms)':>10} {'RSS增量(MB)':>12} {'控件数':>8}")
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    for count in TOKEN_COUNTS:
+        for method in METHODS:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_text_block", "--child", method, str(count)],
+                capture_output=True, text=True, check=True, env=env
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{count:>8} {method:>8} {result['ms']:>10.1f} {result['rss_mb']:>12.1f} {result['widgets']:>8}")
+
+    print()
+    bench_update()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        run_child(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
@@ -0,0 +1,110 @@
+"""
+跟随模式的变化检测开销和需要识别的像素行数（utils/watch.py）
+
+用PIL生成一页长文档，模拟在固定大小的截图区域中滚动：不变的帧、滚动一行、滚动半屏、
+回滚到已经识别过的位置，以及原地修改一行。统计每帧的比较耗时，以及需要OCR的像素行数
+（原实现每一帧都识别整个区域）。安装了Tesseract时同时统计实际的识别耗时。
+
+运行方式（项目根目录）:
+    python -m benchmarks.bench_watch
+"""
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from utils.watch import WatchSession, result_lines
+
+PAGE_WIDTH, PAGE_HEIGHT = 1000, 8000
+VIEW_HEIGHT = 800
+LINE_HEIGHT = 30
+SENTENCE = "Die Würde des Menschen ist unantastbar. Sie zu achten und zu schützen ist Verpflichtung."
+
+
+def synthetic_page():
+    """浅色背景上的多行德语文字，每8行空一行作为段落间隔"""
+    try:
+        font = ImageFont.load_default(size=20)
+    except TypeError:
+        font = ImageFont.load_default()
+    page = Image.new("RGB", (PAGE_WIDTH, PAGE_HEIGHT), "white")
+    draw = ImageDraw.Draw(page)
+    for i, y in enumerate(range(20, PAGE_HEIGHT - LINE_HEIGHT, LINE_HEIGHT)):
+        if i % 8 != 7:
+            draw.text((30, y), f"{i}. {SENTENCE}", font=font, fill="black")
+    return page
+
+
+def frames(page):
+    """(说明, 视口顶部位置, 是否修改一行)"""
+    yield "首帧", 0, False
+    for _ in range(5):
+        yield "不变", 0, False
+    for i in range(1, 6):
+        yield "滚动一行", i * LINE_HEIGHT, False
+    yield "滚动半屏", 5 * LINE_HEIGHT + VIEW_HEIGHT // 2, False
+    yield "回滚", 5 * LINE_HEIGHT, False
+    yield "修改一行", 5 * LINE_HEIGHT, True
+
+
+def view(page, top, edited):
+    image = page.crop((0, top, PAGE_WIDTH, top + VIEW_HEIGHT))
+    if edited:
+        ImageDraw.Draw(image).rectangle((30, 300, 600, 320), fill="black")
+    return image
+
+
+def main():
+    page = synthetic_page()
+    session = WatchSession()
+
+    ocr_handler = None
+    try:
+        from utils.ocr_handler import OCRHandler
+        ocr_handler = OCRHandler()
+        if not ocr_handler.tesseract_installed:
+            ocr_handler = None
+    except Exception as e:
+        print(f"不统计识别耗时：{e}")
+
+    print(f"{'帧':>8} {'变化':>8} {'比较(ms)':>9} {'识别行数':>8} {'整帧行数':>8}" + (f" {'识别(ms)':>9}" if ocr_handler else ""))
+    totals = {}
+    for label, top, edited in frames(page):
+        image = view(page, top, edited)
+        frame = np.asarray(image.convert("L"))
+
+        start = time.perf_counter()
+        change, strips = session.plan(frame)
+        plan_ms = (time.perf_counter() - start) * 1000
+        rows = sum(bottom - strip_top for strip_top, bottom, _ in strips)
+
+        ocr_ms = 0.0
+        for strip in strips:
+            strip_top, bottom, _ = strip
+            if ocr_handler is not None:
+                start = time.perf_counter()
+                result = ocr_handler.recognize(image.crop((0, strip_top, PAGE_WIDTH, bottom)))
+                ocr_ms += (time.perf_counter() - start) * 1000
+                session.apply(strip, result_lines(result))
+            else:
+                session.apply(strip, [])
+
+        total = totals.setdefault(label, [0, 0.0, 0, 0.0])
+        total[0] += 1
+        total[1] += plan_ms
+        total[2] += rows
+        total[3] += ocr_ms
+        line = f"{label:>8} {change.kind:>8} {plan_ms:>9.2f} {rows:>8} {VIEW_HEIGHT:>8}"
+        print(line + (f" {ocr_ms:>9.0f}" if ocr_handler else ""))
+
+    print("\n按类型平均：")
+    for label, (count, plan_ms, rows, ocr_ms) in totals.items():
+        line = f"{label:>8} 比较 {plan_ms / count:.2f} ms，识别 {rows / count:.0f} / {VIEW_HEIGHT} 行"
+        print(line + (f"，识别耗时 {ocr_ms / count:.0f} ms" if ocr_handler else ""))
+
+    if ocr_handler is not None:
+        ocr_handler.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+单词悬停/选中的事件处理速率：原实现（每次悬停和切换都setStyleSheet）vs 自绘文本块
+
+在1000个单词的文本块上依次把鼠标扫过每个单词（悬停），再逐个点击（切换选中），
+每个事件之后处理完重绘，统计每秒能处理的事件数（QT_QPA_PLATFORM=offscreen）。
+
+运行方式（项目根目录）:
+    python -m benchmarks.bench_word_events
+"""
+import os
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QEvent, QPointF, Qt
+from PySide6.QtGui import QMouseEvent
+from PySide6.QtWidgets import QApplication, QLabel, QScrollArea
+
+from benchmarks.bench_text_block import legacy_widget_class, make_text
+
+TOKENS = 1000
+NORMAL = "background-color: white; border: 1px solid #cccccc; border-radius: 3px;"
+HOVER = "background-color: #f0f0f0; border: 1px solid #cccccc; border-radius: 3px;"
+SELECTED = "background-color: #e1f5fe; border: 1px solid #4fc3f7; border-radius: 3px;"
+
+
+def show_in_scroll_area(widget):
+    area = QScrollArea()
+    area.setWidget(widget)
+    area.setWidgetResizable(True)
+    area.resize(520, 4000)
+    area.show()
+    return area
+
+
+def rate(app, events):
+    """依次执行events中的回调，每次之后处理重绘，返回每秒事件数"""
+    start = time.perf_counter()
+    for event in events:
+        event()
+        app.processEvents()
+    return len(events) / (time.perf_counter() - start)
+
+
+def bench_labels(app):
+    """原WordButton的行为：enter/leave/toggle时用新的样式字符串调用setStyleSheet"""
+    widget = legacy_widget_class()()
+    area = show_in_scroll_area(widget)
+    widget.set_text(make_text(TOKENS))
+    app.processEvents()
+    labels = widget.findChildren(QLabel)
+
+    def hover(previous, label):
+        def event():
+            if previous is not None:
+                previous.setStyleSheet(NORMAL)  # leaveEvent
+            label.setStyleSheet(HOVER)          # enterEvent
+        return event
+
+    def toggle(label):
+        return lambda: label.setStyleSheet(SELECTED)  # update_style
+
+    hover_rate = rate(app, [hover(labels[i - 1] if i else None, label) for i, label in enumerate(labels)])
+    toggle_rate = rate(app, [toggle(label) for label in labels])
+    area.close()
+    return hover_rate, toggle_rate
+
+
+def bench_canvas(app):
+    from gui.text_block_widget import TextBlockWidget
+
+    widget = TextBlockWidget()
+    area = show_in_scroll_area(widget)
+    widget.set_text(make_text(TOKENS))
+    app.processEvents()
+
+    def send(event_type, pos, button=Qt.NoButton):
+        buttons = Qt.LeftButton if event_type == QEvent.MouseButtonPress else Qt.NoButton
+        event = QMouseEvent(event_type, pos, widget.mapToGlobal(pos), button, buttons, Qt.NoModifier)
+        QApplication.sendEvent(widget, event)
+
+    centers = [QPointF(widget.token_rect(i).center()) for i in range(len(widget.tokens))]
+
+    def hover(pos):
+        return lambda: send(QEvent.MouseMove, pos)
+
+    def toggle(pos):
+        def event():
+            send(QEvent.MouseButtonPress, pos, Qt.LeftButton)
+            send(QEvent.MouseButtonRelease, pos, Qt.LeftButton)
+        return event
+
+    hover_rate = rate(app, [hover(pos) for pos in centers])
+    toggle_rate = rate(app, [toggle(pos) for pos in centers])
+    area.close()
+    return hover_rate, toggle_rate
+
+
+def main():
+    app = QApplication([])
+    print(f"{'实现':>8} {'悬停(事件/秒)':>14} {'切换选中(事件/秒)':>18}")
+    for name, bench in [("labels", bench_labels), ("canvas", bench_canvas)]:
+        hover_rate, toggle_rate = bench(app)
+        print(f"{name:>8} {hover_rate:>14.0f} {toggle_rate:>18.0f}")
+
+
+if __name__ == "__main__":
+    main()
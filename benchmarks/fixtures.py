@@ -0,0 +1,127 @@
+"""
+基准测试用的合成德语文本图像（离线生成，结果可重复）
+
+每个Fixture是一张用PIL绘制的截图和其中文字的标准答案（按行以换行分隔），
+覆盖不同的尺寸、字体、字号、背景和噪声强度。相同的参数总是生成相同的像素
+（文字固定，噪声使用固定的随机种子），可以直接比较不同版本的耗时和识别准确率。
+
+用法:
+    from benchmarks.fixtures import make_fixtures
+    for fixture in make_fixtures():
+        fixture.image, fixture.text
+"""
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+SENTENCES = [
+    "Die Würde des Menschen ist unantastbar.",
+    "Sie zu achten und zu schützen ist Verpflichtung aller staatlichen Gewalt.",
+    "Jeder hat das Recht auf die freie Entfaltung seiner Persönlichkeit.",
+    "Männer und Frauen sind gleichberechtigt.",
+    "Die Freiheit der Person ist unverletzlich.",
+    "Im Frühling blühen die Äpfel, und die Straßen füllen sich mit Fußgängern.",
+    "Größere Übungen schließen wir am Donnerstag gemeinsam ab.",
+    "Die Zeitung berichtet über die Öffnungszeiten der städtischen Bibliothek.",
+    "Nach dem Gespräch fuhr sie mit dem Zug über Köln nach Düsseldorf.",
+    "Wir müssen die Grundsätze der Verfassung täglich neu verteidigen.",
+]
+
+# 名称, 宽, 高, 字体, 字号, 噪声标准差（0-255灰度）, 背景色
+FIXTURE_SPECS = [
+    ("small-sans", 640, 240, "DejaVuSans.ttf", 14, 0, (255, 255, 255)),
+    ("hd-serif", 1280, 720, "DejaVuSerif.ttf", 18, 0, (255, 255, 255)),
+    ("hd-noisy", 1280, 720, "DejaVuSans.ttf", 18, 16, (245, 242, 235)),
+    ("hd-mono-noisy", 1280, 720, "DejaVuSansMono.ttf", 16, 32, (235, 235, 235)),
+    ("fullhd-sans", 1920, 1080, "DejaVuSans.ttf", 20, 6, (250, 250, 250)),
+    ("4k-serif", 3840, 2160, "DejaVuSerif.ttf", 32, 6, (255, 255, 255)),
+]
+
+
+class Fixture:
+    """一张合成截图：image为RGB的PIL图像，text为图中文字的标准答案"""
+
+    def __init__(self, name, image, text, font, font_size, noise):
+        self.name = name
+        self.image = image
+        self.text = text
+        self.font = font
+        self.font_size = font_size
+        self.noise = noise
+
+    @property
+    def size(self):
+        return self.image.size
+
+    def __repr__(self):
+        width, height = self.size
+        return f"Fixture({self.name}, {width}x{height}, {self.font} {self.font_size}px, noise={self.noise})"
+
+
+def load_font(name, size):
+    """加载TrueType字体，系统中没有时退回PIL自带的字体"""
+    try:
+        return ImageFont.truetype(name, size)
+    except OSError:
+        try:
+            return ImageFont.load_default(size=size)
+        except TypeError:
+            return ImageFont.load_default()
+
+
+def wrap_lines(font, width, margin):
+    """把SENTENCES循环排成不超过width的行，生成无限的行序列"""
+    line = ""
+    index = 0
+    while True:
+        for word in SENTENCES[index % len(SENTENCES)].split():
+            candidate = f"{line} {word}" if line else word
+            if line and font.getlength(candidate) > width - 2 * margin:
+                yield line
+                line = word
+            else:
+                line = candidate
+        index += 1
+
+
+def render_fixture(name, width, height, font_name, font_size, noise=0, background=(255, 255, 255), seed=0):
+    """绘制填满整张图像的多行德语文字，每6行空一行作为段落间隔"""
+    font = load_font(font_name, font_size)
+    margin = font_size
+    line_height = round(font_size * 1.5)
+
+    image = Image.new("RGB", (width, height), background)
+    draw = ImageDraw.Draw(image)
+    lines = []
+    y = margin
+    for i, line in enumerate(wrap_lines(font, width, margin)):
+        if y + line_height > height - margin:
+            break
+        draw.text((margin, y), line, font=font, fill=(20, 20, 20))
+        lines.append(line)
+        y += line_height
+        if i % 6 == 5:
+            y += line_height
+
+    if noise:
+        rng = np.random.default_rng(seed)
+        pixels = np.asarray(image, dtype=np.float32)
+        pixels += rng.normal(0.0, noise, pixels.shape[:2])[..., None]
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+    return Fixture(name, image, "\n".join(lines), font_name, font_size, noise)
+
+
+def make_fixtures(names=None):
+    """按FIXTURE_SPECS生成全部（或names中的）Fixture"""
+    fixtures = []
+    for seed, (name, width, height, font_name, font_size, noise, background) in enumerate(FIXTURE_SPECS):
+        if names is None or name in names:
+            fixtures.append(render_fixture(name, width, height, font_name, font_size, noise, background, seed))
+    return fixtures
+
+
+def make_words(count):
+    """count个单词的文本（每行12个单词），用于文本块等与图像无关的测试"""
+    words = " ".join(SENTENCES).split()
+    words = [words[i % len(words)] for i in range(count)]
+    return "\n".join(" ".join(words[i:i + 12]) for i in range(0, count, 12))
@@ -0,0 +1,185 @@
+"""
+本地模拟的OpenAI兼容服务器（只实现/v1/chat/completions），用于离线基准测试
+
+支持普通和stream=True两种响应，可注入首字延迟和逐块延迟。
+普通请求会等待与流式相同的总生成时间后一次性返回，模拟真实服务的行为。
+usage中的cached_tokens模拟服务端提示缓存：与之前某个请求相同的消息前缀
+（至少1024个token，按128个token取整）计为命中。
+connect_delay模拟每个新连接的TLS握手耗时；failures中的状态码（如429、503）会依次
+作为接下来几个请求的错误响应返回，用于测试重试。
+
+用法:
+    server = MockOpenAIServer(reply="Hallo Welt", first_token_delay=0.3, chunk_delay=0.02)
+    server.start()
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    ...
+    server.stop()
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 客户端关闭keep-alive连接属于正常情况，不打印堆栈
+        pass
+
+
+class MockOpenAIServer:
+    def __init__(self, reply="Das ist eine Antwort.", first_token_delay=0.0, chunk_delay=0.0,
+                 chunk_size=4, port=0, connect_delay=0.0):
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.chunk_delay = chunk_delay
+        self.chunk_size = chunk_size  # 每个流式块包含的字符数
+        self.connect_delay = connect_delay
+        self.failures = []  # 待返回的错误状态码
+        self.requests = []  # 收到的请求体
+        self._prompts = []  # 之前请求的消息（序列化后），用于计算cached_tokens
+        self.connections = set()  # 出现过的客户端端口，用于观察连接复用
+
+        self._server = _QuietHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def cached_tokens(self, prompt):
+        """与之前请求的最长公共前缀对应的缓存token数，并记录本次请求"""
+        common = max((len(os.path.commonprefix([previous, prompt])) for previous in self._prompts), default=0)
+        self._prompts.append(prompt)
+
+        tokens = common // 4
+        return tokens // 128 * 128 if tokens >= 1024 else 0
+
+    def reply_for(self, body):
+        """返回本次请求的回复文本，子类可以覆盖以根据请求内容生成回复"""
+        return self.reply
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                # 每个Handler对应一个TCP连接
+                time.sleep(server.connect_delay)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                server.requests.append(body)
+                server.connections.add(self.client_address[1])
+
+                if server.failures:
+                    self._error(server.failures.pop(0))
+                    return
+
+                reply = server.reply_for(body)
+                time.sleep(server.first_token_delay)
+                if body.get("stream"):
+                    self._stream(body, reply)
+                else:
+                    chunks = -(-len(reply) // server.chunk_size)
+                    time.sleep(server.chunk_delay * chunks)
+                    self._complete(body, reply)
+
+            def _error(self, status):
+                data = json.dumps({"error": {"message": f"mock error {status}", "type": "server_error"}}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _usage(self, body, reply):
+                prompt = json.dumps(body.get("messages", []), ensure_ascii=False)
+                return {
+                    "prompt_tokens": len(prompt) // 4,
+                    "completion_tokens": len(reply) // 4,
+                    "total_tokens": (len(prompt) + len(reply)) // 4,
+                    "prompt_tokens_details": {"cached_tokens": server.cached_tokens(prompt)},
+                }
+
+            def _complete(self, body, reply):
+                data = json.dumps({
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "mock"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": reply},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": self._usage(body, reply),
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, body, reply):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                for start in range(0, len(reply), server.chunk_size):
+                    self._send_event({
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "mock"),
+                        "choices": [{
+                            "index": 0,
+                            "delta": {"content": reply[start:start + server.chunk_size]},
+                            "finish_reason": None,
+                        }],
+                    })
+                    time.sleep(server.chunk_delay)
+
+                if body.get("stream_options", {}).get("include_usage"):
+                    self._send_event({
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "mock"),
+                        "choices": [],
+                        "usage": self._usage(body, reply),
+                    })
+                self._send_chunk(b"data: [DONE]\n\n")
+                self._send_chunk(b"")
+
+            def _send_event(self, event):
+                self._send_chunk(f"data: {json.dumps(event)}\n\n".encode())
+
+            def _send_chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
@@ -0,0 +1,512 @@
+"""
+离线基准测试套件：截图 -> OCR -> 文本块 -> AI 整条流程的耗时、内存和识别准确率
+
+不需要网络：图像由benchmarks/fixtures.py用PIL合成（不同尺寸、字体、噪声），
+AI请求发给本地模拟服务器（benchmarks/mock_openai_server.py，注入首字延迟和逐块延迟）。
+测量的项目（组）:
+- preprocess   OCRHandler.preprocess_image 耗时和单次调用的NumPy分配
+- ocr          OCRHandler.process_image 耗时，以及与标准答案比较的字符错误率(CER)和单词错误率(WER)
+               （需要Tesseract，没有安装时跳过）
+- pixmap       OCRHandler.pixmap_to_image 耗时
+- text_block   TextBlockWidget.set_text 构建到首次绘制的耗时、RSS增量（独立子进程）和差异更新耗时
+- markdown     ChatWidget.markdown_to_html 流式逐段更新的总耗时和整段转换耗时
+- ai           AIHandler 普通/流式请求的耗时，以及扣除注入延迟后的客户端开销
+
+结果写入JSON（指标名 -> 数值，全部越小越好）。存在基线文件时逐项比较：耗时和内存超过基线
+(1 + tolerance)倍且差值超过噪声下限、或CER/WER增加超过accuracy_tolerance时记为回退，
+并以退出码1结束。某个组运行出错，或者基线中的指标本次没有测量到（因环境不满足而跳过的组、
+没有选择的组和图像除外）同样以退出码1结束。基线与机器有关，应在同一台机器上用--save-baseline保存。
+
+运行方式（项目根目录，text_block组的内存统计仅支持Linux/macOS）:
+    python -m benchmarks.suite                              # 全部测试，与benchmarks/baseline.json比较
+    python -m benchmarks.suite --save-baseline              # 把本次结果保存为基线
+    python -m benchmarks.suite --groups preprocess,ocr --fixtures small-sans,hd-noisy
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.fixtures import make_fixtures, make_words
+
+GROUPS = ["preprocess", "ocr", "pixmap", "text_block", "markdown", "ai"]
+# 指标按图像分别统计的组（--fixtures只选择部分图像时，这些组缺少的基线指标不算错误）
+FIXTURE_GROUPS = {"preprocess", "ocr", "pixmap"}
+TEXT_BLOCK_COUNTS = [100, 1000, 10000]
+BASELINE_PATH = os.path.join("benchmarks", "baseline.json")
+RESULTS_PATH = os.path.join("benchmarks", "results.json")
+
+# 比较时低于这个差值的变化视为噪声（按指标名的最后一段匹配后缀）
+NOISE_FLOOR = {"ms": 1.0, "mb": 1.0}
+
+# 模拟服务器注入的延迟（秒）
+FIRST_TOKEN_DELAY = 0.2
+CHUNK_DELAY = 0.002
+
+
+class Skip(Exception):
+    """该组依赖的环境不可用（例如没有安装Tesseract），跳过并记录原因"""
+
+
+def edit_distance(a, b):
+    """
+    两个序列的Levenshtein距离
+
+    逐行计算动态规划：删除和替换可以整行向量化，插入的传递
+    new[j] = min(cand[j], new[j-1] + 1) 等价于 j + 累积最小值(cand[k] - k)。
+    """
+    if not a or not b:
+        return max(len(a), len(b))
+    codes = {}
+    a = np.array([codes.setdefault(item, len(codes)) for item in a])
+    b = np.array([codes.setdefault(item, len(codes)) for item in b])
+    offsets = np.arange(len(b) + 1)
+    row = offsets.copy()
+    cand = np.empty_like(row)
+    for i, item in enumerate(a, 1):
+        cand[0] = i
+        np.minimum(row[1:] + 1, row[:-1] + (b != item), out=cand[1:])
+        row = offsets + np.minimum.accumulate(cand - offsets)
+    return int(row[-1])
+
+
+def error_rates(reference, hypothesis):
+    """(CER, WER)：空白统一为单个空格后，编辑距离除以标准答案的字符数/单词数"""
+    ref_words, hyp_words = reference.split(), hypothesis.split()
+    ref_chars, hyp_chars = " ".join(ref_words), " ".join(hyp_words)
+    cer = edit_distance(ref_chars, hyp_chars) / max(1, len(ref_chars))
+    wer = edit_distance(ref_words, hyp_words) / max(1, len(ref_words))
+    return cer, wer
+
+
+def median_ms(func, repeat, warmup=1):
+    """预热warmup次后执行repeat次，返回耗时的中位数（毫秒）"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+_ocr_handler = None
+
+
+def ocr_handler():
+    """各组共用一个OCRHandler（只检测一次Tesseract）"""
+    global _ocr_handler
+    if _ocr_handler is None:
+        from utils.ocr_handler import OCRHandler
+        _ocr_handler = OCRHandler()
+    return _ocr_handler
+
+
+def qt_app():
+    from PySide6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+def to_qimage(image):
+    """PIL图像 -> QImage（与截图得到的QImage一样是独立的像素副本）"""
+    from PySide6.QtGui import QImage
+
+    image = image.convert("RGB")
+    width, height = image.size
+    return QImage(image.tobytes(), width, height, width * 3, QImage.Format_RGB888).copy()
+
+
+def bench_preprocess(fixtures, repeat):
+    handler = ocr_handler()
+    metrics = {}
+    for fixture in fixtures:
+        image = fixture.image
+        metrics[f"preprocess/{fixture.name}/ms"] = median_ms(lambda: handler.preprocess_image(image), repeat)
+
+        # 稳态下单次调用的分配（流水线的缓冲区在预热时已经分配好）
+        tracemalloc.start()
+        handler.preprocess_image(image)
+        metrics[f"preprocess/{fixture.name}/alloc_mb"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+    return metrics
+
+
+def bench_ocr(fixtures, repeat):
+    handler = ocr_handler()
+    if not handler.tesseract_installed:
+        raise Skip("未安装Tesseract")
+    qt_app()
+
+    # OCR很慢，最多重复3次；第一次识别包含加载语言模型的时间，先预热一次
+    repeat = min(repeat, 3)
+    handler.process_image(to_qimage(fixtures[0].image))
+
+    metrics = {}
+    cers, wers = [], []
+    for fixture in fixtures:
+        qimage = to_qimage(fixture.image)
+        results = []
+
+        def run():
+            handler.cache.clear()
+            results.append(handler.process_image(qimage)[1])
+
+        metrics[f"ocr/{fixture.name}/ms"] = median_ms(run, repeat, warmup=0)
+        text = results[-1].text if results[-1] is not None else ""
+        cer, wer = error_rates(fixture.text, text)
+        metrics[f"ocr/{fixture.name}/cer"] = cer
+        metrics[f"ocr/{fixture.name}/wer"] = wer
+        cers.append(cer)
+        wers.append(wer)
+    metrics["ocr/mean/cer"] = statistics.mean(cers)
+    metrics["ocr/mean/wer"] = statistics.mean(wers)
+    return metrics
+
+
+def bench_pixmap(fixtures, repeat):
+    from PySide6.QtGui import QPixmap
+
+    qt_app()
+    handler = ocr_handler()
+    metrics = {}
+    for fixture in fixtures:
+        width, height = fixture.size
+        name = f"pixmap_to_image/{width}x{height}/ms"
+        if name not in metrics:
+            pixmap = QPixmap.fromImage(to_qimage(fixture.image))
+            metrics[name] = median_ms(lambda: handler.pixmap_to_image(pixmap), repeat)
+    return metrics
+
+
+def bench_text_block(fixtures, repeat):
+    """每种单词数在独立子进程中构建，RSS增量不受之前构建的影响"""
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    metrics = {}
+    for count in TEXT_BLOCK_COUNTS:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.suite", "--child", "text_block", str(count)],
+            capture_output=True, text=True, check=True, env=env
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        for key, value in result.items():
+            metrics[f"text_block/{count}/{key}"] = value
+    return metrics
+
+
+def rss_mb():
+    """当前进程的常驻内存（MB）：Linux上读/proc，其他系统用ru_maxrss（峰值）代替"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        import resource
+
+        # macOS上ru_maxrss单位是字节，其他系统是KB
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1024 / 1024
+
+
+def text_block_child(count):
+    """子进程：set_text到首次绘制完成的耗时和RSS增量，以及中间插入10个单词后的差异更新耗时"""
+    from PySide6.QtWidgets import QScrollArea
+
+    from gui.text_block_widget import TextBlockWidget
+
+    app = qt_app()
+    widget = TextBlockWidget()
+
+    # 与MainWindow相同的嵌入方式
+    area = QScrollArea()
+    area.setWidget(widget)
+    area.setWidgetResizable(True)
+    area.resize(520, 600)
+    area.show()
+    app.processEvents()
+
+    text = make_words(count)
+    baseline = rss_mb()
+    start = time.perf_counter()
+    widget.set_text(text)
+    app.processEvents()
+    area.viewport().repaint()
+    build_ms = (time.perf_counter() - start) * 1000
+    rss_delta = rss_mb() - baseline
+
+    words = text.split(" ")
+    middle = len(words) // 2
+    changed = " ".join(words[:middle] + ["neu"] * 10 + words[middle:])
+    start = time.perf_counter()
+    widget.set_text(changed)
+    app.processEvents()
+    area.viewport().repaint()
+    update_ms = (time.perf_counter() - start) * 1000
+
+    print(json.dumps({
+        "ms": build_ms,
+        "rss_mb": rss_delta,
+        "update_ms": update_ms,
+    }))
+
+
+def bench_markdown(fixtures, repeat):
+    from benchmarks.bench_markdown import CHUNK_CHARS, make_reply
+    from gui.chat_widget import ChatWidget
+
+    qt_app()
+    widget = ChatWidget()
+    reply = make_reply()
+    prefixes = [reply[:end] for end in range(CHUNK_CHARS, len(reply), CHUNK_CHARS)] + [reply]
+
+    def stream():
+        widget.md_renderer.reset()
+        for text in prefixes:
+            widget.markdown_to_html(text)
+
+    def full():
+        widget.md_renderer.reset()
+        widget.markdown_to_html(reply)
+
+    metrics = {
+        "markdown/stream/ms": median_ms(stream, min(repeat, 3)),
+        "markdown/full/ms": median_ms(full, repeat),
+    }
+    widget.shutdown()
+    return metrics
+
+
+def bench_ai(fixtures, repeat):
+    from benchmarks.bench_ai_stream import REPLY
+    from benchmarks.mock_openai_server import MockOpenAIServer
+
+    server = MockOpenAIServer(REPLY, first_token_delay=FIRST_TOKEN_DELAY, chunk_delay=CHUNK_DELAY).start()
+    os.environ["OPENAI_API_KEY"] = "mock-key"
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    injected_ms = (FIRST_TOKEN_DELAY + -(-len(REPLY) // server.chunk_size) * CHUNK_DELAY) * 1000
+
+    from utils.ai_handler import AIHandler
+    handler = AIHandler()
+    handler.cache_enabled = False  # 每次都要真正请求服务器
+
+    try:
+        blocking_ms = median_ms(lambda: handler.get_response("Was bedeutet unantastbar?"), repeat)
+
+        first, total = [], []
+        for _ in range(repeat + 1):
+            start = time.perf_counter()
+            first_ms = None
+            for _delta in handler.stream_response("Was bedeutet unantastbar?"):
+                if first_ms is None:
+                    first_ms = (time.perf_counter() - start) * 1000
+            first.append(first_ms)
+            total.append((time.perf_counter() - start) * 1000)
+        # 第一次（预热）不计入
+        first_ms, stream_ms = statistics.median(first[1:]), statistics.median(total[1:])
+    finally:
+        handler.close()
+        server.stop()
+
+    return {
+        "ai/get_response/ms": blocking_ms,
+        "ai/get_response/overhead_ms": blocking_ms - injected_ms,
+        "ai/stream/ttft_ms": first_ms,
+        "ai/stream/ttft_overhead_ms": first_ms - FIRST_TOKEN_DELAY * 1000,
+        "ai/stream/ms": stream_ms,
+        "ai/stream/overhead_ms": stream_ms - injected_ms,
+    }
+
+
+BENCHMARKS = {
+    "preprocess": bench_preprocess,
+    "ocr": bench_ocr,
+    "pixmap": bench_pixmap,
+    "text_block": bench_text_block,
+    "markdown": bench_markdown,
+    "ai": bench_ai,
+}
+
+
+def environment():
+    """记录运行环境，比较不同机器上的结果时作为参考"""
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+    try:
+        import PIL
+        import PySide6
+        info["pillow"] = PIL.__version__
+        info["pyside6"] = PySide6.__version__
+    except ImportError:
+        pass
+    if _ocr_handler is not None and _ocr_handler.backend is not None:
+        info["ocr_backend"] = _ocr_handler.backend.name
+    return info
+
+
+def run_suite(groups, fixture_names=None, repeat=5):
+    """运行指定的组，返回结果（可直接写入JSON）"""
+    fixtures = make_fixtures(fixture_names)
+    if not fixtures:
+        raise ValueError(f"没有匹配的图像：{fixture_names}")
+
+    metrics = {}
+    skipped = {}
+    errors = {}
+    for group in groups:
+        start = time.perf_counter()
+        try:
+            metrics.update(BENCHMARKS[group](fixtures, repeat))
+        except Skip as e:
+            skipped[group] = str(e)
+            print(f"{group}: 跳过（{e}）")
+            continue
+        except Exception as e:
+            # 被测代码出错属于失败，不能当作跳过
+            errors[group] = f"{type(e).__name__}: {e}"
+            print(f"{group}: 出错：{errors[group]}")
+            continue
+        print(f"{group}: 完成，{time.perf_counter() - start:.1f} s")
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "fixtures": [repr(fixture) for fixture in fixtures],
+        "repeat": repeat,
+        "groups": groups,
+        "fixture_filter": fixture_names,
+        "metrics": metrics,
+        "skipped": skipped,
+        "errors": errors,
+    }
+
+
+def metric_group(name):
+    """指标所属的组"""
+    prefix = name.split("/", 1)[0]
+    return "pixmap" if prefix == "pixmap_to_image" else prefix
+
+
+def missing_metrics(results, baseline_metrics):
+    """基线中有、本次没有测量到、并且不能用跳过或选择范围解释的指标"""
+    missing = []
+    for name in sorted(set(baseline_metrics) - set(results["metrics"])):
+        group = metric_group(name)
+        if group not in results["groups"] or group in results["skipped"]:
+            continue
+        if results["fixture_filter"] and group in FIXTURE_GROUPS:
+            continue
+        missing.append(name)
+    return missing
+
+
+def compare(metrics, baseline, tolerance=0.25, accuracy_tolerance=0.01):
+    """
+    与基线逐项比较，返回[(指标名, 基线值, 本次值, 状态)]
+
+    状态："回退"、"改进"、""（变化在容差内）或"新增"（基线中没有该指标）
+    """
+    rows = []
+    for name, value in metrics.items():
+        base = baseline.get(name)
+        if base is None:
+            rows.append((name, None, value, "新增"))
+            continue
+
+        unit = name.rsplit("/", 1)[-1]
+        if unit in ("cer", "wer"):
+            worse = value - base > accuracy_tolerance
+            better = base - value > accuracy_tolerance
+        else:
+            floor = next((floor for suffix, floor in NOISE_FLOOR.items() if unit.endswith(suffix)), 0.0)
+            worse = value > base * (1 + tolerance) and value - base > floor
+            better = value * (1 + tolerance) < base and base - value > floor
+        rows.append((name, base, value, "回退" if worse else "改进" if better else ""))
+    return rows
+
+
+def print_report(rows):
+    print(f"\n{'指标':<42} {'基线':>10} {'本次':>10} {'变化':>8}  状态")
+    for name, base, value, status in rows:
+        if base is None:
+            print(f"{name:<42} {'-':>10} {value:>10.3f} {'-':>8}  {status}")
+            continue
+        change = f"{(value - base) / abs(base) * 100:+.0f}%" if base else "-"
+        print(f"{name:<42} {base:>10.3f} {value:>10.3f} {change:>8}  {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线基准测试套件")
+    parser.add_argument("--groups", default=",".join(GROUPS), help=f"逗号分隔的组名（默认全部：{','.join(GROUPS)}）")
+    parser.add_argument("--fixtures", default=None, help="逗号分隔的测试图像名（默认全部，见benchmarks/fixtures.py）")
+    parser.add_argument("--repeat", type=int, default=5, help="每项测量的重复次数，取中位数（默认5）")
+    parser.add_argument("-o", "--output", default=RESULTS_PATH, help=f"结果JSON文件（默认{RESULTS_PATH}）")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help=f"基线JSON文件（默认{BASELINE_PATH}）")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线，不做比较")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="耗时和内存允许的相对增长（默认0.25）")
+    parser.add_argument("--accuracy-tolerance", type=float, default=0.01, help="CER/WER允许的绝对增长（默认0.01）")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    groups = [group.strip() for group in args.groups.split(",") if group.strip()]
+    unknown = [group for group in groups if group not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知的组：{', '.join(unknown)}")
+    fixture_names = args.fixtures.split(",") if args.fixtures else None
+
+    results = run_suite(groups, fixture_names, max(1, args.repeat))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}")
+
+    if results["errors"]:
+        for group, error in results["errors"].items():
+            print(f"{group}组出错：{error}")
+        print(f"\n{len(results['errors'])}个组运行出错" + ("，不保存基线" if args.save_baseline else ""))
+        return 1
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存到 {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print_report(compare(results["metrics"], {}))
+        print(f"\n没有基线文件 {args.baseline}，使用--save-baseline保存本次结果作为基线")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare(results["metrics"], baseline["metrics"], args.tolerance, args.accuracy_tolerance)
+    print_report(rows)
+
+    regressions = [row for row in rows if row[3] == "回退"]
+    missing = missing_metrics(results, baseline["metrics"])
+    if results["skipped"]:
+        print(f"\n跳过的组：{', '.join(results['skipped'])}")
+    if missing:
+        print(f"\n基线中有、本次缺少的指标：{', '.join(missing)}")
+    if regressions:
+        print(f"\n{len(regressions)}项回退")
+    if regressions or missing:
+        return 1
+    print("\n没有回退")
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child" and sys.argv[2] == "text_block":
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        text_block_child(int(sys.argv[3]))
+    else:
+        sys.exit(main())
@@ -1,36 +1,55 @@
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
                                QTextEdit, QLineEdit, QLabel, QScrollArea, QFrame)
-from PySide6.QtCore import Qt, Signal, QSize, QThread, Slot
+from PySide6.QtCore import Qt, Signal, QSize, QObject, Slot
 from PySide6.QtGui import QColor, QTextCursor, QFont
-import markdown
 import re
 
 from utils.ai_handler import AIHandler
+from utils.ai_scheduler import AIScheduler
+from utils.markdown_renderer import IncrementalMarkdownRenderer, MARKDOWN_CSS
+from utils.vocabulary import (VocabularyCache, normalize_word, parse_vocabulary,
+                              vocabulary_max_tokens, vocabulary_prompt, vocabulary_table)
 
-class ChatThread(QThread):
-    response_received = Signal(str)
-    
-    def __init__(self, ai_handler, prompt, context=None):
-        super().__init__()
-        self.ai_handler = ai_handler
-        self.prompt = prompt
-        self.context = context
-    
-    def run(self):
-        response = self.ai_handler.get_response(self.prompt, self.context)
-        self.response_received.emit(response)
+class AIRequestSignals(QObject):
+    """把调度器工作线程中的回调转发到GUI线程"""
+    delta_received = Signal(int, str)     # 请求id, 流式模式下的增量片段
+    response_received = Signal(int, str)  # 请求id, 完整回复
+    vocabulary_received = Signal(int, str)  # 请求id, 批量解释单词的JSON回复
 
 class ChatWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         
-        self.ai_handler = AIHandler()
+        self.ai_handler = AIHandler.shared()
+        
+        # 所有AI请求经由调度器执行；每次对话是一个分组，开始新对话时取消旧对话的请求
+        self.scheduler = AIScheduler(self.ai_handler)
+        self.ai_signals = AIRequestSignals()
+        self.ai_signals.delta_received.connect(self.on_ai_delta)
+        self.ai_signals.response_received.connect(self.display_ai_response)
+        self.ai_signals.vocabulary_received.connect(self.display_vocabulary)
+        self.conversation_id = 0
+        self.current_request = None
+        
         self.chat_history = []
         self.context_text = ""
         self.selected_text = ""
         
-        # 初始化Markdown转换器
-        self.md = markdown.Markdown(extensions=['tables', 'fenced_code'])
+        # 批量解释的单词按原文缓存，再次查询时在本地回答；
+        # vocabulary_words是当前批量请求要显示的全部单词（按选中顺序）
+        self.vocabulary = VocabularyCache()
+        self.vocabulary_words = []
+        
+        # 流式显示AI回复：已收到的文本，当前AI消息正文在文档中的起始位置，
+        # 以及已插入文档的已结束Markdown块数量和其后末尾块的起始位置
+        self.streaming = True
+        self.stream_text = None
+        self.stream_start = 0
+        self.stream_closed_blocks = 0
+        self.stream_tail_start = 0
+        
+        # 初始化Markdown转换器（增量渲染，流式更新时只重新转换末尾的块）
+        self.md_renderer = IncrementalMarkdownRenderer()
         
         self.init_ui()
     
@@ -52,24 +71,9 @@ class ChatWidget(QWidget):
                 border-radius: 5px;
                 font-family: "Microsoft YaHei", Arial, sans-serif;
             }
-            QTextEdit p {
-                margin: 0;
-                padding: 0;
-            }
-            QTextEdit code {
-                background-color: #f6f8fa;
-                padding: 2px 4px;
-                border-radius: 3px;
-                font-family: Consolas, Monaco, monospace;
-            }
-            QTextEdit pre {
-                background-color: #f6f8fa;
-                padding: 10px;
-                border-radius: 5px;
-                margin: 5px 0;
-                font-family: Consolas, Monaco, monospace;
-            }
         """)
+        # Markdown内容（代码、表格等）的样式由文档默认样式表提供
+        self.chat_display.document().setDefaultStyleSheet(MARKDOWN_CSS)
         
         # 输入框和发送按钮
         input_layout = QHBoxLayout()
@@ -84,29 +88,83 @@ class ChatWidget(QWidget):
         input_layout.addWidget(self.message_input, 1)
         input_layout.addWidget(self.send_button)
         
+        # 统计面板：token用量、服务端提示缓存命中、上下文压缩和本地回复缓存
+        self.stats_label = QLabel()
+        self.stats_label.setStyleSheet("color: #777777; font-size: 11px;")
+        self.stats_label.setWordWrap(True)
+        
         # 添加到主布局
         layout.addWidget(title_label)
         layout.addWidget(self.chat_display, 1)  # 1表示可拉伸
         layout.addLayout(input_layout)
+        layout.addWidget(self.stats_label)
+        self.update_stats()
         
         # 初始提示
         self.chat_display.setText("选择单词并点击「询问AI」按钮开始对话...")
     
     def markdown_to_html(self, text):
-        """将Markdown文本转换为HTML，并进行一些额外的格式化"""
-        # 转换Markdown为HTML
-        html = self.md.convert(text)
+        """将Markdown文本转换为HTML（样式由文档默认样式表MARKDOWN_CSS提供）"""
+        return self.md_renderer.render(text)
+    
+    def new_conversation(self, context, selected_text, prompt):
+        self.start_conversation(context, selected_text)
         
-        # 重置转换器状态（避免多次转换出现问题）
-        self.md.reset()
+        # 发送第一条消息
+        self.display_user_message(prompt)
         
-        # 确保代码块有正确的样式
-        html = html.replace('<code>', '<code style="background-color: #f6f8fa; padding: 2px 4px; border-radius: 3px;">')
-        html = html.replace('<pre>', '<pre style="background-color: #f6f8fa; padding: 10px; border-radius: 5px; margin: 5px 0;">')
+        # 创建初始上下文
+        initial_context = {
+            "original_text": self.context_text,
+            "selected_text": self.selected_text
+        }
         
-        return html
+        # 创建线程获取AI回复
+        self.request_ai_response(prompt, initial_context)
     
-    def new_conversation(self, context, selected_text, prompt):
+    def explain_words(self, context, words):
+        """
+        批量解释选中的单词：一次请求返回所有单词的JSON解释，显示为表格
+        
+        已经在这段原文中解释过的单词直接使用缓存；全部命中时不请求API。
+        """
+        words = list(dict.fromkeys(w for w in map(normalize_word, words) if w))
+        if not words:
+            return
+        
+        self.start_conversation(context, " ".join(words))
+        self.display_user_message(f"请解释选中的{len(words)}个单词")
+        self.vocabulary_words = words
+        
+        missing = [word for word in words if self.vocabulary.lookup(context, word) is None]
+        if not missing:
+            self.show_vocabulary(local=True)
+            return
+        
+        self.chat_display.append("<div style='color: #777777; text-align: center;'>AI 正在思考...</div>")
+        self.stream_text = None
+        self.current_request = self.scheduler.submit(
+            vocabulary_prompt(missing),
+            {"original_text": context},
+            stream=False,
+            group=self.conversation_id,
+            options={"json_mode": True, "max_tokens": vocabulary_max_tokens(len(missing))},
+            on_done=lambda request, text: self.ai_signals.vocabulary_received.emit(request.id, text)
+        )
+        self.send_button.setEnabled(False)
+    
+    def lookup_word(self, context, word):
+        """返回这段原文中已缓存的单词解释（VocabularyEntry），没有时返回None"""
+        return self.vocabulary.lookup(context, word)
+    
+    def start_conversation(self, context, selected_text):
+        """清空聊天窗口，显示原文和选中的单词，开始新的对话"""
+        # 取消上一次对话中尚未完成的请求
+        self.scheduler.cancel_group(self.conversation_id)
+        self.conversation_id += 1
+        self.current_request = None
+        self.stream_text = None
+        
         # 清空聊天显示
         self.chat_display.clear()
         
@@ -132,22 +190,11 @@ class ChatWidget(QWidget):
             f"<div style='background-color: #e3f2fd; padding: 8px; border-radius: 5px;'>"
             f"{selected_text}</div></div>"
         )
-        
-        # 发送第一条消息
-        self.display_user_message(prompt)
-        
-        # 创建初始上下文
-        initial_context = {
-            "original_text": self.context_text,
-            "selected_text": self.selected_text
-        }
-        
-        # 创建线程获取AI回复
-        self.request_ai_response(prompt, initial_context)
     
     def send_message(self):
         message = self.message_input.text().strip()
-        if not message:
+        # 上一条回复完成前不发送追问，保证回复按顺序显示
+        if not message or self.current_request is not None:
             return
         
         # 清空输入框
@@ -170,10 +217,17 @@ class ChatWidget(QWidget):
         # 显示等待消息
         self.chat_display.append("<div style='color: #777777; text-align: center;'>AI 正在思考...</div>")
         
-        # 创建线程获取AI回复
-        self.chat_thread = ChatThread(self.ai_handler, prompt, context)
-        self.chat_thread.response_received.connect(self.display_ai_response)
-        self.chat_thread.start()
+        # 提交到调度器，回调通过信号回到GUI线程
+        self.stream_text = None
+        self.current_request = self.scheduler.submit(
+            prompt,
+            context,
+            stream=self.streaming,
+            group=self.conversation_id,
+            on_delta=lambda request, delta: self.ai_signals.delta_received.emit(request.id, delta),
+            on_done=lambda request, text: self.ai_signals.response_received.emit(request.id, text)
+        )
+        self.send_button.setEnabled(False)
     
     def display_user_message(self, message):
         # 添加用户消息到聊天记录
@@ -190,30 +244,144 @@ class ChatWidget(QWidget):
         # 滚动到底部
         self.chat_display.moveCursor(QTextCursor.End)
     
-    @Slot(str)
-    def display_ai_response(self, response):
+    def is_current(self, request_id):
+        """回调是否属于当前等待的请求（已取消或已被取代的请求的回调直接忽略）"""
+        return self.current_request is not None and self.current_request.id == request_id
+    
+    @Slot(int, str)
+    def on_ai_delta(self, request_id, delta):
+        """流式模式：收到新片段后更新当前AI消息"""
+        if not self.is_current(request_id):
+            return
+        
+        if self.stream_text is None:
+            self.begin_ai_message()
+            self.stream_text = ""
+        
+        self.stream_text += delta
+        self.update_ai_message(self.stream_text)
+    
+    @Slot(int, str)
+    def display_ai_response(self, request_id, response):
+        if not self.is_current(request_id):
+            return
+        self.current_request = None
+        self.send_button.setEnabled(True)
+        
+        self.display_ai_message(response)
+        self.update_stats()
+    
+    @Slot(int, str)
+    def display_vocabulary(self, request_id, response):
+        """批量解释的回复：解析JSON，写入缓存后显示表格；无法解析时按普通回复显示"""
+        if not self.is_current(request_id):
+            return
+        self.current_request = None
+        self.send_button.setEnabled(True)
+        
+        entries = parse_vocabulary(response)
+        if entries is None:
+            self.display_ai_message(response)
+        else:
+            self.vocabulary.add(self.context_text, entries)
+            self.show_vocabulary()
+        self.update_stats()
+    
+    def show_vocabulary(self, local=False):
+        """把当前批量请求的单词显示为表格（local=True表示全部来自缓存）"""
+        entries = [self.vocabulary.lookup(self.context_text, word) for word in self.vocabulary_words]
+        missing = [word for word, entry in zip(self.vocabulary_words, entries) if entry is None]
+        
+        text = vocabulary_table([entry for entry in entries if entry is not None])
+        if missing:
+            text += "\n\n未返回解释的单词：" + "、".join(missing)
+        if local:
+            text += "\n\n（来自本地缓存，未请求API）"
+        self.display_ai_message(text)
+    
+    def display_ai_message(self, text):
+        """把一条完整的AI消息加入聊天记录并显示（流式模式下替换已显示的部分）"""
         # 添加AI回复到聊天记录
-        self.chat_history.append({"role": "assistant", "content": response})
+        self.chat_history.append({"role": "assistant", "content": text})
         
+        # 非流式模式（或没有收到任何片段）时，此时才创建AI消息
+        if self.stream_text is None:
+            self.begin_ai_message()
+        
+        self.update_ai_message(text)
+        self.stream_text = None
+    
+    def update_stats(self):
+        """刷新统计面板"""
+        tokens = self.ai_handler.token_stats()
+        replies = self.ai_handler.cache_stats()
+        self.stats_label.setText(
+            f"请求 {tokens['requests']} · 输入 {tokens['prompt_tokens']} tokens"
+            f"（提示缓存命中 {tokens['cached_tokens']}，{tokens['cached_rate']:.0%}）"
+            f" · 上下文压缩节省 {tokens['saved_tokens']} tokens"
+            f" · 回复缓存命中 {replies['hits']}/{replies['hits'] + replies['misses']}"
+        )
+    
+    def begin_ai_message(self):
+        """删除"AI正在思考..."消息，显示AI消息标题，并记录正文起始位置"""
         # 删除"AI正在思考..."消息
         cursor = self.chat_display.textCursor()
         cursor.movePosition(QTextCursor.End)
         cursor.select(QTextCursor.LineUnderCursor)
         cursor.removeSelectedText()
         
-        # 将Markdown转换为HTML
-        html_response = self.markdown_to_html(response)
-        
-        # 显示AI回复
+        # 显示AI消息标题
         self.chat_display.append(
             f"<div style='margin-bottom: 10px;'>"
-            f"<div style='font-weight: bold; color: #00897b;'>AI:</div>"
-            f"<div style='background-color: #e0f2f1; padding: 8px; border-radius: 5px;'>"
-            f"{html_response}</div></div>"
+            f"<div style='font-weight: bold; color: #00897b;'>AI:</div></div>"
         )
         
+        cursor = QTextCursor(self.chat_display.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertBlock()
+        self.stream_start = cursor.position()
+        self.stream_tail_start = self.stream_start
+        self.stream_closed_blocks = 0
+    
+    def update_ai_message(self, text):
+        """
+        用最新的完整文本更新当前AI消息的正文
+        
+        已经插入文档的已结束块保持不动，只替换末尾仍在增长的块并追加新结束的块。
+        """
+        # 将Markdown转换为HTML
+        closed_html, tail_html = self.md_renderer.render_blocks(text)
+        
+        # 渲染器发生了重置（文本不再是之前的延续），整条消息重新插入
+        if len(closed_html) < self.stream_closed_blocks:
+            self.stream_tail_start = self.stream_start
+            self.stream_closed_blocks = 0
+        
+        cursor = QTextCursor(self.chat_display.document())
+        cursor.setPosition(self.stream_tail_start)
+        cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+        
+        for html in closed_html[self.stream_closed_blocks:]:
+            cursor.insertHtml(self._ai_bubble(html))
+        self.stream_closed_blocks = len(closed_html)
+        self.stream_tail_start = cursor.position()
+        
+        if tail_html:
+            cursor.insertHtml(self._ai_bubble(tail_html))
+        
         # 滚动到底部
         self.chat_display.moveCursor(QTextCursor.End)
     
+    def _ai_bubble(self, html):
+        return (
+            f"<div style='background-color: #e0f2f1; padding: 8px; border-radius: 5px;'>"
+            f"{html}</div>"
+        )
+    
+    def shutdown(self):
+        """取消所有AI请求并停止调度器（窗口关闭时调用）"""
+        self.scheduler.shutdown(timeout=2)
+    
     def sizeHint(self):
         return QSize(400, 600) 
\ No newline at end of file
@@ -1,16 +1,112 @@
+import sqlite3
+import threading
+
+import numpy as np
 from PySide6.QtWidgets import (QMainWindow, QVBoxLayout, QHBoxLayout, QPushButton,
-                               QWidget, QScrollArea, QLabel, QFrame, QSplitter)
-from PySide6.QtCore import Qt, Signal, QRect, QTimer
-from PySide6.QtGui import QPixmap, QScreen, QKeySequence, QShortcut
+                               QWidget, QScrollArea, QLabel, QFrame, QSplitter, QProgressBar)
+from PySide6.QtCore import Qt, Signal, QRect, QTimer, QObject, QRunnable, QThreadPool, Slot
+from PySide6.QtGui import QPixmap, QImage, QScreen, QKeySequence, QShortcut
 from PySide6.QtWidgets import QApplication
 
-from gui.screenshot_widget import ScreenshotWidget
+from gui.screenshot_widget import ScreenshotWidget, grab_screen_region
 from gui.text_block_widget import TextBlockWidget
+from gui.word_overlay import WordOverlay
+from gui.word_card import WordCard
 from gui.chat_widget import ChatWidget
-from utils.ocr_handler import OCRHandler
+from utils.ocr_handler import OCRHandler, OCRCancelled
 from utils.ai_handler import AIHandler
+from utils.cache import default_cache_path
+from utils.dictionary import Dictionary
+from utils.lemmatizer import find_particle
+from utils.watch import WatchSession, result_lines
+
+class OCRJobSignals(QObject):
+    progress = Signal(int, int, int)     # 任务id, 已完成数, 总数（策略数或分块识别的图块数）
+    partial = Signal(int, str)           # 任务id, 分块识别时按阅读顺序已识别出的文本
+    finished = Signal(int, str, object)  # 任务id, 识别文本, OCRResult（可能为None）
+
+
+class OCRJob(QRunnable):
+    """在线程池中执行一次OCR，结果通过信号发回GUI线程"""
+    
+    def __init__(self, job_id, ocr_handler, image):
+        super().__init__()
+        self.job_id = job_id
+        self.ocr_handler = ocr_handler
+        self.image = image  # QImage：QPixmap不能在GUI线程以外使用
+        self.cancel_event = threading.Event()
+        self.signals = OCRJobSignals()
+    
+    def cancel(self):
+        self.cancel_event.set()
+    
+    def run(self):
+        try:
+            text, result = self.ocr_handler.process_image(
+                self.image,
+                progress=lambda done, total: self.signals.progress.emit(self.job_id, done, total),
+                cancel_event=self.cancel_event,
+                partial=lambda text: self.signals.partial.emit(self.job_id, text)
+            )
+        except OCRCancelled:
+            return
+        
+        if not self.cancel_event.is_set():
+            self.signals.finished.emit(self.job_id, text, result)
+
+
+class WatchJobSignals(QObject):
+    finished = Signal(int, object)  # 任务id, [(条带, 文本行列表), ...]
+    failed = Signal(int, str)       # 任务id, 错误信息（有条带识别出错时不发送部分结果）
+
+
+class WatchJob(QRunnable):
+    """跟随模式：只识别一帧中发生变化或新露出的条带"""
+    
+    def __init__(self, job_id, ocr_handler, image, strips):
+        super().__init__()
+        self.job_id = job_id
+        self.ocr_handler = ocr_handler
+        self.image = image  # QImage
+        self.strips = strips  # WatchSession.plan()返回的条带
+        self.cancel_event = threading.Event()
+        self.signals = WatchJobSignals()
+    
+    def cancel(self):
+        self.cancel_event.set()
+    
+    def run(self):
+        results = []
+        try:
+            frame = self.ocr_handler.pixmap_to_image(self.image)
+            for strip in self.strips:
+                top, bottom, _ = strip
+                strip_image = frame.crop((0, top, frame.width, bottom))
+                result = self.ocr_handler.recognize(strip_image, cancel_event=self.cancel_event)
+                results.append((strip, result_lines(result)))
+        except OCRCancelled:
+            return
+        except Exception as e:
+            print(f"跟随模式识别出错：{e}")
+            if not self.cancel_event.is_set():
+                self.signals.failed.emit(self.job_id, str(e))
+            return
+        
+        if not self.cancel_event.is_set():
+            self.signals.finished.emit(self.job_id, results)
+
+
+def gray_frame(image):
+    """QImage转换为灰度NumPy数组，用于跟随模式的帧比较"""
+    gray = image.convertToFormat(QImage.Format_Grayscale8)
+    data = np.frombuffer(gray.constBits(), dtype=np.uint8, count=gray.sizeInBytes())
+    # 每行字节数可能包含对齐填充
+    return data.reshape(gray.height(), gray.bytesPerLine())[:, :gray.width()].copy()
 
 class MainWindow(QMainWindow):
+    PREVIEW_HEIGHT = 200  # 普通模式下截图缩略图的高度
+    WATCH_INTERVAL_MS = 500  # 跟随模式的截图间隔
+    
     def __init__(self):
         super().__init__()
         
@@ -19,14 +115,41 @@ class MainWindow(QMainWindow):
         
         # 初始化组件
         self.screenshot_widget = ScreenshotWidget()
-        self.ocr_handler = OCRHandler()
-        self.ai_handler = AIHandler()
+        self.ocr_handler = OCRHandler(cache_path=default_cache_path("ocr_cache.sqlite"))
+        self.ai_handler = AIHandler.shared()
+        
+        # 本地词典：单击单词时立即显示原形和释义（需要先导入词典数据，见utils/dictionary.py）
+        try:
+            self.dictionary = Dictionary()
+        except sqlite3.Error as e:
+            print(f"无法打开本地词典：{e}")
+            self.dictionary = None
         
         self.selected_words = []
         self.original_pixmap = None
         
+        # 后台OCR：旧任务在开始新截图时取消，过期结果按任务id丢弃
+        self.ocr_pool = QThreadPool(self)
+        self.ocr_pool.setMaxThreadCount(2)
+        self.ocr_job = None
+        self.ocr_job_id = 0
+        
+        # 跟随模式：定时重新截取上次截图的区域，只识别变化的部分
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setInterval(self.WATCH_INTERVAL_MS)
+        self.watch_timer.timeout.connect(self.watch_tick)
+        self.watch_session = None
+        self.watch_image = None  # 上一帧的QImage，逐字节相同时直接跳过
+        self.watch_job = None
+        self.watch_job_id = 0
+        
         # 创建状态栏
         self.statusBar().showMessage("准备就绪")
+        self.ocr_progress = QProgressBar()
+        self.ocr_progress.setMaximumWidth(160)
+        self.ocr_progress.setTextVisible(False)
+        self.ocr_progress.hide()
+        self.statusBar().addPermanentWidget(self.ocr_progress)
         
         self.init_ui()
         self.setup_connections()
@@ -42,12 +165,26 @@ class MainWindow(QMainWindow):
         self.screenshot_btn = QPushButton("截图 (Ctrl+G)")
         self.ask_ai_btn = QPushButton("询问AI")
         self.ask_ai_btn.setEnabled(False)
+        # 一次请求解释所有选中的单词，结果显示为表格
+        self.vocabulary_btn = QPushButton("解释选词")
+        self.vocabulary_btn.setEnabled(False)
         self.translate_btn = QPushButton("翻译全文")
         self.translate_btn.setEnabled(False)
+        # 原图选词：直接在原始截图上点击单词
+        self.overlay_btn = QPushButton("原图选词")
+        self.overlay_btn.setCheckable(True)
+        self.overlay_btn.setEnabled(False)
+        # 跟随：滚动文档时持续识别截图区域中的新内容
+        self.follow_btn = QPushButton("跟随")
+        self.follow_btn.setCheckable(True)
+        self.follow_btn.setEnabled(False)
         
         toolbar_layout.addWidget(self.screenshot_btn)
         toolbar_layout.addWidget(self.ask_ai_btn)
+        toolbar_layout.addWidget(self.vocabulary_btn)
         toolbar_layout.addWidget(self.translate_btn)
+        toolbar_layout.addWidget(self.overlay_btn)
+        toolbar_layout.addWidget(self.follow_btn)
         toolbar_layout.addStretch()
         
         # 添加截图快捷键
@@ -66,6 +203,14 @@ class MainWindow(QMainWindow):
         self.image_label.setAlignment(Qt.AlignCenter)
         self.image_label.setFrameShape(QFrame.Box)
         self.image_label.setMinimumHeight(200)
+        self.word_overlay = WordOverlay(self.image_label)
+        
+        # 原图选词模式下截图按原始分辨率显示，可以滚动
+        self.image_area = QScrollArea()
+        self.image_area.setWidget(self.image_label)
+        self.image_area.setWidgetResizable(True)
+        self.image_area.setFrameShape(QFrame.NoFrame)
+        self.image_area.setMaximumHeight(self.PREVIEW_HEIGHT + 20)
         
         # 文本块区域
         self.text_block_area = QScrollArea()
@@ -73,12 +218,15 @@ class MainWindow(QMainWindow):
         self.text_block_area.setWidget(self.text_block_widget)
         self.text_block_area.setWidgetResizable(True)
         
-        left_layout.addWidget(self.image_label)
+        left_layout.addWidget(self.image_area)
         left_layout.addWidget(self.text_block_area, 1)  # 1表示可拉伸
         
         # 右侧区域 - 聊天区域
         self.chat_widget = ChatWidget()
         
+        # 单击单词时弹出的词典卡片
+        self.word_card = WordCard(self)
+        
         # 添加到分割器
         splitter.addWidget(left_widget)
         splitter.addWidget(self.chat_widget)
@@ -93,7 +241,14 @@ class MainWindow(QMainWindow):
     def setup_connections(self):
         self.screenshot_btn.clicked.connect(self.take_screenshot)
         self.ask_ai_btn.clicked.connect(self.ask_ai)
+        self.vocabulary_btn.clicked.connect(self.explain_selected_words)
         self.text_block_widget.word_selected.connect(self.on_word_selected)
+        # 文本块和原图选词层的选择互相同步（单词下标一致）
+        self.text_block_widget.token_toggled.connect(self.word_overlay.set_selected)
+        self.word_overlay.word_toggled.connect(self.text_block_widget.set_selected)
+        self.text_block_widget.token_toggled.connect(self.show_word_card)
+        self.overlay_btn.toggled.connect(self.set_overlay_mode)
+        self.follow_btn.toggled.connect(self.set_follow_mode)
         self.translate_btn.clicked.connect(self.translate_full_text)
     
     def take_screenshot(self):
@@ -123,32 +278,223 @@ class MainWindow(QMainWindow):
         self.showNormal()
         self.activateWindow()  # 确保窗口获得焦点
         
-        # 显示截图
-        scaled_pixmap = pixmap.scaled(
-            self.image_label.width(), 
-            200, 
-            Qt.KeepAspectRatio, 
-            Qt.SmoothTransformation
-        )
-        self.image_label.setPixmap(scaled_pixmap)
-        self.image_label.setAlignment(Qt.AlignCenter)
+        # 新的截图区域：停止跟随上一个区域
+        self.follow_btn.setChecked(False)
+        self.follow_btn.setEnabled(True)
         
         # 保存原始截图，方便处理
         self.original_pixmap = pixmap
         
-        # OCR处理
+        # 显示截图（单词位置在识别完成后才有）
+        self.word_overlay.set_layout(None)
+        self.show_capture()
+        
+        # OCR处理（后台线程）
+        self.start_ocr(pixmap)
+    
+    def show_capture(self):
+        """显示截图：原图选词模式下按原始分辨率显示，否则显示缩略图"""
+        if self.original_pixmap is None:
+            return
+        
+        if self.overlay_btn.isChecked():
+            self.image_label.setPixmap(self.original_pixmap)
+        else:
+            scaled_pixmap = self.original_pixmap.scaled(
+                self.image_label.width(), 
+                self.PREVIEW_HEIGHT, 
+                Qt.KeepAspectRatio, 
+                Qt.SmoothTransformation
+            )
+            self.image_label.setPixmap(scaled_pixmap)
+        self.image_label.setAlignment(Qt.AlignCenter)
+        self.word_overlay.update_geometry()
+    
+    def set_overlay_mode(self, enabled):
+        """切换原图选词模式：截图占据文本块的位置，单词直接在截图上点击"""
+        self.text_block_area.setVisible(not enabled)
+        self.image_area.setMaximumHeight(16777215 if enabled else self.PREVIEW_HEIGHT + 20)
+        self.word_overlay.setVisible(enabled)
+        self.show_capture()
+    
+    def start_ocr(self, pixmap):
+        """取消尚未完成的OCR任务，并在线程池中开始新的任务"""
+        if self.ocr_job is not None:
+            self.ocr_job.cancel()
+        
+        self.ocr_job_id += 1
+        self.ocr_job = OCRJob(self.ocr_job_id, self.ocr_handler, pixmap.toImage())
+        self.ocr_job.signals.progress.connect(self.on_ocr_progress)
+        self.ocr_job.signals.partial.connect(self.on_ocr_partial)
+        self.ocr_job.signals.finished.connect(self.on_ocr_finished)
+        
         self.statusBar().showMessage("正在识别文本...")
-        QApplication.processEvents()  # 更新UI
+        self.ocr_progress.setRange(0, 0)  # 第一个策略完成前显示为忙碌状态
+        self.ocr_progress.show()
+        
+        self.ocr_pool.start(self.ocr_job)
+    
+    @Slot(int, int, int)
+    def on_ocr_progress(self, job_id, done, total):
+        if job_id != self.ocr_job_id:
+            return
+        self.ocr_progress.setRange(0, total)
+        self.ocr_progress.setValue(done)
+    
+    @Slot(int, str)
+    def on_ocr_partial(self, job_id, text):
+        """大截图分块识别时，已经识别出的部分先显示出来，可以立即点击"""
+        if job_id != self.ocr_job_id:
+            return
+        self.set_recognized_text(text)
+    
+    @Slot(int, str, object)
+    def on_ocr_finished(self, job_id, text, result):
+        # 忽略已被新截图取代的任务
+        if job_id != self.ocr_job_id:
+            return
+        
+        self.ocr_job = None
+        self.ocr_progress.hide()
+        self.set_recognized_text(text)
+        
+        # 单词位置：只有与文本块的单词一一对应时才启用原图选词
+        layout = result.layout if result is not None else None
+        tokens = self.text_block_widget.tokens
+        if layout is not None and layout.words == [token.text for token in tokens]:
+            self.word_overlay.set_layout(layout, self.original_pixmap.devicePixelRatio())
+            for index, token in enumerate(tokens):
+                if token.selected:
+                    self.word_overlay.set_selected(index, True)
+            self.overlay_btn.setEnabled(True)
+        else:
+            self.word_overlay.set_layout(None)
+            self.overlay_btn.setChecked(False)
+            self.overlay_btn.setEnabled(False)
+        self.translate_btn.setEnabled(True)
         
-        text = self.ocr_handler.process_image(pixmap)
+        # 显示OCR缓存命中情况
+        stats = self.ocr_handler.cache.stats()
+        source = "缓存" if result is not None and result.from_cache else "识别"
+        self.statusBar().showMessage(
+            f"文本识别完成（{source}，缓存命中 {stats['hits']} / 未命中 {stats['misses']}）", 3000
+        )
+    
+    def set_recognized_text(self, text):
+        """显示识别出的文本（文本块做差异更新），重新识别时保留仍然存在的单词上的选择"""
         self.text_block_widget.set_text(text)
+        self.selected_words = self.text_block_widget.selected_words()
+        self.ask_ai_btn.setEnabled(len(self.selected_words) > 0)
+        self.vocabulary_btn.setEnabled(len(self.selected_words) > 0)
+    
+    def set_follow_mode(self, enabled):
+        """开始或停止跟随上次截图的区域"""
+        # 进行中的识别结果不再使用
+        self.watch_job_id += 1
+        if self.watch_job is not None:
+            self.watch_job.cancel()
+            self.watch_job = None
         
-        # 重置选择
-        self.selected_words = []
-        self.ask_ai_btn.setEnabled(False)
+        if not enabled:
+            self.watch_timer.stop()
+            self.watch_session = None
+            self.watch_image = None
+            self.statusBar().showMessage("已停止跟随", 3000)
+            return
+        
+        if self.screenshot_widget.capture_region.isEmpty():
+            self.follow_btn.setChecked(False)
+            return
+        
+        # 跟随的第一帧会重新识别整个区域，不再需要截图的识别结果
+        if self.ocr_job is not None:
+            self.ocr_job.cancel()
+            self.ocr_job = None
+            self.ocr_job_id += 1
+            self.ocr_progress.hide()
+        
+        # 跟随时单词位置随滚动变化，原图选词不可用
+        self.overlay_btn.setChecked(False)
+        self.overlay_btn.setEnabled(False)
+        self.word_overlay.set_layout(None)
+        
+        self.watch_session = WatchSession()
+        self.watch_image = None
+        self.watch_timer.start()
+        self.statusBar().showMessage("跟随中：滚动文档时自动识别新内容")
+    
+    def watch_tick(self):
+        """跟随模式的一帧：重新截图，与上一帧比较，只识别变化的条带"""
+        # 上一帧还在识别时跳过，下一帧与最后识别的一帧比较
+        if self.watch_session is None or self.watch_job is not None:
+            return
+        
+        pixmap = grab_screen_region(self.screenshot_widget.capture_region)
+        if pixmap is None or pixmap.isNull():
+            return
+        image = pixmap.toImage()
+        if image == self.watch_image:
+            return
+        self.watch_image = image
+        
+        change, strips = self.watch_session.plan(gray_frame(image))
+        if change.kind == "same":
+            return
+        
+        self.original_pixmap = pixmap
+        self.show_capture()
+        if not strips:
+            self.set_recognized_text(self.watch_session.text())
+            return
+        
+        self.watch_job_id += 1
+        self.watch_job = WatchJob(self.watch_job_id, self.ocr_handler, image, strips)
+        self.watch_job.signals.finished.connect(self.on_watch_finished)
+        self.watch_job.signals.failed.connect(self.on_watch_failed)
+        self.ocr_pool.start(self.watch_job)
+        
+        rows = sum(bottom - top for top, bottom, _ in strips)
+        self.statusBar().showMessage(f"跟随中：识别 {rows} / {image.height()} 像素行")
+    
+    @Slot(int, object)
+    def on_watch_finished(self, job_id, results):
+        # 忽略跟随停止或重新开始之前的任务
+        if job_id != self.watch_job_id or self.watch_session is None:
+            return
+        
+        self.watch_job = None
+        for strip, lines in results:
+            self.watch_session.apply(strip, lines)
+        self.set_recognized_text(self.watch_session.text())
         self.translate_btn.setEnabled(True)
+    
+    @Slot(int, str)
+    def on_watch_failed(self, job_id, message):
+        if job_id != self.watch_job_id or self.watch_session is None:
+            return
         
-        self.statusBar().showMessage("文本识别完成", 3000)
+        # 帧比较的基准已经是这一帧，没识别的条带以后不会再被识别：
+        # 清空基准，下一帧整帧重新识别
+        self.watch_job = None
+        self.watch_session.differ.reset()
+        self.watch_image = None
+        self.statusBar().showMessage(f"跟随模式识别出错：{message}")
+    
+    def closeEvent(self, event):
+        # 退出前停止后台OCR并释放识别引擎
+        self.watch_timer.stop()
+        if self.watch_job is not None:
+            self.watch_job.cancel()
+        if self.ocr_job is not None:
+            self.ocr_job.cancel()
+        self.ocr_pool.waitForDone(2000)
+        self.ocr_handler.shutdown()
+        self.chat_widget.shutdown()
+        self.ai_handler.close()
+        self.word_card.hide()
+        if self.dictionary is not None:
+            self.dictionary.close()
+        super().closeEvent(event)
     
     def on_word_selected(self, word, is_selected):
         if is_selected and word not in self.selected_words:
@@ -158,6 +504,24 @@ class MainWindow(QMainWindow):
         
         # 至少选择了一个单词才能询问AI
         self.ask_ai_btn.setEnabled(len(self.selected_words) > 0)
+        self.vocabulary_btn.setEnabled(len(self.selected_words) > 0)
+    
+    def show_word_card(self, index, selected):
+        """选中单词时在单词下方显示本地词典的解释，不请求AI"""
+        if not selected:
+            self.word_card.hide_word(index)
+            return
+        
+        # 可分动词的前缀在分句末尾，只需要看后面的几个单词
+        words = [token.text for token in self.text_block_widget.tokens[index:index + 13]]
+        entries = self.dictionary.lookup(words[0], find_particle(words, 0)) if self.dictionary else []
+        cached = self.chat_widget.lookup_word(self.text_block_widget.get_full_text(), words[0])
+        
+        if self.overlay_btn.isChecked():
+            anchor = self.word_overlay.mapToGlobal(self.word_overlay.word_rect(index).bottomLeft())
+        else:
+            anchor = self.text_block_widget.mapToGlobal(self.text_block_widget.token_rect(index).bottomLeft())
+        self.word_card.show_word(index, entries, cached.meaning if cached else None, anchor)
     
     def ask_ai(self):
         if not self.selected_words:
@@ -165,12 +529,26 @@ class MainWindow(QMainWindow):
         
         selected_text = " ".join(self.selected_words)
         context = self.text_block_widget.get_full_text()
+        
+        # 选中的单词都已经解释过时在本地回答，不请求API
+        if all(self.chat_widget.lookup_word(context, word) for word in self.selected_words):
+            self.chat_widget.explain_words(context, self.selected_words)
+            return
 
-        prompt = f"请参考以下原文：{context}。在这段文本中，'{selected_text}' 的含义和用法是什么？"
+        # 原文作为上下文单独发送（见AIHandler._build_messages），这里只写问题
+        prompt = f"在这段文本中，'{selected_text}' 的含义和用法是什么？"
 
         # 发送到聊天窗口，AI会异步回复
         self.chat_widget.new_conversation(context, selected_text, prompt)
 
+    def explain_selected_words(self):
+        """一次请求解释所有选中的单词"""
+        if not self.selected_words:
+            return
+        
+        context = self.text_block_widget.get_full_text()
+        self.chat_widget.explain_words(context, self.selected_words)
+    
     def translate_full_text(self):
         """请求 AI 翻译 OCR 识别出的全部文本"""
         full_text = self.text_block_widget.get_full_text()
@@ -178,8 +556,8 @@ class MainWindow(QMainWindow):
             self.statusBar().showMessage("没有识别到文本可供翻译", 3000)
             return
 
-        # 准备翻译的 Prompt
-        prompt = f"请将以下德语文本翻译成中文，直接给出译文即可：\n\n{full_text}"
+        # 准备翻译的 Prompt（原文已作为上下文发送，不再重复）
+        prompt = "请将原文翻译成中文，直接给出译文即可。"
 
         # 使用 chat_widget 发起新对话进行翻译
         # 注意：这里复用了 new_conversation，上下文和选中词都设为全文，
@@ -1,16 +1,54 @@
 from PySide6.QtWidgets import QWidget, QApplication
-from PySide6.QtCore import Qt, Signal, QRect, QPoint, QPointF
-from PySide6.QtGui import QPainter, QColor, QBrush, QPen, QPixmap, QGuiApplication, QScreen
+from PySide6.QtCore import Qt, Signal, QRect, QRectF, QPoint, QPointF, QLine
+from PySide6.QtGui import QPainter, QColor, QBrush, QPen, QPixmap, QGuiApplication, QScreen, QRegion
+
+def grab_screen_region(region):
+    """
+    重新截取虚拟桌面逻辑坐标中的区域（跟随模式），返回原始分辨率的截图
+    
+    只截取该区域，不截取整个屏幕；区域不在任何屏幕上时返回None。
+    """
+    screen = QGuiApplication.screenAt(region.center())
+    if screen is None:
+        return None
+    geometry = screen.geometry()
+    return screen.grabWindow(0, region.x() - geometry.x(), region.y() - geometry.y(),
+                             region.width(), region.height())
+
+class ScreenGrab:
+    """
+    一个屏幕的截图
+    
+    geometry是屏幕在虚拟桌面中的逻辑坐标，pixmap是原始分辨率的截图，
+    dimmed是预先叠加了半透明遮罩的背景，拖动选择框时直接绘制，不用每帧重新叠加遮罩。
+    """
+    
+    def __init__(self, geometry, pixmap, background_color):
+        self.geometry = geometry
+        self.pixmap = pixmap
+        self.ratio = pixmap.width() / geometry.width() if geometry.width() else 1.0
+        
+        self.dimmed = QPixmap(pixmap)
+        painter = QPainter(self.dimmed)
+        painter.fillRect(QRectF(QPointF(), self.dimmed.deviceIndependentSize()), background_color)
+        painter.end()
+    
+    def source_rect(self, rect):
+        """逻辑坐标（相对屏幕左上角）的区域在截图中对应的像素区域"""
+        r = self.ratio
+        return QRectF(rect.x() * r, rect.y() * r, rect.width() * r, rect.height() * r)
 
 class ScreenshotWidget(QWidget):
     screenshot_taken = Signal(QPixmap)
     
+    MARK_SIZE = 6  # 选择框四角标记的长度
+    
     def __init__(self):
         super().__init__()
         
-        # 设置窗口属性
+        # 设置窗口属性：背景完全由截图绘制，不需要半透明窗口，也不需要Qt先擦除背景
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
-        self.setAttribute(Qt.WA_TranslucentBackground)  # 整个窗口背景透明
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
         self.setWindowState(Qt.WindowFullScreen)
         self.setCursor(Qt.CrossCursor)
         
@@ -24,34 +62,28 @@ class ScreenshotWidget(QWidget):
         
         # 选择框样式
         self.border_color = QColor(0, 174, 255)
+        self.border_pen = QPen(self.border_color, 2)
         self.mask_color = QColor(0, 120, 215, 30)  # 选择区域内的颜色，轻微蓝色半透明
         
-        # 捕获整个屏幕用于显示
-        self.screen_pixmap = None
-        self.screen = None
-        self.device_pixel_ratio = 1.0
+        # 各屏幕的截图（ScreenGrab），窗口覆盖整个虚拟桌面，origin是窗口左上角的虚拟桌面坐标
+        self.grabs = []
+        self.virtual_geometry = QRect()
+        self.origin = QPoint()
+        self.uncovered = QRegion()  # 虚拟桌面中没有屏幕的区域（各屏幕大小不同时）
+        
+        # 最近一次截图的区域（虚拟桌面逻辑坐标），跟随模式按该区域重新截图
+        self.capture_region = QRect()
         
         # 截图完成后延迟关闭的标志
         self.screenshot_completed = False
     
     def start_screenshot(self):
-        # 获取主屏幕
-        self.screen = QGuiApplication.primaryScreen()
-        if not self.screen:
+        # 捕获所有屏幕（每个屏幕按各自的原始分辨率）
+        screens = QGuiApplication.screens()
+        if not screens:
             return
         
-        # 获取设备像素比
-        self.device_pixel_ratio = self.screen.devicePixelRatio()
-        
-        # 捕获屏幕
-        geometry = self.screen.geometry()
-        self.screen_pixmap = self.screen.grabWindow(
-            0,
-            geometry.x(),
-            geometry.y(),
-            geometry.width(),
-            geometry.height()
-        )
+        self.set_grabs([(screen.geometry(), screen.grabWindow(0)) for screen in screens])
         
         # 清除选择区域
         self.start_point = QPoint()
@@ -59,36 +91,61 @@ class ScreenshotWidget(QWidget):
         self.is_drawing = False
         self.screenshot_completed = False
         
-        # 显示全屏窗口
-        self.showFullScreen()
+        # 单个屏幕时全屏显示，多个屏幕时窗口覆盖整个虚拟桌面
+        if len(self.grabs) == 1:
+            self.showFullScreen()
+        else:
+            self.setWindowState(Qt.WindowNoState)
+            self.setGeometry(self.virtual_geometry)
+            self.show()
         self.activateWindow()  # 确保窗口获得焦点
     
+    def set_grabs(self, grabs):
+        """设置截图：grabs为(屏幕的虚拟桌面逻辑坐标, 原始分辨率截图)列表"""
+        self.grabs = [ScreenGrab(geometry, pixmap, self.background_color) for geometry, pixmap in grabs]
+        
+        self.virtual_geometry = QRect()
+        for grab in self.grabs:
+            self.virtual_geometry = self.virtual_geometry.united(grab.geometry)
+        self.origin = self.virtual_geometry.topLeft()
+        
+        self.uncovered = QRegion(QRect(QPoint(), self.virtual_geometry.size()))
+        for grab in self.grabs:
+            self.uncovered -= QRegion(self.local_geometry(grab))
+    
+    def local_geometry(self, grab):
+        """屏幕在窗口中的位置"""
+        return grab.geometry.translated(-self.origin)
+    
     def paintEvent(self, event):
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
+        region = event.region()
+        selected_rect = self.get_selected_rect() if self.has_selection() else QRect()
         
-        # 绘制屏幕截图作为背景
-        if self.screen_pixmap:
-            painter.drawPixmap(self.rect(), self.screen_pixmap)
+        # 只绘制需要更新的区域：选择框外是预先变暗的背景，选择框内是原始截图
+        for grab in self.grabs:
+            local = self.local_geometry(grab)
+            for rect in region:
+                part = rect.intersected(local)
+                if part.isEmpty():
+                    continue
+                source = part.translated(-local.topLeft())
+                painter.drawPixmap(QRectF(part), grab.dimmed, grab.source_rect(source))
+                
+                inner = part.intersected(selected_rect)
+                if not inner.isEmpty():
+                    source = inner.translated(-local.topLeft())
+                    painter.drawPixmap(QRectF(inner), grab.pixmap, grab.source_rect(source))
+                    # 给选择区域添加轻微的蓝色遮罩
+                    painter.fillRect(inner, self.mask_color)
         
-        # 绘制半透明遮罩层
-        painter.fillRect(self.rect(), self.background_color)
+        for rect in region.intersected(self.uncovered):
+            painter.fillRect(rect, Qt.black)
         
         # 如果正在选择区域，绘制选择框
-        if not self.start_point.isNull() and not self.end_point.isNull():
-            selected_rect = self.get_selected_rect()
-            
-            # 绘制选择区域：透明显示原始内容
-            painter.setCompositionMode(QPainter.CompositionMode_Clear)
-            painter.fillRect(selected_rect, Qt.transparent)
-            painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
-            
-            # 给选择区域添加轻微的蓝色遮罩，但保持透明度
-            painter.fillRect(selected_rect, self.mask_color)
-            
+        if not selected_rect.isNull():
             # 绘制选择区域的边框
-            pen = QPen(self.border_color, 2)
-            painter.setPen(pen)
+            painter.setPen(self.border_pen)
             painter.drawRect(selected_rect)
             
             # 在选择框四角绘制标记点
@@ -97,77 +154,84 @@ class ScreenshotWidget(QWidget):
             # 显示尺寸信息
             self.draw_size_info(painter, selected_rect)
     
+    def has_selection(self):
+        return not self.start_point.isNull() and not self.end_point.isNull()
+    
+    def size_info_rect(self, rect):
+        """尺寸信息文字所在的区域（选择框右下角下方）"""
+        size_text = f"{rect.width()} × {rect.height()}"
+        text_rect = self.fontMetrics().boundingRect(size_text)
+        return size_text, text_rect.translated(rect.right() - 70, rect.bottom() + 20)
+    
     def draw_size_info(self, painter, rect):
         """绘制选择区域的尺寸信息"""
-        size_text = f"{rect.width()} × {rect.height()}"
+        size_text, text_rect = self.size_info_rect(rect)
         painter.setPen(Qt.white)
-        painter.drawText(
-            rect.right() - 70,  # 位置可以根据需要调整
-            rect.bottom() + 20,
-            size_text
-        )
+        painter.drawText(text_rect.left(), rect.bottom() + 20, size_text)
     
     def draw_corner_marks(self, painter, rect):
         """在选择框四角绘制标记点，增强视觉反馈"""
-        mark_size = 6
-        pen = QPen(self.border_color, 2)
-        painter.setPen(pen)
-        
-        # 左上角
-        painter.drawLine(rect.left(), rect.top(), rect.left() + mark_size, rect.top())
-        painter.drawLine(rect.left(), rect.top(), rect.left(), rect.top() + mark_size)
-        
-        # 右上角
-        painter.drawLine(rect.right(), rect.top(), rect.right() - mark_size, rect.top())
-        painter.drawLine(rect.right(), rect.top(), rect.right(), rect.top() + mark_size)
-        
-        # 左下角
-        painter.drawLine(rect.left(), rect.bottom(), rect.left() + mark_size, rect.bottom())
-        painter.drawLine(rect.left(), rect.bottom(), rect.left(), rect.bottom() - mark_size)
-        
-        # 右下角
-        painter.drawLine(rect.right(), rect.bottom(), rect.right() - mark_size, rect.bottom())
-        painter.drawLine(rect.right(), rect.bottom(), rect.right(), rect.bottom() - mark_size)
+        m = self.MARK_SIZE
+        left, top, right, bottom = rect.left(), rect.top(), rect.right(), rect.bottom()
+        painter.setPen(self.border_pen)
+        painter.drawLines([
+            # 左上角
+            QLine(left, top, left + m, top), QLine(left, top, left, top + m),
+            # 右上角
+            QLine(right, top, right - m, top), QLine(right, top, right, top + m),
+            # 左下角
+            QLine(left, bottom, left + m, bottom), QLine(left, bottom, left, bottom - m),
+            # 右下角
+            QLine(right, bottom, right - m, bottom), QLine(right, bottom, right, bottom - m),
+        ])
+    
+    def decoration_region(self, rect):
+        """选择框的边框、四角标记和尺寸信息占据的区域"""
+        region = QRegion(rect.adjusted(-2, -2, 2, 2))
+        inner = rect.adjusted(self.MARK_SIZE + 2, self.MARK_SIZE + 2, -self.MARK_SIZE - 2, -self.MARK_SIZE - 2)
+        if inner.isValid():
+            region -= QRegion(inner)
+        return region + QRegion(self.size_info_rect(rect)[1].adjusted(-2, -2, 2, 2))
+    
+    def damage_region(self, old_rect, new_rect):
+        """选择框从old_rect变为new_rect时需要重绘的区域：明暗发生变化的部分和前后两次的边框"""
+        region = QRegion(old_rect).xored(QRegion(new_rect))
+        for rect in (old_rect, new_rect):
+            if not rect.isNull():
+                region += self.decoration_region(rect)
+        return region
     
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
-            # 考虑设备像素比
+            old_rect = self.get_selected_rect() if self.has_selection() else QRect()
             pos = event.position()
             self.start_point = QPoint(int(pos.x()), int(pos.y()))
             self.end_point = self.start_point
             self.is_drawing = True
-            self.update()
+            self.update(self.damage_region(old_rect, self.get_selected_rect()))
     
     def mouseMoveEvent(self, event):
         if self.is_drawing:
-            # 考虑设备像素比
+            old_rect = self.get_selected_rect()
             pos = event.position()
             self.end_point = QPoint(int(pos.x()), int(pos.y()))
-            self.update()
+            self.update(self.damage_region(old_rect, self.get_selected_rect()))
     
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.LeftButton and self.is_drawing:
-            # 考虑设备像素比
             pos = event.position()
             self.end_point = QPoint(int(pos.x()), int(pos.y()))
             self.is_drawing = False
             
             # 如果选择了有效区域，则捕获该区域
-            if not self.start_point.isNull() and not self.end_point.isNull():
+            if self.has_selection():
                 selected_rect = self.get_selected_rect()
                 
                 # 最小尺寸检查
                 if selected_rect.width() > 10 and selected_rect.height() > 10:
-                    # 考虑设备像素比进行截图
-                    scaled_rect = QRect(
-                        int(selected_rect.x() * self.device_pixel_ratio),
-                        int(selected_rect.y() * self.device_pixel_ratio),
-                        int(selected_rect.width() * self.device_pixel_ratio),
-                        int(selected_rect.height() * self.device_pixel_ratio)
-                    )
-                    
-                    # 从原始屏幕截图中提取选择的区域
-                    capture = self.screen_pixmap.copy(scaled_rect)
+                    capture = self.crop(selected_rect)
+                    if capture is None:
+                        return
                     
                     # 标记截图已完成
                     self.screenshot_completed = True
@@ -176,6 +240,25 @@ class ScreenshotWidget(QWidget):
                     self.screenshot_taken.emit(capture)
                     self.hide()
     
+    def crop(self, rect):
+        """
+        从原始分辨率的截图中裁剪选择区域（只复制该区域的像素）
+        
+        选择框跨越多个屏幕时使用重叠面积最大的屏幕，裁剪到该屏幕的范围内。
+        """
+        best, best_area = None, 0
+        for grab in self.grabs:
+            part = rect.intersected(self.local_geometry(grab))
+            if part.width() * part.height() > best_area:
+                best, best_area = grab, part.width() * part.height()
+        if best is None:
+            return None
+        
+        local = self.local_geometry(best)
+        self.capture_region = rect.intersected(local).translated(self.origin)
+        source = best.source_rect(rect.intersected(local).translated(-local.topLeft())).toAlignedRect()
+        return best.pixmap.copy(source.intersected(best.pixmap.rect()))
+    
     def keyPressEvent(self, event):
         # ESC键退出截图
         if event.key() == Qt.Key_Escape:
@@ -191,4 +274,4 @@ class ScreenshotWidget(QWidget):
         width = abs(x2 - x1)
         height = abs(y2 - y1)
         
-        return QRect(x, y, width, height) 
\ No newline at end of file
+        return QRect(x, y, width, height)
\ No newline at end of file
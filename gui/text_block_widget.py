@@ -1,161 +1,393 @@
-from PySide6.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, QLabel, QFrame, QScrollArea
-from PySide6.QtCore import Qt, Signal, QSize, QMargins
-from PySide6.QtGui import QFont, QColor
-
-class WordButton(QLabel):
-    clicked = Signal(str, bool)  # 单词, 是否选中
-    
-    def __init__(self, word, parent=None):
-        super().__init__(parent)
-        
-        self.word = word
+from bisect import bisect_left, bisect_right
+from difflib import SequenceMatcher
+
+from PySide6.QtWidgets import QWidget
+from PySide6.QtCore import Qt, Signal, QSize, QRect, QRectF
+from PySide6.QtGui import QColor, QPainter, QPen, QBrush, QFontMetrics, QPalette
+
+
+# 单词的外观：状态 -> (背景色, 边框色)，在TextBlockWidget中统一转换为画笔和画刷
+WORD_STYLES = {
+    "normal": ("white", "#cccccc"),
+    "hover": ("#f0f0f0", "#cccccc"),
+    "selected": ("#e1f5fe", "#4fc3f7"),
+}
+
+
+class Token:
+    """文本块中的一个单词及其布局信息"""
+
+    __slots__ = ("text", "line", "selected", "x", "width", "row")
+
+    def __init__(self, text, line):
+        self.text = text
+        self.line = line        # 所在的OCR文本行
         self.selected = False
-        
-        self.setText(word)
-        self.setContentsMargins(5, 2, 5, 2)
-        self.setAlignment(Qt.AlignCenter)
-        self.setFrameShape(QFrame.Box)
-        self.setStyleSheet(
-            "background-color: white; border: 1px solid #cccccc; border-radius: 3px;"
-        )
-        
-        # 设置鼠标悬停效果
-        self.setMouseTracking(True)
-    
-    def mouseReleaseEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            self.toggle_selected()
-            self.clicked.emit(self.word, self.selected)
-        
-        super().mouseReleaseEvent(event)
-    
-    def enterEvent(self, event):
-        if not self.selected:
-            self.setStyleSheet(
-                "background-color: #f0f0f0; border: 1px solid #cccccc; border-radius: 3px;"
-            )
-        super().enterEvent(event)
-    
-    def leaveEvent(self, event):
-        if not self.selected:
-            self.setStyleSheet(
-                "background-color: white; border: 1px solid #cccccc; border-radius: 3px;"
-            )
-        super().leaveEvent(event)
-    
-    def toggle_selected(self):
-        self.selected = not self.selected
-        self.update_style()
-    
-    def set_selected(self, selected):
-        self.selected = selected
-        self.update_style()
-    
-    def update_style(self):
-        if self.selected:
-            self.setStyleSheet(
-                "background-color: #e1f5fe; border: 1px solid #4fc3f7; border-radius: 3px;"
-            )
-        else:
-            self.setStyleSheet(
-                "background-color: white; border: 1px solid #cccccc; border-radius: 3px;"
-            )
+        self.x = 0              # 布局后的位置（像素）
+        self.width = 0
+        self.row = 0            # 布局后所在的显示行
+
 
 class TextBlockWidget(QWidget):
+    """
+    可点击的文本块
+
+    所有单词都画在这一个控件上：用QFontMetrics排版，点击时按缓存的位置做命中测试，
+    绘制时只画与需要重绘区域相交的行，不再为每个单词创建QLabel。
+    """
+
     word_selected = Signal(str, bool)  # 单词, 是否选中
-    
+    token_toggled = Signal(int, bool)  # 单词下标, 是否选中（与OCRLayout中的下标一致）
+
+    # 排版参数（与原来的单词按钮外观一致）
+    MARGIN = 10          # 控件边距
+    PADDING_X = 5        # 单词左右内边距
+    PADDING_Y = 2        # 单词上下内边距
+    WORD_SPACING = 5     # 同一行单词间距
+    ROW_SPACING = 10     # 行间距
+
     def __init__(self, parent=None):
         super().__init__(parent)
-        
-        self.layout = QVBoxLayout(self)
-        self.layout.setSpacing(10)
-        self.layout.setContentsMargins(10, 10, 10, 10)
-        
-        self.word_buttons = []
+
+        self.tokens = []
         self.full_text = ""
-        
+
+        # 布局结果：每个显示行的顶部y坐标和第一个单词的下标
+        self.row_tops = []
+        self.row_starts = []
+        self.row_height = 0
+        self.layout_width = 0
+
+        self.hover_index = -1
+        self.press_index = -1
+
+        # 单词宽度缓存（同一字体下相同单词只测量一次）
+        self._width_cache = {}
+
+        # 各状态的画笔和画刷，只在创建和调色板变化时生成一次
+        self.word_styles = dict(WORD_STYLES)
+        self._styles = {}
+        self._text_pen = QPen()
+        self.update_styles()
+
+        self.setMouseTracking(True)
+
         # 设置固定宽度
         self.setMinimumWidth(400)
         self.setMaximumWidth(600)
-    
+
     def set_text(self, text):
-        # 清除旧内容
-        self.clear()
+        """
+        显示新的文本
+
+        与当前内容做单词级的差异比较：相同的单词复用原来的Token（保留选中状态），
+        只插入或删除变化的部分。从第一个变化的位置开始重新排版，到变化部分之后
+        排版不再改变的位置为止，其后的单词只平移行号。
+        """
+        words = self._tokenize(text)
+        if not words or not self.tokens:
+            # 清除旧内容
+            self.clear()
+            self.full_text = text
+            self.tokens = [Token(word, line) for word, line in words]
+            if self.tokens:
+                self.relayout()
+            return
+
         self.full_text = text
-        
+        old = self.tokens
+
+        # 公共前缀（单词和所在行都相同）的排版不会变化
+        prefix = 0
+        limit = min(len(old), len(words))
+        while prefix < limit and old[prefix].text == words[prefix][0] and old[prefix].line == words[prefix][1]:
+            prefix += 1
+
+        # 公共后缀只比较单词，行号随后更新
+        suffix = 0
+        while suffix < limit - prefix and old[-1 - suffix].text == words[-1 - suffix][0]:
+            suffix += 1
+
+        # 中间变化的部分做LCS比较
+        old_middle = old[prefix:len(old) - suffix]
+        new_middle = words[prefix:len(words) - suffix]
+        matcher = SequenceMatcher(
+            None, [token.text for token in old_middle], [word for word, _ in new_middle], autojunk=False
+        )
+
+        tokens = old[:prefix]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                tokens.extend(old_middle[i1:i2])
+            else:
+                tokens.extend(Token(word, line) for word, line in new_middle[j1:j2])
+        tokens.extend(old[len(old) - suffix:])
+
+        # 后缀中从某个位置起OCR行的分界都与原来相同时，其中从新的OCR行开始的单词
+        # 之后的排版与原来一致（每个OCR行都从新的显示行开始），排版到这里即可
+        shift = len(tokens) - len(old)
+        resume = None
+        for index in range(len(tokens) - 1, len(tokens) - suffix - 1, -1):
+            if index < 1 or index - shift < 1:
+                break
+            old_break = old[index - shift].line != old[index - shift - 1].line
+            new_break = words[index][1] != words[index - 1][1]
+            if old_break != new_break:
+                break
+            if new_break:
+                resume = index
+
+        for token, (_, line) in zip(tokens[prefix:], words[prefix:]):
+            token.line = line
+
+        self.tokens = tokens
+        self.hover_index = -1
+        self.press_index = -1
+        self.relayout(prefix, resume, shift)
+
+    def _tokenize(self, text):
+        """按行分割文本，使用空格分割单词，返回[(单词, 行号)]"""
         if not text:
+            return []
+        return [
+            (word, line_number)
+            for line_number, line in enumerate(text.split("\n"))
+            for word in line.split()
+        ]
+
+    def relayout(self, start=0, resume=None, shift=0):
+        """
+        根据当前宽度重新排版，start之前的单词保持原来的位置
+
+        resume为set_text差异更新时排版与原来相同的第一个单词（shift为其下标的变化量）：
+        排到这里就停止，之后的单词保持原来的位置，只平移行号。
+        """
+        metrics = QFontMetrics(self.font())
+        if self._width_cache and self._width_cache.get(None) != self.font().key():
+            self._width_cache = {}
+        self._width_cache[None] = self.font().key()
+
+        self.row_height = metrics.height() + 2 * self.PADDING_Y + 2  # 2为边框
+        max_right = max(self.width(), self.minimumWidth()) - self.MARGIN
+
+        if start > 0 and self.layout_width == self.width() and self.row_tops:
+            # 从start前一个单词所在的行继续排版
+            previous = self.tokens[start - 1]
+            row = previous.row
+            old_row_starts = self.row_starts[row + 1:]
+            del self.row_tops[row + 1:]
+            del self.row_starts[row + 1:]
+            x = previous.x + previous.width + self.WORD_SPACING
+            line = previous.line
+        else:
+            start = 0
+            resume = None
+            self.row_tops = []
+            self.row_starts = []
+            row = -1
+            x = 0
+            line = None
+        self.layout_width = self.width()
+
+        for index in range(start, len(self.tokens)):
+            token = self.tokens[index]
+            if index == resume:
+                self._shift_rows(index, row, old_row_starts[token.row - previous.row - 1:], shift)
+                break
+
+            width = self._width_cache.get(token.text)
+            if width is None:
+                width = metrics.horizontalAdvance(token.text) + 2 * self.PADDING_X + 2
+                self._width_cache[token.text] = width
+            token.width = width
+
+            # OCR的每一行从新的显示行开始；超出宽度时换行
+            if token.line != line or (x + width > max_right and x > self.MARGIN):
+                row += 1
+                self.row_tops.append(self.MARGIN + row * (self.row_height + self.ROW_SPACING))
+                self.row_starts.append(index)
+                x = self.MARGIN
+                line = token.line
+
+            token.x = x
+            token.row = row
+            x += width + self.WORD_SPACING
+
+        content_height = self.MARGIN * 2
+        if self.row_tops:
+            content_height += len(self.row_tops) * (self.row_height + self.ROW_SPACING) - self.ROW_SPACING
+        self.setMinimumHeight(content_height)
+        self.update()
+
+    def _shift_rows(self, index, row, old_row_starts, shift):
+        """从第index个单词开始沿用原来的排版：其后各显示行接在第row行之后"""
+        delta = row + 1 - self.tokens[index].row
+        if delta:
+            for token in self.tokens[index:]:
+                token.row += delta
+        for row_start in old_row_starts:
+            row += 1
+            self.row_tops.append(self.MARGIN + row * (self.row_height + self.ROW_SPACING))
+            self.row_starts.append(row_start + shift)
+
+    def token_rect(self, index):
+        token = self.tokens[index]
+        return QRect(token.x, self.row_tops[token.row], token.width, self.row_height)
+
+    def token_at(self, pos):
+        """返回位置pos处单词的下标，没有单词时返回-1"""
+        if not self.row_tops:
+            return -1
+
+        row = bisect_right(self.row_tops, pos.y()) - 1
+        if row < 0 or pos.y() >= self.row_tops[row] + self.row_height:
+            return -1
+
+        start = self.row_starts[row]
+        end = self.row_starts[row + 1] if row + 1 < len(self.row_starts) else len(self.tokens)
+
+        # 行内按x坐标二分查找
+        lo, hi = start, end
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.tokens[mid].x + self.tokens[mid].width <= pos.x():
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < end and self.tokens[lo].x <= pos.x():
+            return lo
+        return -1
+
+    def paintEvent(self, event):
+        if not self.tokens:
             return
-        
-        # 按行分割文本
-        lines = text.split("\n")
-        current_line_widget = None
-        current_line_layout = None
-        current_line_width = 0
-        max_line_width = 550  # 最大行宽（像素）
-        
-        for line in lines:
-            if not line.strip():
-                continue
-            
-            # 创建新行
-            current_line_widget = QWidget()
-            current_line_layout = QHBoxLayout(current_line_widget)
-            current_line_layout.setSpacing(5)
-            current_line_layout.setContentsMargins(0, 0, 0, 0)
-            current_line_width = 0
-            
-            # 使用空格分割单词
-            words = line.split()
-            
-            for word in words:
-                word_btn = WordButton(word)
-                word_btn.clicked.connect(self.on_word_clicked)
-                
-                # 计算单词按钮的宽度
-                word_width = word_btn.sizeHint().width()
-                
-                # 如果当前行宽度加上新单词会超出限制，创建新行
-                if current_line_width + word_width > max_line_width:
-                    # 添加当前行到布局
-                    current_line_layout.addStretch(1)
-                    self.layout.addWidget(current_line_widget)
-                    
-                    # 创建新行
-                    current_line_widget = QWidget()
-                    current_line_layout = QHBoxLayout(current_line_widget)
-                    current_line_layout.setSpacing(5)
-                    current_line_layout.setContentsMargins(0, 0, 0, 0)
-                    current_line_width = 0
-                
-                # 添加单词到当前行
-                current_line_layout.addWidget(word_btn)
-                current_line_width += word_width + 5  # 5是间距
-                self.word_buttons.append(word_btn)
-            
-            # 添加最后一行
-            if current_line_widget:
-                current_line_layout.addStretch(1)
-                self.layout.addWidget(current_line_widget)
-        
-        # 添加弹性空间，使所有内容靠上对齐
-        self.layout.addStretch(1)
-    
-    def on_word_clicked(self, word, selected):
+
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        # 只绘制与重绘区域相交的行
+        exposed = event.rect()
+        first_row = max(0, bisect_left(self.row_tops, exposed.top() - self.row_height))
+        last_row = bisect_right(self.row_tops, exposed.bottom())
+
+        for row in range(first_row, last_row):
+            start = self.row_starts[row]
+            end = self.row_starts[row + 1] if row + 1 < len(self.row_starts) else len(self.tokens)
+            for index in range(start, end):
+                token = self.tokens[index]
+                if token.x > exposed.right() or token.x + token.width < exposed.left():
+                    continue
+                self.paint_token(painter, index)
+
+    def update_styles(self, styles=None):
+        """
+        根据word_styles生成各状态的画笔和画刷
+
+        悬停和选中只改变状态并重绘对应的矩形，不会像setStyleSheet那样重新解析样式。
+        """
+        if styles:
+            self.word_styles.update(styles)
+
+        self._styles = {
+            state: (QPen(QColor(border), 1), QBrush(QColor(background)))
+            for state, (background, border) in self.word_styles.items()
+        }
+        self._text_pen = QPen(self.palette().color(QPalette.WindowText))
+        self.update()
+
+    def paint_token(self, painter, index):
+        token = self.tokens[index]
+        rect = QRectF(self.token_rect(index)).adjusted(0.5, 0.5, -0.5, -0.5)
+
+        if token.selected:
+            border, background = self._styles["selected"]
+        elif index == self.hover_index:
+            border, background = self._styles["hover"]
+        else:
+            border, background = self._styles["normal"]
+
+        painter.setPen(border)
+        painter.setBrush(background)
+        painter.drawRoundedRect(rect, 3, 3)
+
+        painter.setPen(self._text_pen)
+        painter.drawText(rect, Qt.AlignCenter, token.text)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.tokens and self.width() != self.layout_width:
+            self.relayout()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == event.Type.FontChange and self.tokens:
+            self.relayout()
+        elif event.type() == event.Type.PaletteChange:
+            self.update_styles()
+
+    def mouseMoveEvent(self, event):
+        self.set_hover_index(self.token_at(event.position().toPoint()))
+        super().mouseMoveEvent(event)
+
+    def leaveEvent(self, event):
+        self.set_hover_index(-1)
+        super().leaveEvent(event)
+
+    def set_hover_index(self, index):
+        if index == self.hover_index:
+            return
+
+        # 只重绘离开和进入的两个单词
+        if self.hover_index >= 0:
+            self.update(self.token_rect(self.hover_index))
+        self.hover_index = index
+        if index >= 0:
+            self.update(self.token_rect(index))
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.press_index = self.token_at(event.position().toPoint())
+        event.accept()
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            index = self.token_at(event.position().toPoint())
+            # 与原来的按钮一样：在同一个单词上按下并松开才算点击
+            if index >= 0 and index == self.press_index:
+                self.toggle_selected(index)
+            self.press_index = -1
+        event.accept()
+
+    def toggle_selected(self, index):
+        self.set_selected(index, not self.tokens[index].selected)
+
+    def set_selected(self, index, selected):
+        token = self.tokens[index]
+        if token.selected == selected:
+            return
+        token.selected = selected
+        self.update(self.token_rect(index))
+
         # 转发信号
-        self.word_selected.emit(word, selected)
-    
+        self.word_selected.emit(token.text, token.selected)
+        self.token_toggled.emit(index, token.selected)
+
+    def selected_words(self):
+        """按文本顺序返回当前选中的单词（同一个单词在多处选中时只返回一次）"""
+        return list(dict.fromkeys(token.text for token in self.tokens if token.selected))
+
     def clear(self):
-        # 清除所有文本块和单词按钮
-        self.word_buttons.clear()
-        
-        # 删除所有子部件
-        while self.layout.count():
-            item = self.layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-    
+        # 清除所有单词
+        self.tokens = []
+        self.row_tops = []
+        self.row_starts = []
+        self.hover_index = -1
+        self.press_index = -1
+        self.setMinimumHeight(0)
+        self.update()
+
     def get_full_text(self):
         return self.full_text
-    
+
     def sizeHint(self):
-        return QSize(500, 400) 
\ No newline at end of file
+        return QSize(500, 400)
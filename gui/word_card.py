@@ -0,0 +1,71 @@
+import html
+
+from PySide6.QtWidgets import QLabel
+from PySide6.QtCore import Qt, QTimer, QPoint
+
+
+class WordCard(QLabel):
+    """
+    单击单词时在单词下方弹出的词典卡片
+
+    显示本地词典（utils/dictionary.py）查到的原形、性、词性和释义，以及批量解释中
+    缓存的语境含义。卡片是不获取焦点的提示窗口，几秒后或取消选择单词时自动隐藏。
+    """
+
+    HIDE_AFTER_MS = 6000
+
+    def __init__(self, parent=None):
+        super().__init__(parent, Qt.ToolTip | Qt.FramelessWindowHint)
+        self.setAttribute(Qt.WA_ShowWithoutActivating)
+        self.setTextFormat(Qt.RichText)
+        self.setWordWrap(True)
+        self.setMaximumWidth(360)
+        self.setStyleSheet("""
+            QLabel {
+                background-color: #fffde7;
+                border: 1px solid #d4c98a;
+                border-radius: 4px;
+                padding: 6px;
+                color: #333333;
+            }
+        """)
+
+        self.index = -1  # 卡片对应的单词下标
+        self.hide_timer = QTimer(self)
+        self.hide_timer.setSingleShot(True)
+        self.hide_timer.timeout.connect(self.hide)
+
+    def show_word(self, index, entries, context_meaning, global_pos):
+        """
+        在global_pos（单词左下角的全局坐标）显示卡片
+
+        entries为DictionaryEntry列表，context_meaning为缓存的语境含义（可为None）。
+        两者都没有时不显示。
+        """
+        if not entries and not context_meaning:
+            self.hide_word(self.index)
+            return
+
+        lines = []
+        for entry in entries:
+            lines.append(
+                f"<b>{html.escape(entry.headword)}</b>"
+                f" <span style='color: #888888;'>{html.escape(entry.pos_name)}</span>"
+                f"<br>{html.escape(entry.gloss)}"
+            )
+        if context_meaning:
+            lines.append(f"<span style='color: #00897b;'>语境：{html.escape(context_meaning)}</span>")
+
+        self.index = index
+        self.setText("<br>".join(lines))
+        self.adjustSize()
+        self.move(global_pos + QPoint(0, 4))
+        self.show()
+        self.hide_timer.start(self.HIDE_AFTER_MS)
+
+    def hide_word(self, index):
+        """取消选择单词时隐藏它的卡片"""
+        if index == self.index:
+            self.hide_timer.stop()
+            self.hide()
+            self.index = -1
@@ -0,0 +1,130 @@
+import numpy as np
+
+from PySide6.QtWidgets import QWidget
+from PySide6.QtCore import Qt, Signal, QEvent, QRectF
+from PySide6.QtGui import QColor, QPainter, QPen, QBrush
+
+
+class WordOverlay(QWidget):
+    """
+    覆盖在原始截图上的透明选词层
+
+    作为QLabel的子控件，覆盖在标签显示的截图上，按OCRLayout中的单词位置做命中测试，
+    只绘制选中和悬停的单词。单词位置是截图的物理像素坐标，按设备像素比换算成控件坐标。
+    """
+
+    word_toggled = Signal(int, bool)  # 单词下标, 是否选中
+
+    def __init__(self, label):
+        super().__init__(label)
+        self.label = label
+        self.layout_data = None
+        self.selected = np.zeros(0, dtype=bool)
+        self.hover_index = -1
+        self.press_index = -1
+        self.ratio = 1.0  # 截图的设备像素比
+
+        self.hover_brush = QBrush(QColor(0, 0, 0, 30))
+        self.selected_brush = QBrush(QColor(79, 195, 247, 90))
+        self.selected_pen = QPen(QColor("#4fc3f7"), 1)
+
+        self.setMouseTracking(True)
+        self.setCursor(Qt.PointingHandCursor)
+        self.hide()
+
+        # 标签尺寸变化时重新对齐到截图位置
+        label.installEventFilter(self)
+
+    def set_layout(self, layout, ratio=1.0):
+        """设置单词版面（OCRLayout，可为None），清空选择"""
+        self.layout_data = layout
+        self.ratio = ratio or 1.0
+        self.selected = np.zeros(len(layout) if layout is not None else 0, dtype=bool)
+        self.hover_index = -1
+        self.press_index = -1
+        self.update_geometry()
+        self.update()
+
+    def set_selected(self, index, selected):
+        """同步其他控件中的选择，不发出信号"""
+        if 0 <= index < len(self.selected) and self.selected[index] != selected:
+            self.selected[index] = selected
+            self.update(self.word_rect(index))
+
+    def eventFilter(self, obj, event):
+        if obj is self.label and event.type() == QEvent.Resize:
+            self.update_geometry()
+        return False
+
+    def update_geometry(self):
+        """覆盖层与标签中居中显示的截图对齐"""
+        pixmap = self.label.pixmap()
+        if pixmap is None or pixmap.isNull():
+            return
+        size = pixmap.deviceIndependentSize().toSize()
+        x = max(0, (self.label.width() - size.width()) // 2)
+        y = max(0, (self.label.height() - size.height()) // 2)
+        self.setGeometry(x, y, size.width(), size.height())
+
+    def word_rect(self, index):
+        left, top, right, bottom = self.layout_data.boxes[index] / self.ratio
+        return QRectF(left, top, right - left, bottom - top).toAlignedRect().adjusted(-1, -1, 1, 1)
+
+    def word_at(self, pos):
+        if self.layout_data is None:
+            return -1
+        return self.layout_data.hit_test(pos.x() * self.ratio, pos.y() * self.ratio)
+
+    def paintEvent(self, event):
+        if self.layout_data is None:
+            return
+
+        # 只绘制与重绘区域相交、且处于选中或悬停状态的单词
+        exposed = event.rect()
+        indices = self.layout_data.intersecting(
+            exposed.left() * self.ratio, exposed.top() * self.ratio,
+            (exposed.right() + 1) * self.ratio, (exposed.bottom() + 1) * self.ratio
+        )
+
+        painter = QPainter(self)
+        for index in indices:
+            if self.selected[index]:
+                painter.setPen(self.selected_pen)
+                painter.setBrush(self.selected_brush)
+            elif index == self.hover_index:
+                painter.setPen(Qt.NoPen)
+                painter.setBrush(self.hover_brush)
+            else:
+                continue
+            painter.drawRect(self.word_rect(index).adjusted(1, 1, -2, -2))
+
+    def set_hover_index(self, index):
+        if index == self.hover_index:
+            return
+        if self.hover_index >= 0:
+            self.update(self.word_rect(self.hover_index))
+        self.hover_index = index
+        if index >= 0:
+            self.update(self.word_rect(index))
+
+    def mouseMoveEvent(self, event):
+        self.set_hover_index(self.word_at(event.position()))
+
+    def leaveEvent(self, event):
+        self.set_hover_index(-1)
+        super().leaveEvent(event)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.press_index = self.word_at(event.position())
+        event.accept()
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            index = self.word_at(event.position())
+            if index >= 0 and index == self.press_index:
+                self.selected[index] = not self.selected[index]
+                self.update(self.word_rect(index))
+                self.word_toggled.emit(index, bool(self.selected[index]))
+            self.press_index = -1
+        event.accept()
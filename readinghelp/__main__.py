@@ -0,0 +1,24 @@
+"""
+命令行入口（不需要图形界面，不导入PySide6）
+
+    python -m readinghelp batch <图片/PDF/目录>... -o 结果.jsonl    批量识别并翻译（见utils/batch.py）
+
+图形界面仍然通过main.py启动。
+"""
+import argparse
+
+from utils import batch
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m readinghelp", description="德语阅读助手命令行")
+    commands = parser.add_subparsers(dest="command", required=True)
+    batch.add_arguments(commands.add_parser("batch", help="批量识别并翻译图片和PDF页面"))
+
+    args = parser.parse_args()
+    if args.command == "batch":
+        batch.run(args)
+
+
+if __name__ == "__main__":
+    main()
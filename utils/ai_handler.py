@@ -1,8 +1,44 @@
+import asyncio
+import contextlib
+import hashlib
+import importlib.util
+import json
 import os
+import random
+import re
+import threading
 import openai
 from dotenv import load_dotenv
 
+from utils.cache import TieredCache, default_cache_path
+from utils.context_builder import ContextBuilder
+
+# openai 1.x基于httpx，更新的版本改用接口相同的httpx2
+try:
+    import httpx
+except ImportError:
+    import httpx2 as httpx
+
 class AIHandler:
+    """
+    AI对话接口
+    
+    内部使用一个openai.AsyncOpenAI客户端（带连接池和keep-alive的httpx客户端），
+    运行在后台线程的asyncio事件循环上；get_response/stream_response是对应异步方法的同步包装。
+    程序内通过AIHandler.shared()共享同一个实例，追问时复用已经建立的连接。
+    """
+    
+    _shared = None
+    _shared_lock = threading.Lock()
+    
+    @classmethod
+    def shared(cls):
+        """返回进程内共享的AIHandler（只加载一次.env，只创建一个客户端和连接池）"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+    
     def __init__(self):
         # 加载环境变量
         load_dotenv()
@@ -10,61 +46,332 @@ class AIHandler:
         # 获取OpenAI API密钥
         api_key = os.getenv("OPENAI_API_KEY")
         
+        # 模型参数（OPENAI_BASE_URL环境变量可指向其他OpenAI兼容服务）
+        self.model = "gpt-4o-mini"  # 可以根据需要替换为其他模型
+        self.temperature = 0.7
+        self.max_tokens = 500
+        
+        # 429和5xx错误的重试：指数退避（base * 2^n，上限max_delay）加随机抖动
+        self.max_retries = 3
+        self.retry_base_delay = 0.5
+        self.retry_max_delay = 8.0
+        
+        # 按token预算组装上下文：保留最近的对话，更早的压缩为摘要
+        self.context_builder = ContextBuilder(model=self.model)
+        self.last_context_report = None
+        self.saved_tokens = 0  # 累计节省的输入token数
+        
+        # 服务器返回的token用量；cached_tokens为命中服务端提示缓存的输入token数
+        self.usage_stats = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+        self.last_usage = None
+        
+        # 回复缓存：相同模型参数 + 相同消息（原文、选中词、历史、问题）直接返回已有回复
+        self.cache_enabled = True
+        self.cache = TieredCache(
+            max_entries=256,
+            disk_path=default_cache_path("ai_cache.sqlite"),
+            disk_max_bytes=32 * 1024 * 1024,
+            ttl=7 * 24 * 3600
+        )
+        
+        # 异步客户端所在的事件循环（按需在后台线程中启动）
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+        
         if api_key:
-            self.client = openai.OpenAI(api_key=api_key)
+            # 重试由_with_retries负责，关闭客户端自带的重试
+            self.client = openai.AsyncOpenAI(
+                api_key=api_key,
+                max_retries=0,
+                http_client=self._create_http_client()
+            )
             self.api_available = True
         else:
+            self.client = None
             self.api_available = False
             print("警告：未找到OpenAI API密钥，请在.env文件中设置OPENAI_API_KEY")
     
-    def get_response(self, prompt, context=None):
-        """获取AI回复"""
+    def _create_http_client(self):
+        """
+        创建共享的httpx异步客户端
+        
+        - keep-alive连接保留60秒（httpx默认5秒），阅读回复后追问仍能复用已完成TLS握手的连接
+        - 安装了h2时启用HTTP/2，多个并发请求复用同一个连接
+        """
+        http2 = importlib.util.find_spec("h2") is not None
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(max_connections=8, max_keepalive_connections=4, keepalive_expiry=60.0),
+            timeout=httpx.Timeout(60.0, connect=10.0),
+        )
+    
+    @property
+    def loop(self):
+        """后台事件循环，第一次使用时启动"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever, name="ai-event-loop", daemon=True
+                )
+                self._loop_thread.start()
+            return self._loop
+    
+    def run_coroutine(self, coro):
+        """在后台事件循环中执行协程，返回concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    
+    def close(self):
+        """关闭客户端连接池并停止事件循环"""
+        with self._loop_lock:
+            loop = self._loop
+            self._loop = None
+        if loop is None:
+            return
+        
+        if self.client is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self.client.close(), loop).result(5)
+            except Exception as e:
+                print(f"关闭AI客户端时出错：{e}")
+        loop.call_soon_threadsafe(loop.stop)
+        self._loop_thread.join(5)
+        loop.close()
+    
+    def get_response(self, prompt, context=None, use_cache=True, timeout=None, json_mode=False, max_tokens=None):
+        """获取AI回复（同步包装，参数同aget_response）"""
+        return self.run_coroutine(
+            self.aget_response(prompt, context, use_cache, timeout, json_mode, max_tokens)
+        ).result()
+    
+    def stream_response(self, prompt, context=None, use_cache=True, timeout=None):
+        """
+        以生成器形式逐段返回AI回复（同步包装，参数同astream_response）
+        
+        提前关闭生成器（close()）会同时关闭HTTP流。
+        """
+        responses = self.astream_response(prompt, context, use_cache, timeout)
+        try:
+            while True:
+                try:
+                    delta = self.run_coroutine(responses.__anext__()).result()
+                except StopAsyncIteration:
+                    return
+                yield delta
+        finally:
+            self.run_coroutine(responses.aclose()).result()
+    
+    async def aget_response(self, prompt, context=None, use_cache=True, timeout=None, json_mode=False, max_tokens=None):
+        """
+        获取AI回复（use_cache=False时跳过缓存，强制请求API；timeout为请求超时秒数）
+        
+        json_mode=True时要求模型返回JSON对象（prompt中需要说明JSON格式）；
+        max_tokens覆盖默认的回复长度上限。
+        """
         if not self.api_available:
             return "错误：未配置OpenAI API密钥。请在项目根目录创建.env文件，并添加OPENAI_API_KEY=your_api_key"
         
         try:
-            messages = []
-            
-            # 创建系统提示
-            system_message = (
-                "你是一位精通德语的语言学家和教师，专门帮助中文学习者理解德语文本。"
-                
-            )
-            messages.append({"role": "system", "content": system_message})
-            
-            # 如果有上下文，添加到消息中
-            if context:
-                if "original_text" in context:
-                    original_text = context["original_text"]
-                    selected_text = context["selected_text"]
-                    
-                    context_message = ( f"请参考以下原文：{original_text}。在这段文本中，'{selected_text}' 的含义和用法是什么？")
-                    messages.append({"role": "system", "content": context_message})
-                
-                # 添加历史对话（如果有）
-                if "chat_history" in context:
-                    for msg in context["chat_history"]:
-                        messages.append(msg)
+            messages = self._build_messages(prompt, context)
+            options = {"max_tokens": max_tokens or self.max_tokens}
+            if json_mode:
+                options["response_format"] = {"type": "json_object"}
             
-            # 添加当前用户问题
-            messages.append({"role": "user", "content": prompt})
+            cache_key = self._cache_key(messages, options)
+            cached = self._cache_get(cache_key, use_cache)
+            if cached is not None:
+                return cached
             
             # 调用API
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",  # 可以根据需要替换为其他模型
+            response = await self._with_retries(lambda: self.client.chat.completions.create(
+                model=self.model,
                 messages=messages,
-                temperature=0.7,
-                max_tokens=500,
-                
-            )
+                temperature=self.temperature,
+                **options,
+                **self._request_options(timeout)
+            ))
             
             # 返回回复内容
-            return response.choices[0].message.content
+            self._record_usage(response.usage)
+            content = response.choices[0].message.content
+            self._cache_set(cache_key, content, use_cache)
+            return content
             
         except Exception as e:
             print(f"AI请求错误：{e}")
             return f"获取AI回复时出错：{str(e)}"
     
+    async def astream_response(self, prompt, context=None, use_cache=True, timeout=None):
+        """
+        以异步生成器形式逐段返回AI回复（stream=True），出错时产出错误信息
+        
+        只在收到第一个片段之前重试；生成器被关闭或所在任务被取消时HTTP流随之关闭。
+        """
+        if not self.api_available:
+            yield "错误：未配置OpenAI API密钥。请在项目根目录创建.env文件，并添加OPENAI_API_KEY=your_api_key"
+            return
+        
+        try:
+            messages = self._build_messages(prompt, context)
+            
+            # 缓存命中时一次性返回完整回复
+            cache_key = self._cache_key(messages)
+            cached = self._cache_get(cache_key, use_cache)
+            if cached is not None:
+                yield cached
+                return
+            
+            stream = await self._with_retries(lambda: self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                stream=True,
+                # 最后一个片段附带token用量
+                stream_options={"include_usage": True},
+                **self._request_options(timeout)
+            ))
+            
+            parts = []
+            async with stream:
+                async for chunk in stream:
+                    if getattr(chunk, "usage", None):
+                        self._record_usage(chunk.usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+                        yield chunk.choices[0].delta.content
+            
+            # 只缓存完整收到的回复
+            self._cache_set(cache_key, "".join(parts), use_cache)
+            
+        except Exception as e:
+            print(f"AI请求错误：{e}")
+            yield f"获取AI回复时出错：{str(e)}"
+    
+    async def _with_retries(self, call):
+        """执行call()返回的协程，遇到429或5xx时按指数退避加抖动重试"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await call()
+            except openai.APIStatusError as e:
+                if attempt == self.max_retries or not (e.status_code == 429 or e.status_code >= 500):
+                    raise
+                delay = self._retry_delay(attempt, e.response.headers.get("retry-after"))
+                print(f"AI请求返回{e.status_code}，{delay:.1f}秒后重试（第{attempt + 1}次）")
+            await asyncio.sleep(delay)
+    
+    def _retry_delay(self, attempt, retry_after=None):
+        """第attempt次重试前的等待时间：在[0, base * 2^attempt]内随机（full jitter），服务器给出Retry-After时不少于该值"""
+        delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+        with contextlib.suppress(TypeError, ValueError):
+            delay = max(delay, min(float(retry_after), self.retry_max_delay))
+        return delay
+    
+    def _request_options(self, timeout):
+        """单次请求的额外参数（openai中timeout=None表示不限时，所以只在指定时传入）"""
+        if timeout is None:
+            return {}
+        return {"timeout": timeout}
+    
+    def _build_messages(self, prompt, context=None):
+        """
+        组装发送给模型的消息列表
+        
+        消息分为稳定的前缀（系统提示 + 原文，同一段文本的所有提问都相同，可以命中服务端的
+        提示缓存）和可变的后缀（历史、选中的单词和当前问题）。历史按context_builder的
+        token预算压缩。
+        """
+        prefix = []
+        
+        # 创建系统提示
+        system_message = (
+            "你是一位精通德语的语言学家和教师，专门帮助中文学习者理解德语文本。"
+            
+        )
+        prefix.append({"role": "system", "content": system_message})
+        
+        history = []
+        preface = None
+        # 如果有上下文，原文放在前缀中，选中的单词随当前问题发送
+        if context:
+            if context.get("original_text"):
+                prefix.append({
+                    "role": "system",
+                    "content": f"以下是用户正在阅读的德语原文：\n\n{context['original_text']}"
+                })
+            if context.get("selected_text"):
+                preface = f"选中的内容：'{context['selected_text']}'"
+            
+            # 历史对话（如果有）
+            history = context.get("chat_history", [])
+        
+        # 添加历史和当前用户问题；调用方已放进历史的当前问题不会重复发送
+        messages, report = self.context_builder.build(prefix, history, prompt, preface)
+        self.last_context_report = report
+        self.saved_tokens += report.saved_tokens
+        if report.saved_tokens > 0:
+            print(f"上下文压缩：{report}")
+        
+        return messages
+    
+    def _record_usage(self, usage):
+        """记录一次请求的token用量（包括命中提示缓存的token数）"""
+        if usage is None:
+            return
+        
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+        self.last_usage = {
+            "prompt_tokens": usage.prompt_tokens,
+            "cached_tokens": cached,
+            "completion_tokens": usage.completion_tokens,
+        }
+        self.usage_stats["requests"] += 1
+        for key, value in self.last_usage.items():
+            self.usage_stats[key] += value
+    
+    def token_stats(self):
+        """token统计：服务器返回的用量、提示缓存命中率，以及上下文压缩节省的token数"""
+        stats = dict(self.usage_stats)
+        prompt_tokens = stats["prompt_tokens"]
+        stats["cached_rate"] = stats["cached_tokens"] / prompt_tokens if prompt_tokens else 0.0
+        stats["saved_tokens"] = self.saved_tokens
+        return stats
+    
+    def _cache_key(self, messages, options=None):
+        """根据模型参数（options覆盖默认值）和（空白规范化后的）消息内容计算缓存键"""
+        normalized = [
+            {"role": msg["role"], "content": re.sub(r"\s+", " ", msg["content"]).strip()}
+            for msg in messages
+        ]
+        params = {
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "messages": normalized,
+        }
+        params.update(options or {})
+        payload = json.dumps(
+            params,
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _cache_get(self, key, use_cache):
+        if not (self.cache_enabled and use_cache):
+            return None
+        return self.cache.get(key)
+    
+    def _cache_set(self, key, content, use_cache):
+        if self.cache_enabled and use_cache and content:
+            self.cache.set(key, content)
+    
+    def cache_stats(self):
+        """回复缓存的命中统计：{"hits", "misses", "hit_rate"}"""
+        return self.cache.stats()
+    
     def create_env_file(self, api_key):
         """创建或更新.env文件"""
         try:
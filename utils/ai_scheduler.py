@@ -0,0 +1,221 @@
+"""
+AI请求调度器
+
+位于界面（ChatWidget/MainWindow）和AIHandler之间：所有请求进入按优先级排序的队列，
+在AIHandler的asyncio事件循环上由固定数量的工作协程执行。每个请求有自己的id、优先级、
+取消句柄和超时时间；同一分组（例如同一次对话）的请求可以一起取消。取消会直接取消
+对应的asyncio任务，即使请求还在等待服务器的第一个字节。
+
+调度器不依赖Qt，回调在事件循环线程中调用，界面需要自行转发到GUI线程（例如通过信号）。
+"""
+import asyncio
+import contextlib
+import itertools
+import threading
+import time
+
+PRIORITY_INTERACTIVE = 0   # 用户正在等待的请求
+PRIORITY_BACKGROUND = 10   # 预取等可以延后的请求
+
+TIMEOUT_MESSAGE = "获取AI回复超时，请稍后重试。"
+
+
+class AIRequest:
+    """
+    一次AI请求
+
+    status: pending（排队中）/ running / done / cancelled / timeout / error
+    on_delta(request, delta)在流式模式下每收到一个片段调用一次；
+    on_done(request, text)在完成、超时或出错时调用一次，被取消的请求不会调用。
+    options是非流式请求传给AIHandler.aget_response的额外参数（如json_mode、max_tokens）。
+    """
+
+    def __init__(self, request_id, prompt, context=None, priority=PRIORITY_INTERACTIVE,
+                 timeout=60.0, stream=True, group=None, on_delta=None, on_done=None, options=None):
+        self.id = request_id
+        self.prompt = prompt
+        self.context = context
+        self.priority = priority
+        self.timeout = timeout
+        self.stream = stream
+        self.group = group
+        self.on_delta = on_delta
+        self.on_done = on_done
+        self.options = options or {}
+
+        self.status = "pending"
+        self.parts = []  # 流式模式下已收到的片段
+        self.cancel_event = threading.Event()
+        # 超时从提交时开始计算（包括排队时间）
+        self.deadline = time.monotonic() + timeout if timeout else None
+
+        # 执行中的asyncio任务及其事件循环（由调度器设置）
+        self._task = None
+        self._loop = None
+
+    def cancel(self):
+        """取消请求（可从任意线程调用）"""
+        self.cancel_event.set()
+        if self.status == "pending":
+            self.status = "cancelled"
+        if self._task is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def remaining(self):
+        """距离超时的剩余秒数，没有超时限制时返回None"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+
+class AIScheduler:
+    """在AIHandler的事件循环上按优先级执行AI请求，同时执行的请求数不超过max_workers"""
+
+    def __init__(self, ai_handler, max_workers=2):
+        self.ai_handler = ai_handler
+        self.max_workers = max_workers
+
+        self._ids = itertools.count(1)
+        self._order = itertools.count()  # 同优先级按提交顺序执行
+        self._lock = threading.Lock()
+        self._active = {}   # 排队中和执行中的请求：id -> AIRequest
+        self._closed = False
+
+        # 以下对象只在事件循环线程中访问
+        self._queue = None
+        self._workers = []
+
+    def submit(self, prompt, context=None, priority=PRIORITY_INTERACTIVE, timeout=60.0,
+               stream=True, group=None, on_delta=None, on_done=None, options=None):
+        """提交请求，返回AIRequest（可用于取消）"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("AI请求调度器已关闭")
+
+            request = AIRequest(
+                next(self._ids), prompt, context, priority, timeout, stream, group, on_delta, on_done, options
+            )
+            self._active[request.id] = request
+
+        loop = self.ai_handler.loop
+        request._loop = loop
+        loop.call_soon_threadsafe(self._enqueue, request)
+        return request
+
+    def cancel(self, request_id):
+        """取消指定请求，返回是否找到了该请求"""
+        with self._lock:
+            request = self._active.get(request_id)
+        if request is None:
+            return False
+        request.cancel()
+        return True
+
+    def cancel_group(self, group):
+        """取消某个分组中所有尚未完成的请求，返回取消的数量"""
+        with self._lock:
+            requests = [request for request in self._active.values() if request.group == group]
+        for request in requests:
+            request.cancel()
+        return len(requests)
+
+    def cancel_all(self):
+        with self._lock:
+            requests = list(self._active.values())
+        for request in requests:
+            request.cancel()
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._active)
+
+    def shutdown(self, wait=True, timeout=None):
+        """取消所有请求并停止工作协程"""
+        with self._lock:
+            self._closed = True
+        self.cancel_all()
+
+        future = self.ai_handler.run_coroutine(self._stop_workers())
+        if wait:
+            future.result(timeout)
+
+    def _enqueue(self, request):
+        """（事件循环线程）把请求放入队列，按需启动工作协程"""
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        self._queue.put_nowait((request.priority, next(self._order), request))
+
+        if len(self._workers) < min(self.max_workers, len(self._active)):
+            self._workers.append(asyncio.ensure_future(self._worker()))
+
+    async def _stop_workers(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker(self):
+        while True:
+            _, _, request = await self._queue.get()
+            try:
+                if request.cancelled:
+                    request.status = "cancelled"
+                    continue
+                # 在独立的任务中执行，取消请求时只取消这个任务
+                request._task = asyncio.ensure_future(self._run(request))
+                if request.cancelled:
+                    request._task.cancel()
+                await asyncio.wait([request._task])
+            except Exception as e:
+                print(f"AI请求{request.id}执行出错：{e}")
+            finally:
+                request._task = None
+                with self._lock:
+                    self._active.pop(request.id, None)
+
+    async def _run(self, request):
+        if request.expired():
+            self._finish(request, "timeout", TIMEOUT_MESSAGE)
+            return
+
+        request.status = "running"
+        try:
+            text = await asyncio.wait_for(self._execute(request), request.remaining())
+        except asyncio.TimeoutError:
+            partial = "".join(request.parts)
+            self._finish(request, "timeout", partial + "\n\n" + TIMEOUT_MESSAGE if partial else TIMEOUT_MESSAGE)
+            return
+        except asyncio.CancelledError:
+            request.status = "cancelled"
+            return
+        except Exception as e:
+            # 未预料的错误（例如回调出错）也要通知调用方，否则界面会一直等待这次回复
+            print(f"AI请求{request.id}执行出错：{e}")
+            self._finish(request, "error", f"获取AI回复时出错：{e}")
+            return
+        self._finish(request, "done", text)
+
+    async def _execute(self, request):
+        if not request.stream:
+            return await self.ai_handler.aget_response(request.prompt, request.context, **request.options)
+
+        # aclosing保证任务被取消或超时时立即关闭HTTP流
+        responses = self.ai_handler.astream_response(request.prompt, request.context)
+        async with contextlib.aclosing(responses):
+            async for delta in responses:
+                request.parts.append(delta)
+                if request.on_delta:
+                    request.on_delta(request, delta)
+        return "".join(request.parts)
+
+    def _finish(self, request, status, text):
+        request.status = status
+        if request.on_done:
+            request.on_done(request, text)
@@ -0,0 +1,395 @@
+"""
+无界面批处理：批量识别图片和PDF页面并翻译，结果按页面顺序写入JSONL/Markdown
+
+    python -m readinghelp batch <图片/PDF/目录>... -o 结果.jsonl [--markdown 结果.md]
+
+流水线（不导入PySide6）：
+1. 按文件名顺序列出所有页面（目录中的图片和PDF，PDF的每一页是一个页面）
+2. 在进程池中读取或渲染页面、预处理并OCR，每个进程一个OCRHandler，识别速度随核心数扩展
+3. 识别完成的页面在AIHandler的事件循环上并发翻译，限制每分钟的请求数和同时进行的请求数
+4. 按页面顺序写出结果
+
+每完成一个阶段（识别、翻译）都追加到检查点文件（<输出>.checkpoint）。中断后重新运行
+同样的命令会跳过已经完成的阶段，出错的页面重新处理。已读入但尚未写出的页面数有上限
+（--max-pending，包括已经完成、等待前面页面的页面），前面的页面较慢时不再读入新的页面，
+后面的结果不会无限制地积压在内存中。
+
+处理PDF需要安装PyMuPDF（pip install pymupdf）。
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from PIL import Image
+
+# PyMuPDF是可选依赖：只有处理PDF时需要
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp", ".gif"}
+TRANSLATE_PROMPT = "请将原文翻译成中文，直接给出译文即可。"
+# AIHandler出错时返回的错误信息以这些前缀开头
+AI_ERROR_PREFIXES = ("错误：", "获取AI回复时出错")
+
+
+class Page:
+    """一个页面：图片文件，或PDF文件的一页（page从1开始，图片为0）"""
+
+    def __init__(self, index, path, page=0):
+        self.index = index
+        self.path = path
+        self.page = page
+        # 文件被修改后检查点中的结果作废
+        stat = os.stat(path)
+        self.stamp = f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    @property
+    def key(self):
+        return f"{os.path.abspath(self.path)}#{self.page}"
+
+    @property
+    def label(self):
+        return f"{self.path} 第{self.page}页" if self.page else self.path
+
+
+def list_pages(inputs):
+    """按输入顺序列出页面，目录按文件名排序递归展开"""
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names))
+        else:
+            files.append(path)
+
+    pages = []
+    for path in files:
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".pdf":
+            if fitz is None:
+                print(f"跳过{path}：处理PDF需要安装PyMuPDF（pip install pymupdf）")
+                continue
+            with fitz.open(path) as document:
+                count = document.page_count
+            for number in range(1, count + 1):
+                pages.append(Page(len(pages), path, number))
+        elif ext in IMAGE_EXTENSIONS:
+            pages.append(Page(len(pages), path))
+    return pages
+
+
+def load_page(page, dpi=300):
+    """读取图片，或按dpi渲染PDF页面，返回RGB的PIL图像"""
+    if not page.page:
+        with Image.open(page.path) as image:
+            return image.convert("RGB")
+
+    with fitz.open(page.path) as document:
+        pixmap = document[page.page - 1].get_pixmap(dpi=dpi)
+    image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+    # 预处理按DPI决定是否放大
+    image.info["dpi"] = (dpi, dpi)
+    return image
+
+
+# 进程池中每个进程的OCRHandler（由_init_worker创建）
+_worker_handler = None
+
+
+def _init_worker(backend, profile):
+    global _worker_handler
+    # 并行由进程池负责：每个tesseract只用一个线程，OCRHandler内部也不再并行
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    from utils.ocr_handler import OCRHandler
+    _worker_handler = OCRHandler(backend=backend, preprocess_profile=profile)
+    _worker_handler.parallel = False
+    _worker_handler.tiling = False
+
+
+def ocr_page(page, dpi):
+    """在进程池中识别一个页面，返回{"text", "confidence", "ocr_ms"}或{"error"}"""
+    if not _worker_handler.tesseract_installed:
+        return {"error": "Tesseract OCR未正确安装"}
+
+    start = time.perf_counter()
+    try:
+        result = _worker_handler.recognize(load_page(page, dpi))
+    except Exception as e:
+        return {"error": f"OCR处理错误：{e}"}
+    return {
+        "text": result.text,
+        "confidence": round(result.mean_confidence, 1),
+        "ocr_ms": round((time.perf_counter() - start) * 1000),
+    }
+
+
+class RateLimiter:
+    """
+    异步限流：同时进行的请求不超过concurrency个，相邻两个请求开始的间隔不小于60/per_minute秒
+
+    在AIHandler的事件循环中使用，asyncio对象在第一次使用时创建。
+    """
+
+    def __init__(self, per_minute=60, concurrency=4):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.concurrency = concurrency
+        self._semaphore = None
+        self._lock = None
+        self._next_start = 0.0
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._lock = asyncio.Lock()
+
+        async with self._semaphore:
+            async with self._lock:
+                now = asyncio.get_running_loop().time()
+                delay = self._next_start - now
+                self._next_start = max(now, self._next_start) + self.interval
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield
+
+
+async def translate_text(ai_handler, limiter, text, max_tokens):
+    """翻译一个页面的文本，返回{"translation"}或{"error"}"""
+    async with limiter.slot():
+        translation = await ai_handler.aget_response(
+            TRANSLATE_PROMPT, context={"original_text": text}, max_tokens=max_tokens
+        )
+    if translation.startswith(AI_ERROR_PREFIXES):
+        return {"error": translation}
+    return {"translation": translation}
+
+
+class Checkpoint:
+    """
+    检查点文件（只追加的JSONL）：每完成一个阶段追加一行{"key", "stamp", 该阶段的结果}
+
+    读取时同一页面的多行合并。程序中断时最后一行可能不完整，打开时截掉。
+    """
+
+    def __init__(self, path, restart=False):
+        self.path = path
+        self.records = {}
+        if restart and os.path.exists(path):
+            os.remove(path)
+
+        if os.path.exists(path):
+            with open(path, "rb+") as f:
+                data = f.read()
+                end = data.rfind(b"\n") + 1
+                if end < len(data):
+                    f.truncate(end)
+            for line in data[:end].decode("utf-8").splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                key = record.pop("key")
+                previous = self.records.get(key)
+                if previous is None or previous.get("stamp") != record.get("stamp"):
+                    self.records[key] = record
+                else:
+                    previous.update(record)
+
+        self._file = open(path, "a", encoding="utf-8")
+
+    def get(self, page):
+        """页面已经完成的阶段的结果（文件被修改过时为空）"""
+        record = self.records.get(page.key)
+        if record is None or record.get("stamp") != page.stamp:
+            return {}
+        return {key: value for key, value in record.items() if key != "stamp"}
+
+    def add(self, page, fields):
+        record = dict(fields, stamp=page.stamp)
+        if self.get(page):
+            self.records[page.key].update(record)
+        else:
+            self.records[page.key] = record
+        self._file.write(json.dumps(dict(record, key=page.key), ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class OrderedWriter:
+    """按页面顺序写出结果（JSONL和可选的Markdown），先完成的页面等待前面的页面"""
+
+    def __init__(self, path, markdown_path=None):
+        self._file = open(path, "w", encoding="utf-8")
+        self._markdown = open(markdown_path, "w", encoding="utf-8") if markdown_path else None
+        self._waiting = {}
+        self.written = 0
+
+    def add(self, page, record):
+        self._waiting[page.index] = (page, record)
+        while self.written in self._waiting:
+            self._write(*self._waiting.pop(self.written))
+            self.written += 1
+
+    def _write(self, page, record):
+        data = {"index": page.index, "source": page.path, "page": page.page}
+        for key in ("text", "translation", "confidence", "error"):
+            if key in record:
+                data[key] = record[key]
+        self._file.write(json.dumps(data, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+        if self._markdown is not None:
+            parts = [f"## {page.label}\n"]
+            if record.get("text"):
+                parts.append(record["text"] + "\n")
+            if record.get("translation"):
+                parts.append("**译文**\n\n" + record["translation"] + "\n")
+            if "error" in record:
+                parts.append(f"> {record['error']}\n")
+            self._markdown.write("\n".join(parts) + "\n")
+            self._markdown.flush()
+
+    def close(self):
+        self._file.close()
+        if self._markdown is not None:
+            self._markdown.close()
+
+
+def run_batch(pages, output, markdown=None, jobs=None, translate=True, per_minute=60, concurrency=4,
+              max_tokens=2000, dpi=300, backend="auto", profile="default", max_pending=None, restart=False):
+    """处理页面列表，返回统计信息字典"""
+    jobs = jobs or os.cpu_count() or 1
+    max_pending = max_pending or jobs * 4
+    stats = {"pages": len(pages), "ocr": 0, "translated": 0, "resumed": 0, "errors": 0}
+
+    ai_handler = None
+    limiter = RateLimiter(per_minute, concurrency)
+    if translate:
+        from utils.ai_handler import AIHandler
+        ai_handler = AIHandler()
+        if not ai_handler.api_available:
+            print("未配置OpenAI API密钥，只进行识别")
+            ai_handler.close()
+            ai_handler = None
+
+    checkpoint = Checkpoint(output + ".checkpoint", restart)
+    writer = OrderedWriter(output, markdown)
+    executor = ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(backend, profile))
+    futures = {}  # future -> (阶段, 页面, 之前阶段的结果)
+    remaining = iter(pages)
+    submitted = 0  # 已经读入的页面数；submitted - writer.written为尚未写出的页面数
+    completed = 0  # 全部阶段完成的页面数（可能还在writer中等待前面的页面）
+    start = time.perf_counter()
+
+    def advance(page, record):
+        """页面完成一个阶段后开始下一个阶段，全部完成时交给writer"""
+        nonlocal completed
+        if ai_handler is not None and record.get("text") and "translation" not in record and "error" not in record:
+            future = ai_handler.run_coroutine(translate_text(ai_handler, limiter, record["text"], max_tokens))
+            futures[future] = ("translate", page, record)
+            return
+
+        completed += 1
+        if "error" in record:
+            stats["errors"] += 1
+        writer.add(page, record)
+        status = f"：{record['error']}" if "error" in record else ""
+        print(f"[{completed}/{len(pages)}] {page.label}{status}")
+
+    try:
+        exhausted = False
+        while True:
+            # 在上限之内继续读入页面：已完成但在writer中等待的页面也计入上限
+            while not exhausted and submitted - writer.written < max_pending:
+                page = next(remaining, None)
+                if page is None:
+                    exhausted = True
+                    break
+                submitted += 1
+                record = checkpoint.get(page)
+                if "text" in record:
+                    stats["resumed"] += 1
+                    advance(page, record)
+                else:
+                    futures[executor.submit(ocr_page, page, dpi)] = ("ocr", page, {})
+
+            if not futures:
+                break
+
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, page, record = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"error": f"{stage}出错：{e}"}
+
+                if "error" not in result:
+                    checkpoint.add(page, result)
+                    stats["ocr" if stage == "ocr" else "translated"] += 1
+                advance(page, dict(record, **result))
+    finally:
+        executor.shutdown(cancel_futures=True)
+        if ai_handler is not None:
+            ai_handler.close()
+        writer.close()
+        checkpoint.close()
+
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def add_arguments(parser):
+    parser.add_argument("inputs", nargs="+", help="图片、PDF文件或包含它们的目录")
+    parser.add_argument("-o", "--output", required=True, help="输出的JSONL文件（检查点保存在<输出>.checkpoint）")
+    parser.add_argument("--markdown", help="同时输出Markdown文件")
+    parser.add_argument("-j", "--jobs", type=int, help="OCR进程数（默认CPU核心数）")
+    parser.add_argument("--no-translate", action="store_true", help="只识别，不翻译")
+    parser.add_argument("--rpm", type=float, default=60, help="每分钟最多的翻译请求数（默认60，0表示不限）")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时进行的翻译请求数（默认4）")
+    parser.add_argument("--max-tokens", type=int, default=2000, help="每页译文的最大token数（默认2000）")
+    parser.add_argument("--dpi", type=int, default=300, help="PDF页面的渲染分辨率（默认300）")
+    parser.add_argument("--backend", choices=["auto", "tesserocr", "pytesseract"], default="auto",
+                        help="OCR后端（默认auto）")
+    parser.add_argument("--profile", default="default", help="预处理方案（见utils/preprocess.py）")
+    parser.add_argument("--max-pending", type=int, help="同时处理中的页面数上限（默认进程数的4倍）")
+    parser.add_argument("--restart", action="store_true", help="忽略检查点，全部重新处理")
+
+
+def run(args):
+    pages = list_pages(args.inputs)
+    if not pages:
+        print("没有找到可以处理的图片或PDF页面")
+        return
+
+    print(f"共{len(pages)}页")
+    stats = run_batch(
+        pages, args.output, markdown=args.markdown, jobs=args.jobs, translate=not args.no_translate,
+        per_minute=args.rpm, concurrency=args.concurrency, max_tokens=args.max_tokens, dpi=args.dpi,
+        backend=args.backend, profile=args.profile, max_pending=args.max_pending, restart=args.restart
+    )
+    rate = stats["pages"] / stats["seconds"] * 60 if stats["seconds"] else 0
+    print(
+        f"完成{stats['pages']}页，用时{stats['seconds']:.1f}秒（{rate:.1f}页/分钟）："
+        f"识别{stats['ocr']}页，翻译{stats['translated']}页，"
+        f"从检查点恢复{stats['resumed']}页，出错{stats['errors']}页"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量识别并翻译图片和PDF页面")
+    add_arguments(parser)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
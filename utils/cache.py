@@ -0,0 +1,191 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def default_cache_path(filename):
+    """返回用户目录下的缓存文件路径（~/.readinghelp/<filename>）"""
+    cache_dir = os.path.join(os.path.expanduser("~"), ".readinghelp")
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, filename)
+
+
+def _expires_at(ttl):
+    """ttl（秒）对应的过期时间戳，ttl为None表示永不过期"""
+    return time.time() + ttl if ttl else None
+
+
+class LRUCache:
+    """线程安全的内存LRU缓存，可选过期时间（秒）"""
+
+    def __init__(self, max_entries=128, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (过期时间戳或None, 值)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """返回缓存的值，不存在或已过期时返回None"""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            expires, value = self._entries[key]
+            if expires is not None and expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (_expires_at(self.ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    基于SQLite的磁盘缓存
+
+    值以JSON保存；总大小超过max_bytes时按最近访问时间淘汰最旧的条目。
+    设置ttl（秒）后，过期条目在读取时视为不存在，并在写入时清理。
+    """
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, ttl=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        # 缓存可能在OCR线程池或AI请求线程中访问，由_lock保证串行
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "size INTEGER NOT NULL, accessed REAL NOT NULL, expires REAL)"
+        )
+        # 旧版本创建的缓存文件没有expires列
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(entries)")]
+        if "expires" not in columns:
+            self._conn.execute("ALTER TABLE entries ADD COLUMN expires REAL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON entries(accessed)")
+        self._conn.commit()
+
+    def get(self, key):
+        """返回缓存的值，不存在或已过期时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM entries WHERE key = ? AND (expires IS NULL OR expires >= ?)",
+                (key, time.time())
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed, expires) VALUES (?, ?, ?, ?, ?)",
+                (key, data, size, time.time(), _expires_at(self.ttl))
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """删除过期条目，再删除最久未访问的条目，直到总大小不超过上限"""
+        self._conn.execute("DELETE FROM entries WHERE expires < ?", (time.time(),))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall()
+        expired = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            expired.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", expired)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class TieredCache:
+    """
+    两级缓存：内存LRU + 可选的SQLite磁盘层，并统计命中率
+
+    磁盘层命中时会把值放回内存层。ttl（秒）同时作用于两层。
+    """
+
+    def __init__(self, max_entries=128, disk_path=None, disk_max_bytes=64 * 1024 * 1024, ttl=None):
+        self.memory = LRUCache(max_entries, ttl)
+        self.disk = None
+        if disk_path:
+            try:
+                self.disk = SQLiteCache(disk_path, disk_max_bytes, ttl)
+            except sqlite3.Error as e:
+                print(f"无法打开磁盘缓存{disk_path}：{e}")
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """返回缓存的值，不存在时返回None"""
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        """返回命中统计：{"hits", "misses", "hit_rate"}"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
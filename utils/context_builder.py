@@ -0,0 +1,153 @@
+"""
+按token预算组装发送给模型的消息
+
+长对话中每次追问都会带上全部历史，token数和延迟随对话线性增长。ContextBuilder在预算内
+保留固定前缀（系统提示、原文）和最近的若干条消息，更早的消息压缩成一条摘要，
+摘要仍放不下时从最旧的开始丢弃。同时去掉与当前问题重复的末尾用户消息。
+"""
+import math
+import re
+
+# tiktoken是可选依赖：未安装（或无法加载编码表）时使用本地估算
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# 中日韩字符大约每个字一个token，其他文本大约每4个字符一个token
+_CJK_RE = re.compile(r"[　-〿㐀-䶿一-鿿＀-￯]")
+
+MESSAGE_OVERHEAD = 4  # 每条消息的角色、分隔符等固定开销
+
+
+def estimate_tokens(text):
+    """不依赖tiktoken的token数估算"""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+class ContextReport:
+    """一次组装的结果统计"""
+
+    def __init__(self, original_tokens, final_tokens, kept, summarized, dropped, deduped):
+        self.original_tokens = original_tokens  # 不做处理时会发送的token数
+        self.final_tokens = final_tokens
+        self.kept = kept              # 原样保留的历史消息数
+        self.summarized = summarized  # 压缩进摘要的历史消息数
+        self.dropped = dropped        # 丢弃的历史消息数
+        self.deduped = deduped        # 是否去掉了重复的末尾用户消息
+
+    @property
+    def saved_tokens(self):
+        return self.original_tokens - self.final_tokens
+
+    def __str__(self):
+        parts = [f"{self.original_tokens} -> {self.final_tokens} tokens（节省{self.saved_tokens}）"]
+        if self.deduped:
+            parts.append("去掉重复的问题")
+        if self.summarized:
+            parts.append(f"{self.summarized}条历史压缩为摘要")
+        if self.dropped:
+            parts.append(f"丢弃{self.dropped}条历史")
+        return "，".join(parts)
+
+
+class ContextBuilder:
+    """
+    按token预算组装消息
+
+    - budget: 输入消息的token上限（不含回复）
+    - keep_last: 原样保留的最近历史消息条数（不受预算限制）
+    - summary_chars: 每条旧消息在摘要中保留的字符数
+    """
+
+    def __init__(self, budget=4000, keep_last=6, summary_chars=80, model="gpt-4o-mini"):
+        self.budget = budget
+        self.keep_last = keep_last
+        self.summary_chars = summary_chars
+        self._encoding = self._load_encoding(model)
+
+    def _load_encoding(self, model):
+        if tiktoken is None:
+            return None
+        try:
+            return tiktoken.encoding_for_model(model)
+        except Exception:
+            try:
+                return tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                # 编码表需要联网下载，离线时退回估算
+                print(f"无法加载tiktoken编码，使用估算的token数：{e}")
+                return None
+
+    def count_text(self, text):
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return estimate_tokens(text)
+
+    def count_messages(self, messages):
+        return sum(self.count_text(msg["content"]) + MESSAGE_OVERHEAD for msg in messages)
+
+    def build(self, prefix, history, prompt, preface=None):
+        """
+        组装消息：prefix（系统提示、原文等固定部分）+ 历史 + 当前问题
+
+        preface是放在当前问题前面的补充说明（例如选中的单词），只随本次问题发送。
+        返回(消息列表, ContextReport)
+        """
+        history = list(history or [])
+        question = {"role": "user", "content": f"{preface}\n\n{prompt}" if preface else prompt}
+        original_tokens = self.count_messages(prefix + history + [question])
+
+        # 调用方可能已经把当前问题加进了历史
+        deduped = bool(
+            history and history[-1]["role"] == "user" and history[-1]["content"].strip() == prompt.strip()
+        )
+        if deduped:
+            history.pop()
+
+        messages = prefix + history + [question]
+        if self.count_messages(messages) <= self.budget:
+            return messages, ContextReport(
+                original_tokens, self.count_messages(messages), len(history), 0, 0, deduped
+            )
+
+        # 超出预算：保留最近keep_last条，更早的压缩成摘要
+        keep = history[len(history) - self.keep_last:] if self.keep_last else []
+        old = history[:len(history) - len(keep)]
+        fixed_tokens = self.count_messages(prefix + keep + [question])
+
+        summary = self._summarize(old, self.budget - fixed_tokens)
+        summarized = len(summary)
+        messages = list(prefix)
+        if summary:
+            messages.append({
+                "role": "system",
+                "content": "此前对话摘要（较早的内容已省略）：\n" + "\n".join(summary),
+            })
+        messages += keep + [question]
+
+        report = ContextReport(
+            original_tokens, self.count_messages(messages), len(keep), summarized, len(old) - summarized, deduped
+        )
+        return messages, report
+
+    def _summarize(self, messages, available):
+        """把旧消息压缩为每条一行，优先保留较新的，总token数不超过available"""
+        header_tokens = self.count_text("此前对话摘要（较早的内容已省略）：\n") + MESSAGE_OVERHEAD
+        available -= header_tokens
+
+        lines = []
+        for msg in reversed(messages):
+            content = " ".join(msg["content"].split())
+            if len(content) > self.summary_chars:
+                content = content[:self.summary_chars] + "…"
+            line = ("用户：" if msg["role"] == "user" else "AI：") + content
+            cost = self.count_text(line) + 1
+            if cost > available:
+                break
+            available -= cost
+            lines.append(line)
+
+        lines.reverse()
+        return lines
@@ -0,0 +1,297 @@
+"""
+本地德语词典
+
+词条保存在SQLite文件中（默认~/.readinghelp/dictionary.sqlite），按小写原形和词形建立索引。
+查询时先用utils/lemmatizer.py生成可能的原形，再用一次索引查询找出实际存在的词条，
+单击单词时可以立即显示原形和释义，不需要请求AI。
+
+词典需要先从词典数据导入，支持三种格式：
+- Wiktionary导出的JSONL（kaikki.org格式，每行一个词条，包含词形变化）
+- dict.cc导出的制表符分隔文本（"Haus {n}<TAB>house<TAB>noun"）
+- 简单的TSV（.tsv）：原形<TAB>词性<TAB>性<TAB>释义[<TAB>词形,词形,...]
+
+导入：
+    python -m utils.dictionary import <词典文件> [--format 格式] [--replace]
+查询：
+    python -m utils.dictionary lookup <单词> [可分前缀]
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+
+from utils.cache import LRUCache, default_cache_path
+from utils.lemmatizer import lemma_candidates
+
+GENDER_ARTICLES = {"m": "der", "f": "die", "n": "das"}
+_GENDER_TAGS = {"masculine": "der", "feminine": "die", "neuter": "das"}
+
+# 词性的中文名称（词典数据中的英文缩写 -> 中文）
+POS_NAMES = {
+    "noun": "名词", "verb": "动词", "adj": "形容词", "adv": "副词", "prep": "介词",
+    "conj": "连词", "pron": "代词", "article": "冠词", "det": "冠词", "num": "数词",
+    "intj": "感叹词", "particle": "小品词", "name": "专有名词",
+}
+
+_DICTCC_GENDER_RE = re.compile(r"\{([mfn])\}")
+_DICTCC_NOTES_RE = re.compile(r"\{[^}]*\}|\[[^\]]*\]|<[^>]*>")
+_WIKTIONARY_GENDER_RE = re.compile(r"^\S+ ([mfn])\b")
+
+MAX_GLOSSES = 4  # 每个词条最多保留的释义数
+
+
+class DictionaryEntry:
+    """一个词条"""
+
+    def __init__(self, lemma, pos="", gender="", gloss=""):
+        self.lemma = lemma
+        self.pos = pos
+        self.gender = gender  # der/die/das，非名词为空
+        self.gloss = gloss
+
+    @property
+    def pos_name(self):
+        return POS_NAMES.get(self.pos, self.pos)
+
+    @property
+    def headword(self):
+        """带冠词的原形，例如 "das Haus" """
+        return f"{self.gender} {self.lemma}" if self.gender else self.lemma
+
+    def __repr__(self):
+        return f"DictionaryEntry({self.headword!r}, {self.pos!r}, {self.gloss!r})"
+
+
+class Dictionary:
+    """
+    SQLite词典
+
+    entries表保存词条，forms表保存词典数据中给出的词形（包括不规则形式）到词条的映射。
+    查询结果在内存LRU中缓存，重复点击同一个单词不会再访问数据库。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_cache_path("dictionary.sqlite")
+        self._lock = threading.Lock()
+        self._memo = LRUCache(max_entries=2048)
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "id INTEGER PRIMARY KEY, key TEXT NOT NULL, lemma TEXT NOT NULL, "
+            "pos TEXT NOT NULL, gender TEXT NOT NULL, gloss TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS forms (form TEXT NOT NULL, entry_id INTEGER NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_key ON entries(key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_forms_form ON forms(form)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def __len__(self):
+        return self._size
+
+    def lookup(self, word, particle=None, limit=3):
+        """
+        查询单词，返回最多limit个DictionaryEntry（最可能的在前），找不到时返回空列表
+
+        particle是句末的可分前缀（见lemmatizer.find_particle）。
+        """
+        if not self._size:
+            return []
+
+        memo_key = (word, particle)
+        entries = self._memo.get(memo_key)
+        if entries is not None:
+            return entries[:limit]
+
+        candidates = lemma_candidates(word, particle)
+        keys = list(dict.fromkeys(candidate.casefold() for candidate in candidates))
+        if not keys:
+            return []
+
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, lemma, pos, gender, gloss, id FROM entries WHERE key IN ({placeholders})",
+                keys
+            ).fetchall()
+            # 词典数据中给出的词形只对原词有效
+            rows += self._conn.execute(
+                "SELECT ?, e.lemma, e.pos, e.gender, e.gloss, e.id FROM forms f "
+                "JOIN entries e ON e.id = f.entry_id WHERE f.form = ?",
+                (keys[0], keys[0])
+            ).fetchall()
+
+        # 按候选的顺序排序；同一个候选对应多个词条时（Essen/essen）与原词大小写一致的在前
+        rank = {key: i for i, key in enumerate(keys)}
+        rows.sort(key=lambda row: (rank[row[0]], row[1] != candidates[0], row[5]))
+
+        entries = []
+        seen = set()
+        for _, lemma, pos, gender, gloss, entry_id in rows:
+            if entry_id not in seen:
+                seen.add(entry_id)
+                entries.append(DictionaryEntry(lemma, pos, gender, gloss))
+
+        self._memo.set(memo_key, entries)
+        return entries[:limit]
+
+    def import_entries(self, entries, replace=False):
+        """
+        导入词条，entries为(原形, 词性, 性, 释义, 词形列表)的可迭代对象
+
+        replace=True时先清空已有的词条。返回导入的词条数。
+        """
+        count = 0
+        with self._lock:
+            if replace:
+                self._conn.execute("DELETE FROM entries")
+                self._conn.execute("DELETE FROM forms")
+
+            cursor = self._conn.cursor()
+            for lemma, pos, gender, gloss, forms in entries:
+                cursor.execute(
+                    "INSERT INTO entries (key, lemma, pos, gender, gloss) VALUES (?, ?, ?, ?, ?)",
+                    (lemma.casefold(), lemma, pos, gender, gloss)
+                )
+                entry_id = cursor.lastrowid
+                cursor.executemany(
+                    "INSERT INTO forms (form, entry_id) VALUES (?, ?)",
+                    [(form, entry_id) for form in {form.casefold() for form in forms} if form != lemma.casefold()]
+                )
+                count += 1
+
+            self._conn.commit()
+            self._size = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        self._memo.clear()
+        return count
+
+    def import_file(self, path, fmt=None, replace=False):
+        """从词典文件导入（格式见read_dump），返回导入的词条数"""
+        return self.import_entries(read_dump(path, fmt), replace)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def read_dump(path, fmt=None):
+    """
+    读取词典文件，逐个产出(原形, 词性, 性, 释义, 词形列表)
+
+    fmt为wiktionary / dictcc / tsv；为None时按扩展名判断（.jsonl、.tsv，其他按dict.cc处理）。
+    """
+    if fmt is None:
+        ext = os.path.splitext(path)[1].lower()
+        fmt = {".jsonl": "wiktionary", ".json": "wiktionary", ".tsv": "tsv"}.get(ext, "dictcc")
+    readers = {"wiktionary": _read_wiktionary, "dictcc": _read_dictcc, "tsv": _read_tsv}
+    return readers[fmt](path)
+
+
+def _read_wiktionary(path):
+    """kaikki.org导出的Wiktionary JSONL"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                data = json.loads(line)
+            except ValueError:
+                continue
+            if data.get("lang_code", "de") != "de" or not data.get("word"):
+                continue
+
+            glosses = []
+            tags = set(data.get("tags", []))
+            for sense in data.get("senses", []):
+                glosses.extend(sense.get("glosses", [])[:1])
+                tags.update(sense.get("tags", []))
+
+            gender = next((_GENDER_TAGS[tag] for tag in _GENDER_TAGS if tag in tags), "")
+            for template in data.get("head_templates", [])[:1]:
+                match = _WIKTIONARY_GENDER_RE.match(template.get("expansion", ""))
+                if match:
+                    gender = GENDER_ARTICLES[match.group(1)]
+
+            forms = [
+                form["form"] for form in data.get("forms", [])
+                if " " not in form.get("form", " ") and "table-tags" not in form.get("tags", [])
+            ]
+            yield data["word"], data.get("pos", ""), gender, "; ".join(glosses[:MAX_GLOSSES]), forms
+
+
+def _read_dictcc(path):
+    """dict.cc导出（德语<TAB>译文<TAB>词类），同一个原形的多行合并为一个词条"""
+    merged = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 2:
+                continue
+
+            german = fields[0]
+            lemma = " ".join(_DICTCC_NOTES_RE.sub("", german).split())
+            # 只收录单个词，短语不会被单击查询到
+            if not lemma or " " in lemma:
+                continue
+            pos = fields[2].split()[0] if len(fields) > 2 and fields[2].strip() else ""
+            gender_match = _DICTCC_GENDER_RE.search(german)
+            gender = GENDER_ARTICLES[gender_match.group(1)] if gender_match else ""
+
+            key = (lemma, pos)
+            if key not in merged:
+                merged[key] = [gender, []]
+            glosses = merged[key][1]
+            if len(glosses) < MAX_GLOSSES and fields[1] not in glosses:
+                glosses.append(fields[1])
+
+    for (lemma, pos), (gender, glosses) in merged.items():
+        yield lemma, pos, gender, "; ".join(glosses), []
+
+
+def _read_tsv(path):
+    """原形<TAB>词性<TAB>性<TAB>释义[<TAB>逗号分隔的词形]"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            fields = line.rstrip("\n").split("\t") + [""] * 4
+            lemma, pos, gender, gloss, forms = fields[:5]
+            yield lemma, pos, gender, gloss, [form.strip() for form in forms.split(",") if form.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地德语词典")
+    parser.add_argument("--db", help="词典文件路径（默认~/.readinghelp/dictionary.sqlite）")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="从词典数据导入")
+    import_parser.add_argument("dump", help="Wiktionary JSONL、dict.cc导出或TSV文件")
+    import_parser.add_argument("--format", choices=["wiktionary", "dictcc", "tsv"],
+                               help="文件格式（默认按扩展名判断）")
+    import_parser.add_argument("--replace", action="store_true", help="先清空已有的词条")
+
+    lookup_parser = commands.add_parser("lookup", help="查询单词")
+    lookup_parser.add_argument("word")
+    lookup_parser.add_argument("particle", nargs="?", help="句末的可分前缀")
+
+    args = parser.parse_args()
+    dictionary = Dictionary(args.db)
+    if args.command == "import":
+        if not os.path.exists(args.dump):
+            parser.error(f"找不到文件：{args.dump}")
+        count = dictionary.import_file(args.dump, args.format, args.replace)
+        print(f"导入{count}个词条，词典共{len(dictionary)}个词条：{dictionary.path}")
+    else:
+        entries = dictionary.lookup(args.word, args.particle)
+        if not entries:
+            print("词典中没有找到")
+        for entry in entries:
+            print(f"{entry.headword}（{entry.pos_name}）：{entry.gloss}")
+    dictionary.close()
+
+
+if __name__ == "__main__":
+    main()
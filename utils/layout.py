@@ -0,0 +1,165 @@
+"""
+版面分析：用投影轮廓把截图切分成按阅读顺序排列的图块
+
+1. Otsu二值化得到文字像素（文字像素总是少数，深色背景时自动反转）
+2. 递归XY切分：先在足够宽的空白列（栏间距）处分栏，再在足够高的空白行
+   （标题、段落之间）处切分，得到按阅读顺序排列的文本区域
+3. 每个区域按水平投影切分成文本行，按行间距分段，每段再按行数切分成图块
+
+每个图块至少有max_lines行（除非整个段落都不到max_lines行），段落末尾不足max_lines行的
+部分并入前一个图块：deu+eng识别时，只有两三行的图块上下文太少，Tesseract常常按英语
+识别整个图块，丢掉变音字母。
+"""
+import numpy as np
+
+from utils.preprocess import otsu_threshold
+
+
+class Tile:
+    """一个图块：[left, right) x [top, bottom)的像素范围，new_paragraph表示从新的段落开始"""
+
+    def __init__(self, left, top, right, bottom, lines=1, new_paragraph=True):
+        self.left = left
+        self.top = top
+        self.right = right
+        self.bottom = bottom
+        self.lines = lines  # 图块中的文本行数
+        self.new_paragraph = new_paragraph
+
+    @property
+    def box(self):
+        return (self.left, self.top, self.right, self.bottom)
+
+    def __repr__(self):
+        return f"Tile({self.box}, lines={self.lines}, new_paragraph={self.new_paragraph})"
+
+
+def ink_mask(gray):
+    """文字像素为True的二值图"""
+    mask = gray <= otsu_threshold(gray)
+    if mask.mean() > 0.5:
+        mask = ~mask
+    return mask
+
+
+def runs(profile, min_gap=1):
+    """profile中非零的连续区间[start, end)；短于min_gap的空白不切分"""
+    filled = np.flatnonzero(profile)
+    if not len(filled):
+        return []
+    breaks = np.flatnonzero(np.diff(filled) > min_gap)
+    starts = np.concatenate(([filled[0]], filled[breaks + 1]))
+    ends = np.concatenate((filled[breaks] + 1, [filled[-1] + 1]))
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def estimate_line_height(mask, slices=8):
+    """文字行高的中位数：在几个竖条中分别做水平投影（多栏时各栏的行不一定对齐）"""
+    width = mask.shape[1]
+    step = max(1, width // slices)
+    heights = []
+    for x in range(0, width, step):
+        heights.extend(end - start for start, end in runs(mask[:, x:x + step].any(axis=1)))
+    return float(np.median(heights)) if heights else 0.0
+
+
+def xy_cut(mask, box, line_height, blocks):
+    """递归切分box，把文本区域按阅读顺序（先栏后行）追加到blocks"""
+    left, top, right, bottom = box
+    region = mask[top:bottom, left:right]
+
+    # 栏间距至少1.5倍行高，比单词之间的空白宽得多
+    gutter = max(2, round(line_height * 1.5))
+    columns = runs(region.any(axis=0), gutter)
+    if len(columns) > 1:
+        for start, end in columns:
+            xy_cut(mask, (left + start, top, left + end, bottom), line_height, blocks)
+        return
+
+    # 标题和段落之间的空白比普通行间距高
+    rows = runs(region.any(axis=1), max(2, round(line_height * 1.2)))
+    if len(rows) > 1:
+        # 各栏的段落间隔恰好对齐时也会横向切开：相邻的、分栏方式相同的横条合并后再分栏，
+        # 保证先读完一栏再读下一栏
+        groups = []
+        for start, end in rows:
+            band_columns = runs(region[start:end].any(axis=0), gutter)
+            if groups and len(band_columns) > 1 and same_columns(groups[-1][2], band_columns):
+                groups[-1][1] = end
+            else:
+                groups.append([start, end, band_columns])
+        if len(groups) == 1:
+            groups = [(start, end, None) for start, end in rows]
+        for start, end, _ in groups:
+            xy_cut(mask, (left, top + start, right, top + end), line_height, blocks)
+        return
+
+    if columns and rows:
+        blocks.append((left + columns[0][0], top + rows[0][0], left + columns[0][1], top + rows[0][1]))
+
+
+def same_columns(a, b):
+    """两组栏的栏数相同并且对应的栏水平方向重叠"""
+    return len(a) == len(b) and all(x0 < y1 and y0 < x1 for (x0, x1), (y0, y1) in zip(a, b))
+
+
+def text_lines(mask, block, line_height):
+    """
+    把文本区域切分成文本行[(top, bottom)]，与上下相邻的小片段（变音符号、标点）并入该行
+
+    文字像素太少的行（噪声形成的零星像素）丢弃：一个字符的文字像素通常就有行高平方的10%以上。
+    """
+    left, top, right, bottom = block
+    small = max(2, line_height * 0.4)
+    lines = []
+    for start, end in runs(mask[top:bottom, left:right].any(axis=1)):
+        start, end = start + top, end + top
+        if lines and (end - start < small or lines[-1][1] - lines[-1][0] < small) and start - lines[-1][1] <= small:
+            lines[-1] = (lines[-1][0], end)
+        else:
+            lines.append((start, end))
+    min_ink = max(4, line_height * line_height * 0.1)
+    return [(start, end) for start, end in lines if mask[start:end, left:right].sum() >= min_ink]
+
+
+def analyze(gray, max_lines=4, margin=4):
+    """
+    分析灰度图像（二维uint8数组）的版面，返回按阅读顺序排列的Tile列表
+
+    图块上下留出最多margin像素的空白（不超过与相邻行间距的一半），左右留出margin像素。
+    """
+    height, width = gray.shape
+    mask = ink_mask(gray)
+    line_height = estimate_line_height(mask)
+    if not line_height:
+        return []
+
+    blocks = []
+    xy_cut(mask, (0, 0, width, height), line_height, blocks)
+
+    tiles = []
+    for left, top, right, bottom in blocks:
+        lines = text_lines(mask, (left, top, right, bottom), line_height)
+        gaps = [b[0] - a[1] for a, b in zip(lines, lines[1:])]
+        # 明显大于普通行间距的空白作为段落间隔
+        paragraph_gap = (float(np.median(gaps)) if gaps else 0) + line_height * 0.5
+
+        left, right = max(0, left - margin), min(width, right + margin)
+        # 段落末行的下标
+        ends = [i for i, gap in enumerate(gaps) if gap > paragraph_gap] + [len(lines) - 1]
+        start = 0
+        for end in ends:
+            new_paragraph = True
+            while start <= end:
+                # 剩下的行不足两个图块时全部放进这个图块
+                stop = end if end - start + 1 < 2 * max_lines else start + max_lines - 1
+                gap_above = gaps[start - 1] if start > 0 else margin * 2
+                gap_below = gaps[stop] if stop < len(gaps) else margin * 2
+                tiles.append(Tile(
+                    left, max(0, lines[start][0] - min(margin, gap_above // 2)),
+                    right, min(height, lines[stop][1] + min(margin, gap_below // 2)),
+                    stop - start + 1, new_paragraph
+                ))
+                new_paragraph = False
+                start = stop + 1
+    return tiles
@@ -0,0 +1,241 @@
+"""
+基于规则的德语词形还原
+
+去掉名词、形容词和动词的屈折词尾，还原变音（Häuser → Haus，größer → groß），
+处理过去分词（gemacht → machen）、zu不定式（anzufangen → anfangen）、常见的不规则动词，
+以及可分动词（"Ich fange morgen an"中的fange → anfangen）。
+
+规则本身无法判断哪个候选是真正的原形，所以lemma_candidates按可能性返回多个候选，
+由词典（utils/dictionary.py）选出实际存在的词条。
+"""
+import re
+
+# 可分动词前缀（durch、um、über、unter等也可能不可分，由词典过滤）
+SEPARABLE_PREFIXES = (
+    "zusammen", "zurück", "vorbei", "weiter", "heraus", "herein", "hinaus", "wieder",
+    "durch", "unter", "nach", "fest", "fort", "hin", "her", "los", "mit", "vor", "weg",
+    "auf", "aus", "bei", "ein", "dar", "über", "um", "ab", "an", "da", "zu",
+)
+
+# 常见不规则形式 -> 原形（过去式的人称词尾由规则去掉，这里只列词干）
+IRREGULAR = {
+    "bin": "sein", "bist": "sein", "ist": "sein", "sind": "sein", "seid": "sein",
+    "war": "sein", "gewesen": "sein",
+    "hat": "haben", "hast": "haben", "hatte": "haben", "gehabt": "haben",
+    "wird": "werden", "wirst": "werden", "wurde": "werden", "geworden": "werden",
+    "kann": "können", "konnte": "können", "muss": "müssen", "musste": "müssen",
+    "will": "wollen", "wollte": "wollen", "soll": "sollen", "sollte": "sollen",
+    "darf": "dürfen", "durfte": "dürfen", "mag": "mögen", "mochte": "mögen",
+    "weiß": "wissen", "wusste": "wissen", "gewusst": "wissen",
+    "ging": "gehen", "gegangen": "gehen", "kam": "kommen", "gekommen": "kommen",
+    "sieht": "sehen", "sah": "sehen", "gesehen": "sehen",
+    "gibt": "geben", "gab": "geben", "gegeben": "geben",
+    "nimmt": "nehmen", "nahm": "nehmen", "genommen": "nehmen",
+    "spricht": "sprechen", "sprach": "sprechen", "gesprochen": "sprechen",
+    "liest": "lesen", "las": "lesen", "gelesen": "lesen",
+    "hilft": "helfen", "half": "helfen", "geholfen": "helfen",
+    "trifft": "treffen", "traf": "treffen", "getroffen": "treffen",
+    "isst": "essen", "aß": "essen", "gegessen": "essen",
+    "stirbt": "sterben", "starb": "sterben", "gestorben": "sterben",
+    "fuhr": "fahren", "lief": "laufen", "fing": "fangen", "fiel": "fallen",
+    "hielt": "halten", "ließ": "lassen", "trug": "tragen", "schlug": "schlagen",
+    "wuchs": "wachsen", "blieb": "bleiben", "geblieben": "bleiben",
+    "schrieb": "schreiben", "geschrieben": "schreiben", "schien": "scheinen",
+    "geschienen": "scheinen", "fand": "finden", "gefunden": "finden",
+    "stand": "stehen", "gestanden": "stehen", "verstand": "verstehen",
+    "verstanden": "verstehen", "lag": "liegen", "gelegen": "liegen",
+    "saß": "sitzen", "gesessen": "sitzen", "dachte": "denken", "gedacht": "denken",
+    "brachte": "bringen", "gebracht": "bringen", "kannte": "kennen", "gekannt": "kennen",
+    "nannte": "nennen", "genannt": "nennen", "tat": "tun", "getan": "tun",
+    "trank": "trinken", "getrunken": "trinken", "zog": "ziehen", "gezogen": "ziehen",
+    "bot": "bieten", "geboten": "bieten", "hieß": "heißen", "geheißen": "heißen",
+    "rief": "rufen", "begann": "beginnen", "begonnen": "beginnen",
+    "verlor": "verlieren", "verloren": "verlieren", "bekam": "bekommen",
+    "gewann": "gewinnen", "gewonnen": "gewinnen", "warf": "werfen", "geworfen": "werfen",
+    "wirft": "werfen", "sang": "singen", "gesungen": "singen", "sprang": "springen",
+    "gesprungen": "springen", "flog": "fliegen", "geflogen": "fliegen",
+    "stieg": "steigen", "gestiegen": "steigen", "schloss": "schließen",
+    "geschlossen": "schließen", "vergaß": "vergessen", "vergisst": "vergessen",
+    # 冠词
+    "des": "der", "dem": "der", "den": "der", "die": "der", "das": "der",
+    "eines": "ein", "einem": "ein", "einen": "ein", "einer": "ein", "eine": "ein",
+}
+
+_UMLAUTS = str.maketrans("äöüÄÖÜ", "aouAOU")
+
+# 各词类的屈折词尾，较长的在前
+_NOUN_ENDINGS = ("innen", "ern", "nen", "en", "er", "es", "e", "n", "s")
+_ADJ_ENDINGS = ("em", "en", "er", "es", "e")
+_VERB_ENDINGS = ("test", "tet", "ten", "est", "te", "st", "et", "en", "e", "t", "n")
+
+_CLAUSE_END_RE = re.compile(r"[.,;:!?)\]»«\"“”]+$")
+_WORD_RE = re.compile(r"^[\W\d_]+|[\W\d_]+$")
+
+
+def _unumlaut(word):
+    """去掉变音：Häus → Haus，Bäum → Baum"""
+    return word.translate(_UMLAUTS)
+
+
+def _strip(word, endings, min_stem=2):
+    """依次尝试去掉每个词尾，返回所有可能的词干"""
+    return [word[:-len(ending)] for ending in endings
+            if word.endswith(ending) and len(word) - len(ending) >= min_stem]
+
+
+def _split_prefix(word, prefixes):
+    for prefix in prefixes:
+        if word.startswith(prefix) and len(word) - len(prefix) >= 3:
+            return prefix, word[len(prefix):]
+    return "", word
+
+
+def _infinitives(stem):
+    """动词词干对应的可能不定式：mach → machen，wander → wandern"""
+    forms = [stem + "en"]
+    if stem.endswith(("el", "er")):
+        forms.insert(0, stem + "n")
+    if stem.endswith("e"):
+        forms.append(stem + "n")
+    return forms
+
+
+def _irregular(word):
+    """不规则形式（包括过去式复数等带人称词尾的形式，如gingen → gehen）"""
+    if word in IRREGULAR:
+        return IRREGULAR[word]
+    for stem in _strip(word, ("en", "st", "t", "e"), 2):
+        if stem in IRREGULAR and IRREGULAR[stem] not in ("der", "ein"):
+            return IRREGULAR[stem]
+    return None
+
+
+def _verb_lemmas(word):
+    """小写的动词形式 -> 可能的不定式"""
+    lemmas = []
+    irregular = _irregular(word)
+    if irregular:
+        lemmas.append(irregular)
+
+    # 可分前缀 + 不规则形式 / zu不定式 / ge-分词：anfing、anzufangen、angefangen
+    prefix, rest = _split_prefix(word, SEPARABLE_PREFIXES)
+    if prefix:
+        irregular = _irregular(rest)
+        if irregular:
+            lemmas.append(prefix + irregular)
+        if rest.startswith("zu") and len(rest) > 5:
+            lemmas.append(prefix + rest[2:])
+        if rest.startswith("ge") and len(rest) > 5:
+            lemmas.extend(prefix + lemma for lemma in _participle_lemmas(rest))
+        lemmas.extend(prefix + lemma for lemma in _regular_verb_lemmas(rest))
+
+    if word.startswith("ge") and len(word) > 5:
+        lemmas.extend(_participle_lemmas(word))
+    lemmas.extend(_regular_verb_lemmas(word))
+    return lemmas
+
+
+def _participle_lemmas(word):
+    """ge-分词：gemacht → machen，gefahren → fahren"""
+    rest = word[2:]
+    if rest in IRREGULAR:
+        return [IRREGULAR[rest]]
+    if word in IRREGULAR:
+        return [IRREGULAR[word]]
+    lemmas = []
+    if rest.endswith("en"):
+        lemmas.append(rest)
+    for stem in _strip(rest, ("et", "t"), 2):
+        lemmas.extend(_infinitives(stem))
+    return lemmas
+
+
+def _regular_verb_lemmas(word):
+    """去掉人称、时态词尾：macht/machte/machten → machen，fährt → fahren"""
+    lemmas = []
+    if word.endswith(("en", "ern", "eln")):
+        lemmas.append(word)
+    for stem in _strip(word, _VERB_ENDINGS, 2):
+        lemmas.extend(_infinitives(stem))
+        if _unumlaut(stem) != stem:
+            lemmas.extend(_infinitives(_unumlaut(stem)))
+    return lemmas
+
+
+def _noun_lemmas(word):
+    """首字母大写的名词形式 -> 可能的单数主格：Häuser → Haus，Lehrerinnen → Lehrerin"""
+    lemmas = []
+    for ending in _NOUN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 2:
+            # 阴性复数只去掉-nen：Lehrerinnen → Lehrerin
+            lemmas.append(word[:-len(ending)] + ("in" if ending == "innen" else ""))
+    # 复数变音：Mütter → Mutter，Häuser → Haus
+    lemmas += [_unumlaut(lemma) for lemma in [word] + lemmas if _unumlaut(lemma) != lemma]
+    return lemmas
+
+
+def _adjective_lemmas(word):
+    """形容词词尾、比较级和最高级：schönen → schön，größer → groß，ältesten → alt"""
+    lemmas = []
+    for stem in [word] + _strip(word, _ADJ_ENDINGS, 2):
+        lemmas.append(stem)
+        for base in _strip(stem, ("est", "st", "er"), 2):
+            lemmas.append(base)
+            if _unumlaut(base) != base:
+                lemmas.append(_unumlaut(base))
+    return lemmas[1:]
+
+
+def normalize_token(token):
+    """去掉OCR单词首尾的标点和数字"""
+    return _WORD_RE.sub("", token)
+
+
+def lemma_candidates(word, particle=None):
+    """
+    返回word可能的原形，按可能性排序（第一个是word本身）
+
+    particle是句末的可分前缀（见find_particle），有时优先返回前缀 + 动词不定式。
+    """
+    word = normalize_token(word)
+    if not word:
+        return []
+    lower = word.lower()
+    capitalized = lower[:1].upper() + lower[1:]
+
+    candidates = [word, lower, capitalized]
+    verbs = _verb_lemmas(lower)
+    if particle:
+        candidates += [particle + verb for verb in verbs]
+    candidates += verbs[:1]  # 不规则形式优先于按词尾猜测的结果
+    # 小写的词不是名词（句首除外），优先按动词和形容词还原
+    if word[0].isupper():
+        candidates += _noun_lemmas(capitalized) + _adjective_lemmas(lower) + verbs[1:]
+    else:
+        candidates += verbs[1:] + _adjective_lemmas(lower) + _noun_lemmas(capitalized)
+
+    # 去重并保持顺序
+    return list(dict.fromkeys(candidates))
+
+
+def find_particle(words, index, max_distance=12):
+    """
+    在words[index]之后到分句结束之间查找可分动词的前缀
+
+    例如["Ich", "fange", "morgen", "an."]中index=1返回"an"。words[index]首字母大写
+    （名词）或后面没有单独的前缀时返回None。
+    """
+    word = normalize_token(words[index])
+    if not word or not word[0].islower():
+        return None
+
+    end = min(len(words), index + 1 + max_distance)
+    for position in range(index + 1, end):
+        token = words[position]
+        candidate = normalize_token(token).lower()
+        clause_end = bool(_CLAUSE_END_RE.search(token))
+        if candidate in SEPARABLE_PREFIXES and (clause_end or position == len(words) - 1):
+            return candidate
+        if clause_end:
+            return None
+    return None
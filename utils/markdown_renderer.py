@@ -0,0 +1,148 @@
+"""
+增量Markdown渲染
+
+流式回复每次更新都只在末尾追加文本。已经结束的块（段落、列表、表格、围栏代码块）
+转换一次后缓存HTML，之后只重新转换末尾仍可能继续增长的块，
+避免每收到一个片段就把整段回复重新解析一遍。
+"""
+import re
+
+import markdown
+
+MARKDOWN_EXTENSIONS = ['tables', 'fenced_code']
+
+# 聊天窗口中Markdown内容的样式，通过QTextDocument.setDefaultStyleSheet应用
+MARKDOWN_CSS = """
+p {
+    margin-top: 0;
+    margin-bottom: 6px;
+}
+code {
+    background-color: #f6f8fa;
+    font-family: Consolas, Monaco, monospace;
+}
+pre {
+    background-color: #f6f8fa;
+    margin-top: 5px;
+    margin-bottom: 5px;
+    font-family: Consolas, Monaco, monospace;
+}
+table {
+    border-collapse: collapse;
+}
+th, td {
+    border: 1px solid #cccccc;
+    padding: 4px;
+}
+th {
+    background-color: #f0f0f0;
+}
+"""
+
+_FENCE_RE = re.compile(r"^\s{0,3}(`{3,}|~{3,})")
+_LIST_ITEM_RE = re.compile(r"^\s{0,3}([-*+]|\d+[.)])\s")
+
+
+class IncrementalMarkdownRenderer:
+    """
+    对不断增长的同一段Markdown文本做增量转换
+
+    render(text)传入的文本如果以上一次已缓存的部分开头，就复用缓存；
+    否则（例如开始了新的消息）自动重置。
+    """
+
+    def __init__(self, extensions=None):
+        self.md = markdown.Markdown(extensions=extensions or MARKDOWN_EXTENSIONS)
+        self.reset()
+
+    def reset(self):
+        self._closed_text = ""   # 已结束的块对应的源文本
+        self._closed_html = []   # 已结束的块转换后的HTML
+
+    def render(self, text):
+        """返回text对应的HTML"""
+        closed_html, tail_html = self.render_blocks(text)
+        if tail_html:
+            return "\n".join(closed_html + [tail_html])
+        return "\n".join(closed_html)
+
+    def render_blocks(self, text):
+        """
+        返回(已结束块的HTML列表, 末尾块的HTML)
+
+        已结束块的列表只会在末尾追加（除非发生了重置），调用方可以只插入新增的部分。
+        """
+        if not text.startswith(self._closed_text):
+            self.reset()
+
+        self._close_finished_blocks(text)
+
+        tail = text[len(self._closed_text):]
+        tail_html = self._convert(tail) if tail.strip() else ""
+        return list(self._closed_html), tail_html
+
+    def _convert(self, source):
+        html = self.md.convert(source)
+        # 重置转换器状态（避免多次转换出现问题）
+        self.md.reset()
+        return html
+
+    def _close_finished_blocks(self, text):
+        """
+        从上次结束的位置往后扫描，把已经确定结束的块转换并缓存
+
+        块之间以空行分隔；围栏代码块内部的空行不算分隔。只有在下一个块已经开始时
+        才能确定前一个块结束，而且下一个块以缩进或列表项开头时（可能是同一列表的延续）
+        不在此处断开。
+        """
+        lines = text[len(self._closed_text):].splitlines(keepends=True)
+        # 最后一行可能还没写完，不参与判断
+        if lines and not lines[-1].endswith("\n"):
+            lines.pop()
+
+        fence = None      # 当前所在的围栏（```或~~~），块只会在围栏外结束
+        block = []        # 当前块的行
+        block_is_list = False
+        pending_blank = []  # 当前块之后的空行
+        offset = len(self._closed_text)
+
+        for line in lines:
+            if fence is not None:
+                block.append(line)
+                match = _FENCE_RE.match(line)
+                if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence):
+                    fence = None
+                continue
+
+            if not line.strip():
+                if block:
+                    pending_blank.append(line)
+                else:
+                    # 块与块之间多余的空行直接并入已结束部分
+                    offset += len(line)
+                    self._closed_text = text[:offset]
+                continue
+
+            starts_new_block = (
+                pending_blank
+                and not line[0].isspace()
+                and not (block_is_list and _LIST_ITEM_RE.match(line))
+            )
+            if starts_new_block:
+                source = "".join(block)
+                self._closed_html.append(self._convert(source))
+                offset += len(source) + len("".join(pending_blank))
+                self._closed_text = text[:offset]
+                block = []
+                block_is_list = False
+            elif pending_blank:
+                block.extend(pending_blank)
+            pending_blank = []
+
+            if not block:
+                block_is_list = bool(_LIST_ITEM_RE.match(line))
+            block.append(line)
+
+            match = _FENCE_RE.match(line)
+            if match:
+                fence = match.group(1)
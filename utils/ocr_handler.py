@@ -1,11 +1,448 @@
+import hashlib
 import os
+import queue
 import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import numpy as np
-from PIL import Image, ImageEnhance, ImageFilter
+from PIL import Image
 import pytesseract
 
+from utils.cache import TieredCache
+from utils.layout import analyze as analyze_layout
+from utils.preprocess import PreprocessPipeline
+
+# tesserocr是可选依赖：安装后可在进程内常驻Tesseract引擎，避免每次识别都启动新进程
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+class OCRCancelled(Exception):
+    """OCR任务被取消（例如用户开始了新的截图）"""
+
+
+class OCRStrategy:
+    """一种OCR配置：页面分割模式(PSM) + 是否使用预处理后的图像"""
+    
+    def __init__(self, name, psm, preprocessed=True, oem=3):
+        self.name = name
+        self.psm = psm
+        self.preprocessed = preprocessed
+        self.oem = oem
+    
+    @property
+    def config(self):
+        return f"--psm {self.psm} --oem {self.oem}"
+
+
+# image_to_data字典输出中的列
+DATA_KEYS = [
+    "level", "page_num", "block_num", "par_num", "line_num", "word_num",
+    "left", "top", "width", "height", "conf", "text",
+]
+
+
+# 默认策略顺序：与原先依次尝试的三种配置一致
+DEFAULT_STRATEGIES = [
+    OCRStrategy("psm3", 3),               # 自动页面分割
+    OCRStrategy("psm6", 6),               # 假设单一均匀文本块
+    OCRStrategy("psm3_raw", 3, preprocessed=False),  # 原始图像（无预处理）
+]
+
+
+def tile_strategies(lines):
+    """
+    分块识别时一个图块的策略：单行图块按单行文本识别（PSM 7），多行按均匀文本块（PSM 6）；
+    预处理后的图像置信度不够时再尝试原始图像
+    """
+    psm = 7 if lines == 1 else 6
+    return [OCRStrategy(f"tile_psm{psm}", psm), OCRStrategy(f"tile_psm{psm}_raw", psm, preprocessed=False)]
+
+
+class OCRLayout:
+    """
+    逐词的版面信息，按列存放在NumPy数组中
+    
+    第i个单词对应识别文本按空白分词后的第i个单词（与TextBlockWidget的单词顺序一致）。
+    - boxes: (n, 4) int32，原始截图像素坐标下的[left, top, right, bottom]
+    - line_ids: 单词所在的文本行号（即text.split("\\n")中的下标）
+    - par_ids: 单词所在的段落序号
+    - conf: 置信度0-100
+    """
+    
+    def __init__(self, words, boxes, line_ids, par_ids, conf):
+        self.words = list(words)
+        self.boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        self.line_ids = np.asarray(line_ids, dtype=np.int32)
+        self.par_ids = np.asarray(par_ids, dtype=np.int32)
+        self.conf = np.asarray(conf, dtype=np.float32)
+    
+    def __len__(self):
+        return len(self.words)
+    
+    def hit_test(self, x, y):
+        """返回包含点(x, y)的单词下标，没有时返回-1"""
+        boxes = self.boxes
+        inside = (boxes[:, 0] <= x) & (x < boxes[:, 2]) & (boxes[:, 1] <= y) & (y < boxes[:, 3])
+        hits = np.flatnonzero(inside)
+        return int(hits[0]) if len(hits) else -1
+    
+    def intersecting(self, left, top, right, bottom):
+        """返回与矩形相交的单词下标数组"""
+        boxes = self.boxes
+        mask = (boxes[:, 0] < right) & (boxes[:, 2] > left) & (boxes[:, 1] < bottom) & (boxes[:, 3] > top)
+        return np.flatnonzero(mask)
+    
+    def to_dict(self):
+        return {
+            "words": self.words,
+            "boxes": self.boxes.ravel().tolist(),
+            "line_ids": self.line_ids.tolist(),
+            "par_ids": self.par_ids.tolist(),
+            "conf": self.conf.tolist(),
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["words"], data["boxes"], data["line_ids"], data["par_ids"], data["conf"])
+
+
+class OCRResult:
+    """一次OCR的结果：文本、逐词置信度、版面信息以及耗时"""
+    
+    def __init__(self, strategy_name, text, words, elapsed_ms, layout=None):
+        self.strategy_name = strategy_name
+        self.text = text
+        self.words = words  # [(单词, 置信度0-100), ...]
+        self.elapsed_ms = elapsed_ms
+        self.layout = layout  # OCRLayout，旧的缓存条目中可能没有
+        self.attempts = [self]
+        self.from_cache = False
+    
+    @classmethod
+    def from_data(cls, strategy_name, data, elapsed_ms, scale=1.0):
+        """
+        从pytesseract.image_to_data的DICT输出构建结果
+        
+        scale为识别图像相对原始截图的放大倍数（预处理结果的info["scale"]），
+        单词位置会除以该倍数换算回原始截图的坐标。
+        """
+        words = []
+        lines = []
+        boxes = []
+        line_ids = []
+        par_ids = []
+        current_key = None
+        current_par = None
+        par_index = -1
+        
+        for i, word in enumerate(data.get("text", [])):
+            word = str(word).strip()
+            conf = float(data["conf"][i])
+            # conf为-1的条目是页/块/段/行等结构节点，不是单词
+            if not word or conf < 0:
+                continue
+            
+            par = (data["block_num"][i], data["par_num"][i])
+            key = par + (data["line_num"][i],)
+            if key != current_key:
+                # 段落之间保留空行，与image_to_string的输出格式一致
+                if current_par is not None and par != current_par:
+                    lines.append([])
+                if par != current_par:
+                    par_index += 1
+                lines.append([])
+                current_key = key
+                current_par = par
+            
+            # Tesseract偶尔会输出带空格的"单词"，拆开以保证与文本分词一一对应
+            left, top = data["left"][i], data["top"][i]
+            right, bottom = left + data["width"][i], top + data["height"][i]
+            for part in word.split():
+                words.append((part, conf))
+                lines[-1].append(part)
+                boxes.append((left, top, right, bottom))
+                line_ids.append(len(lines) - 1)
+                par_ids.append(par_index)
+        
+        text = "\n".join(" ".join(line) for line in lines)
+        
+        layout_boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        if scale != 1.0:
+            layout_boxes /= scale
+        layout = OCRLayout(
+            [word for word, _ in words], np.rint(layout_boxes), line_ids, par_ids,
+            [conf for _, conf in words]
+        )
+        return cls(strategy_name, text, words, elapsed_ms, layout)
+    
+    def to_dict(self):
+        """转换为可JSON序列化的字典（用于缓存）"""
+        data = {
+            "strategy_name": self.strategy_name,
+            "text": self.text,
+            "words": [[word, conf] for word, conf in self.words],
+            "elapsed_ms": self.elapsed_ms,
+        }
+        if self.layout is not None:
+            data["layout"] = self.layout.to_dict()
+        return data
+    
+    @classmethod
+    def from_dict(cls, data):
+        words = [(word, conf) for word, conf in data["words"]]
+        layout = OCRLayout.from_dict(data["layout"]) if "layout" in data else None
+        return cls(data["strategy_name"], data["text"], words, data["elapsed_ms"], layout)
+    
+    @classmethod
+    def combine(cls, parts, strategy_name="tiles", elapsed_ms=0.0):
+        """
+        按顺序合并各图块的结果，parts为(是否开始新段落, OCRResult)列表
+        
+        各结果的单词位置应已换算到整个截图的坐标。新段落之前保留空行，与from_data的输出格式一致；
+        不开始新段落的图块接在上一个图块的段落后面。
+        """
+        lines = []
+        words = []
+        boxes = []
+        line_ids = []
+        par_ids = []
+        last_par = -1
+        
+        for new_paragraph, result in parts:
+            if result is None or not result.text or result.layout is None:
+                continue
+            if lines and new_paragraph:
+                lines.append("")
+            base = last_par + 1 if new_paragraph or last_par < 0 else last_par
+            
+            layout = result.layout
+            words.extend(result.words)
+            boxes.append(layout.boxes)
+            line_ids.append(layout.line_ids + len(lines))
+            par_ids.append(layout.par_ids + base)
+            lines.extend(result.text.split("\n"))
+            last_par = base + (int(layout.par_ids.max()) if len(layout) else 0)
+        
+        layout = OCRLayout(
+            [word for word, _ in words],
+            np.concatenate(boxes) if boxes else [],
+            np.concatenate(line_ids) if line_ids else [],
+            np.concatenate(par_ids) if par_ids else [],
+            [conf for _, conf in words]
+        )
+        return cls(strategy_name, "\n".join(lines), words, elapsed_ms, layout)
+    
+    @property
+    def mean_confidence(self):
+        if not self.words:
+            return 0.0
+        return sum(conf for _, conf in self.words) / len(self.words)
+    
+    def score(self):
+        """用于比较不同策略的结果：先比平均置信度，再比识别出的文本长度"""
+        return (self.mean_confidence, len(self.text))
+
+
+class PytesseractBackend:
+    """通过pytesseract调用tesseract命令行的后端（每次识别都会启动新进程）"""
+    
+    name = "pytesseract"
+    
+    def __init__(self, lang):
+        self.lang = lang
+        self.version = ""
+    
+    def check(self):
+        """检查后端是否可用，不可用时抛出异常"""
+        self.version = str(pytesseract.get_tesseract_version())
+    
+    def image_to_data(self, image, strategy):
+        """返回与pytesseract.image_to_data(output_type=DICT)相同格式的字典"""
+        return pytesseract.image_to_data(
+            image,
+            lang=self.lang,
+            config=strategy.config,
+            output_type=pytesseract.Output.DICT
+        )
+    
+    def close(self):
+        pass
+
+
+class TesserocrBackend:
+    """
+    基于tesserocr的进程内后端
+    
+    维护小型的PyTessBaseAPI引擎池，语言模型在引擎创建时加载一次，
+    之后在整个程序生命周期内复用。每个引擎同一时间只被一个线程使用。
+    OEM只能在创建引擎时指定（PSM可以每次识别时设置），所以每种OEM各有一个引擎池。
+    """
+    
+    name = "tesserocr"
+    
+    def __init__(self, lang, pool_size=None):
+        if tesserocr is None:
+            raise ImportError("未安装tesserocr")
+        
+        # tesserocr使用"deu+eng"形式的语言参数，与命令行一致
+        self.lang = lang
+        self.pool_size = pool_size or min(4, os.cpu_count() or 1)
+        self._engines = {}  # oem -> 空闲引擎队列
+        self._all_engines = {}  # oem -> 已创建的引擎
+        self._slots = {}  # oem -> 已创建和正在创建的引擎数
+        self._lock = threading.Lock()
+        self.version = ""
+    
+    def check(self):
+        """创建第一个引擎，确认语言包可以加载"""
+        self.version = tesserocr.tesseract_version().splitlines()[0]
+        oem = int(tesserocr.OEM.DEFAULT)
+        self._release(oem, self._acquire(oem))
+    
+    def _acquire(self, oem):
+        """
+        取出一个该OEM的空闲引擎；池未满时新建，否则等待其他线程归还
+        
+        新建引擎要加载语言模型（几百毫秒），只在锁内占一个名额，在锁外创建，
+        多个线程可以同时创建引擎。创建失败时释放名额，并唤醒一个等待的线程重新尝试。
+        """
+        with self._lock:
+            idle = self._engines.setdefault(oem, queue.LifoQueue())
+        while True:
+            try:
+                engine = idle.get_nowait()
+            except queue.Empty:
+                engine = None
+            if engine is not None:
+                return engine
+            
+            with self._lock:
+                reserved = self._slots.get(oem, 0) < self.pool_size
+                if reserved:
+                    self._slots[oem] = self._slots.get(oem, 0) + 1
+            if not reserved:
+                # None表示有线程创建引擎失败，重新尝试
+                engine = idle.get()
+                if engine is not None:
+                    return engine
+                continue
+            
+            try:
+                engine = tesserocr.PyTessBaseAPI(lang=self.lang, oem=oem)
+            except Exception:
+                with self._lock:
+                    self._slots[oem] -= 1
+                idle.put(None)
+                raise
+            with self._lock:
+                self._all_engines.setdefault(oem, []).append(engine)
+            return engine
+    
+    def _release(self, oem, engine):
+        self._engines[oem].put(engine)
+    
+    def image_to_data(self, image, strategy):
+        """返回与pytesseract.image_to_data(output_type=DICT)相同格式的字典"""
+        oem = int(strategy.oem)
+        engine = self._acquire(oem)
+        try:
+            engine.SetPageSegMode(strategy.psm)
+            engine.SetImage(image)
+            dpi = image.info.get("dpi")
+            if dpi:
+                engine.SetSourceResolution(int(dpi[0]))
+            engine.Recognize()
+            return self._collect_words(engine)
+        finally:
+            engine.Clear()
+            self._release(oem, engine)
+    
+    def _collect_words(self, engine):
+        """遍历识别结果，按单词输出块/段/行编号、位置和置信度"""
+        RIL = tesserocr.RIL
+        data = {key: [] for key in DATA_KEYS}
+        block_num = par_num = line_num = word_num = 0
+        
+        iterator = engine.GetIterator()
+        if iterator is None:
+            return data
+        
+        for word in tesserocr.iterate_level(iterator, RIL.WORD):
+            if word.IsAtBeginningOf(RIL.BLOCK):
+                block_num += 1
+                par_num = 0
+            if word.IsAtBeginningOf(RIL.PARA):
+                par_num += 1
+                line_num = 0
+            if word.IsAtBeginningOf(RIL.TEXTLINE):
+                line_num += 1
+                word_num = 0
+            word_num += 1
+            
+            try:
+                text = word.GetUTF8Text(RIL.WORD)
+            except RuntimeError:
+                # 空单词时tesserocr抛出"No text returned"
+                continue
+            box = word.BoundingBox(RIL.WORD)
+            if text is None or box is None:
+                continue
+            left, top, right, bottom = box
+            
+            data["level"].append(5)
+            data["page_num"].append(1)
+            data["block_num"].append(block_num)
+            data["par_num"].append(par_num)
+            data["line_num"].append(line_num)
+            data["word_num"].append(word_num)
+            data["left"].append(left)
+            data["top"].append(top)
+            data["width"].append(right - left)
+            data["height"].append(bottom - top)
+            data["conf"].append(word.Confidence(RIL.WORD))
+            data["text"].append(text)
+        
+        return data
+    
+    def close(self):
+        """释放所有引擎"""
+        with self._lock:
+            for engines in self._all_engines.values():
+                for engine in engines:
+                    engine.End()
+            self._all_engines = {}
+            self._engines = {}
+            self._slots = {}
+
+
+def create_backend(name, lang):
+    """
+    按名称创建OCR后端
+    
+    - "tesserocr": 进程内常驻引擎
+    - "pytesseract": 调用tesseract命令行
+    - "auto": 优先tesserocr，不可用时退回pytesseract
+    """
+    if name == "tesserocr" or (name == "auto" and tesserocr is not None):
+        try:
+            backend = TesserocrBackend(lang)
+            backend.check()
+            return backend
+        except Exception as e:
+            if name == "tesserocr":
+                raise
+            print(f"tesserocr后端不可用，使用pytesseract：{e}")
+    
+    return PytesseractBackend(lang)
+
+
 class OCRHandler:
-    def __init__(self):
+    def __init__(self, confidence_threshold=70.0, backend="auto", cache_path=None,
+                 preprocess_profile="default"):
         # 指定pytesseract路径（Windows用户通常需要设置）
         # 如果Tesseract安装在默认位置，取消下面一行的注释并根据需要调整路径
         pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
@@ -14,14 +451,42 @@ class OCRHandler:
         # deu: 德语, eng: 英语
         self.lang = 'deu+eng'
         
-        # 检查是否安装了Tesseract
-        self.tesseract_installed = self._check_tesseract()
+        # 依次尝试的OCR策略，以及提前结束所需的平均单词置信度（0-100）
+        self.strategies = list(DEFAULT_STRATEGIES)
+        self.confidence_threshold = confidence_threshold
+        
+        # 图像预处理流水线（见utils/preprocess.py中的PROFILES）
+        self.set_preprocess_profile(preprocess_profile)
+        
+        # 多核机器上并行执行各个策略，总耗时接近最慢的单个策略
+        self.parallel = (os.cpu_count() or 1) > 1
+        self.executor = None
+        
+        # 分块识别：只用于大截图（约1280x720以上、至少tile_min_lines行文字、min_tiles个图块），
+        # 各图块并行识别，识别结果按阅读顺序陆续交给调用方。几行文字的小截图仍然整张尝试各个策略
+        self.tiling = True
+        self.min_tiles = 4
+        self.tile_min_pixels = 900_000
+        self.tile_min_lines = 20
+        self.tile_max_lines = 4
+        
+        # OCR结果缓存：键为预处理后像素与OCR配置的哈希；cache_path不为空时启用磁盘层
+        self.cache = TieredCache(max_entries=64, disk_path=cache_path)
+        
+        # 检查是否安装了Tesseract，并创建识别后端
+        # backend: "auto" / "tesserocr" / "pytesseract"
+        self.backend = None
+        self.tesseract_installed = self._check_tesseract(backend)
+        
+        # pytesseract每个图块都要启动一次tesseract进程，图块大一些以减少进程数
+        if self.backend is not None and self.backend.name == "pytesseract":
+            self.tile_max_lines = 12
     
-    def _check_tesseract(self):
+    def _check_tesseract(self, backend_name):
         """检查Tesseract是否正确安装"""
         try:
-            # 尝试运行一个简单的OCR测试
-            pytesseract.get_tesseract_version()
+            self.backend = create_backend(backend_name, self.lang)
+            self.backend.check()
             return True
         except Exception as e:
             print(f"Tesseract OCR检测失败: {e}")
@@ -31,100 +496,298 @@ class OCRHandler:
             return False
     
     def preprocess_image(self, image):
-        """图像预处理，提高OCR识别率"""
-        # 转为灰度图
-        gray_image = image.convert('L')
-        
-        # 增加对比度
-        enhancer = ImageEnhance.Contrast(gray_image)
-        gray_image = enhancer.enhance(2.0)  # 增强对比度
-        
-        # 锐化
-        gray_image = gray_image.filter(ImageFilter.SHARPEN)
-        
-        # 二值化处理 (阈值可以根据实际情况调整)
-        # 对于德语文本，通常保留灰度图像效果更好，所以这里不进行二值化
-        
-        return gray_image
+        """图像预处理，提高OCR识别率（NumPy流水线，阶段由preprocess_profile决定）"""
+        return self.pipeline.run(image)
+    
+    def set_preprocess_profile(self, profile):
+        """切换预处理方案：default / binary / document / small_text"""
+        self.pipeline = PreprocessPipeline.from_profile(profile)
+        self.preprocess_profile = profile
     
-    def process_image(self, pixmap):
+    def process_image(self, pixmap, progress=None, cancel_event=None, partial=None):
         """
-        处理QPixmap图像，返回识别出的文本
+        处理QPixmap图像，返回识别出的文本和识别结果
         
         参数:
-        - pixmap: QPixmap对象，通常来自截图
+        - pixmap: QPixmap或QImage对象，通常来自截图（在后台线程中调用时应传入QImage）
+        - progress: 可选回调progress(已完成数, 总数)，按策略数或分块识别时的图块数计
+        - cancel_event: 可选threading.Event，被设置后尽快抛出OCRCancelled
+        - partial: 可选回调partial(文本)，分块识别时按阅读顺序已经识别出的部分文本
         
         返回:
-        - 识别出的文本字符串
+        - (文本, OCRResult)：识别出的文本或错误提示，以及识别结果（出错时为None）。
+          结果随返回值交给调用方，多个线程同时识别时不会互相覆盖
         """
         if not self.tesseract_installed:
-            return "错误: Tesseract OCR未正确安装。请参考README.md中的安装说明。"
+            return "错误: Tesseract OCR未正确安装。请参考README.md中的安装说明。", None
         
         try:
             # 将QPixmap转换为PIL Image
             image = self.pixmap_to_image(pixmap)
             
-            # 图像预处理
-            processed_image = self.preprocess_image(image)
+            result = self.recognize(image, progress, cancel_event, partial)
             
-            # 尝试多种OCR配置，获取最佳结果
-            results = []
+            if result.text:
+                return result.text, result
             
-            # 配置1: 自动页面分割
-            text1 = pytesseract.image_to_string(
-                processed_image, 
-                lang=self.lang,
-                config='--psm 3 --oem 3'  # 自动页面分割，默认OCR引擎
-            )
-            if text1.strip():
-                results.append(text1)
-            
-            # 配置2: 假设单一文本块
-            text2 = pytesseract.image_to_string(
-                processed_image,
-                lang=self.lang,
-                config='--psm 6 --oem 3'  # 假设单一均匀文本块
-            )
-            if text2.strip():
-                results.append(text2)
-            
-            # 如果第一种方法识别的文本更多，则使用第一种
-            if results and len(results) > 1:
-                if len(text1) >= len(text2):
-                    return text1.strip()
-                else:
-                    return text2.strip()
-            elif results:
-                return results[0].strip()
-            else:
-                # 原始图像再试一次（无预处理）
-                text = pytesseract.image_to_string(
-                    image,
-                    lang=self.lang,
-                    config='--psm 3'
-                )
-                if text.strip():
-                    return text.strip()
-                
-                return "未能识别出文本，请尝试重新截图或调整图像清晰度。"
+            return "未能识别出文本，请尝试重新截图或调整图像清晰度。", result
             
+        except OCRCancelled:
+            raise
         except Exception as e:
             print(f"OCR处理过程中出错：{e}")
-            return f"OCR处理错误：{str(e)}"
+            return f"OCR处理错误：{str(e)}", None
+    
+    def recognize(self, image, progress=None, cancel_event=None, partial=None):
+        """
+        对PIL图像执行OCR策略，返回最佳的OCRResult
+        
+        一旦某个策略的平均置信度达到confidence_threshold就不再等待其他策略；
+        否则返回所有策略中得分最高的结果。每个策略的结果都记录在返回值的attempts中。
+        大截图按版面分块识别（见recognize_tiles）。
+        progress、cancel_event和partial的含义同process_image。
+        """
+        processed_image = self.preprocess_image(image)
+        
+        # 同一区域重复截图时直接返回缓存结果
+        cache_key = self._cache_key(processed_image)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            result = OCRResult.from_dict(cached)
+            result.from_cache = True
+            if progress:
+                progress(len(self.strategies), len(self.strategies))
+            return result
+        
+        tiles = []
+        if self.tiling and image.width * image.height >= self.tile_min_pixels:
+            tiles = analyze_layout(np.asarray(processed_image), self.tile_max_lines)
+        if len(tiles) >= self.min_tiles and sum(tile.lines for tile in tiles) >= self.tile_min_lines:
+            best = self.recognize_tiles(image, processed_image, tiles, progress, cancel_event, partial)
+            self.cache.set(cache_key, best.to_dict())
+            return best
+        
+        jobs = [
+            (strategy, processed_image if strategy.preprocessed else image)
+            for strategy in self.strategies
+        ]
+        
+        if self.parallel and len(jobs) > 1:
+            attempts = self._run_parallel(jobs, progress, cancel_event)
+        else:
+            attempts = self._run_sequential(jobs, progress, cancel_event)
+        
+        best = max(attempts, key=lambda result: result.score())
+        best.attempts = attempts
+        self.cache.set(cache_key, best.to_dict())
+        return best
+    
+    def _cache_key(self, processed_image):
+        """根据预处理后的像素和OCR配置（后端、策略、是否分块）计算缓存键"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{processed_image.mode}|{processed_image.size}|{self.lang}|".encode())
+        # 不同后端（和Tesseract版本）的识别结果不同，磁盘缓存不能混用
+        backend = f"{self.backend.name}:{self.backend.version}" if self.backend is not None else ""
+        digest.update(f"{backend}|{self.confidence_threshold}|".encode())
+        digest.update(
+            f"{self.tiling}:{self.min_tiles}:{self.tile_min_pixels}:{self.tile_min_lines}:{self.tile_max_lines}|".encode()
+        )
+        for strategy in self.strategies:
+            digest.update(f"{strategy.name}:{strategy.config}:{strategy.preprocessed};".encode())
+        digest.update(processed_image.tobytes())
+        return digest.hexdigest()
+    
+    def _run_sequential(self, jobs, progress=None, cancel_event=None):
+        """依次执行策略，置信度达标即停止"""
+        attempts = []
+        for strategy, source in jobs:
+            if cancel_event is not None and cancel_event.is_set():
+                raise OCRCancelled()
+            
+            result = self.run_strategy(strategy, source)
+            attempts.append(result)
+            if progress:
+                progress(len(attempts), len(jobs))
+            
+            # 置信度足够高，无需再尝试其他配置
+            if result.mean_confidence >= self.confidence_threshold:
+                break
+        return attempts
+    
+    def _run_parallel(self, jobs, progress=None, cancel_event=None):
+        """在线程池上同时执行所有策略，出现高置信度结果后取消其余策略"""
+        executor = self._get_executor()
+        futures = [executor.submit(self.run_strategy, strategy, source) for strategy, source in jobs]
+        
+        attempts = []
+        pending = set(futures)
+        try:
+            while pending:
+                # 短超时等待，以便及时响应取消
+                done, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+                if cancel_event is not None and cancel_event.is_set():
+                    raise OCRCancelled()
+                
+                for future in done:
+                    attempts.append(future.result())
+                if done and progress:
+                    progress(len(attempts), len(jobs))
+                
+                if any(result.mean_confidence >= self.confidence_threshold for result in attempts):
+                    break
+        finally:
+            # 尚未开始的策略直接取消；已在运行的tesseract进程结束后结果会被丢弃
+            for future in futures:
+                future.cancel()
+        
+        return attempts
+    
+    def recognize_tiles(self, image, processed_image, tiles, progress=None, cancel_event=None, partial=None):
+        """
+        在线程池上并行识别各图块（utils/layout.py的Tile，预处理后图像的坐标），按阅读顺序合并
+        
+        阅读顺序上连续完成的图块变多时，用这些图块合并出的文本调用partial，
+        第一个图块完成后就能显示第一段。
+        """
+        start = time.perf_counter()
+        executor = self._get_executor()
+        futures = {
+            executor.submit(self._recognize_tile, image, processed_image, tile): index
+            for index, tile in enumerate(tiles)
+        }
+        
+        results = [None] * len(tiles)
+        shown = 0  # 已经交给partial的图块数
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+                if cancel_event is not None and cancel_event.is_set():
+                    raise OCRCancelled()
+                
+                for future in done:
+                    results[futures[future]] = future.result()
+                if done and progress:
+                    progress(len(tiles) - len(pending), len(tiles))
+                
+                ready = shown
+                while ready < len(tiles) and results[ready] is not None:
+                    ready += 1
+                if ready > shown and pending and partial:
+                    partial(OCRResult.combine(
+                        [(tile.new_paragraph, result) for tile, result in zip(tiles[:ready], results)]
+                    ).text)
+                shown = ready
+        finally:
+            for future in futures:
+                future.cancel()
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        return OCRResult.combine(
+            [(tile.new_paragraph, result) for tile, result in zip(tiles, results)], "tiles", elapsed_ms
+        )
+    
+    def _recognize_tile(self, image, processed_image, tile):
+        """识别一个图块，单词位置换算到整个截图的坐标"""
+        scale = processed_image.info.get("scale", 1.0)
+        raw_box = tuple(round(value / scale) for value in tile.box)
+        sources = {True: processed_image.crop(tile.box), False: image.crop(raw_box)}
+        
+        best = None
+        for strategy in tile_strategies(tile.lines):
+            result = self.run_strategy(strategy, sources[strategy.preprocessed])
+            if best is None or result.score() > best.score():
+                best = result
+            if result.mean_confidence >= self.confidence_threshold:
+                break
+        
+        best.layout.boxes += np.array([raw_box[0], raw_box[1], raw_box[0], raw_box[1]], dtype=np.int32)
+        return best
+    
+    def _get_executor(self):
+        """获取可复用的OCR线程池（按需创建）"""
+        if self.executor is None:
+            # 每个pytesseract调用都在独立的tesseract进程中完成识别，
+            # Python线程只负责等待，所以线程池就足以让多个策略并行
+            self.executor = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                thread_name_prefix="ocr"
+            )
+        return self.executor
+    
+    def shutdown(self):
+        """释放OCR线程池和识别引擎"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        if self.backend is not None:
+            self.backend.close()
+        self.cache.close()
+    
+    def run_strategy(self, strategy, image):
+        """使用单个策略执行一次image_to_data，返回带逐词置信度的OCRResult"""
+        start = time.perf_counter()
+        data = self.backend.image_to_data(image, strategy)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        # 预处理可能放大了图像，单词位置需要换算回原始截图
+        return OCRResult.from_data(strategy.name, data, elapsed_ms, image.info.get("scale", 1.0))
     
     def pixmap_to_image(self, pixmap):
-        """将QPixmap转换为PIL Image"""
-        # 保存为临时图像
-        temp_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "temp_ocr.png")
-        pixmap.save(temp_path, "PNG")
+        """将QPixmap转换为PIL Image（优先在内存中直接转换，失败时退回临时文件）"""
+        try:
+            return self._pixmap_to_image_buffer(pixmap)
+        except Exception as e:
+            print(f"内存转换失败，改用临时文件：{e}")
+            return self._pixmap_to_image_file(pixmap)
+    
+    def _pixmap_to_image_buffer(self, pixmap):
+        """通过QImage的像素缓冲区直接构建PIL Image，只发生一次像素拷贝"""
+        # 延迟导入，保证不使用Qt的场景（如批处理）不依赖PySide6
+        from PySide6.QtGui import QImage
+        
+        # QPixmap只能在GUI线程使用，后台线程传入的是QImage
+        qimage = pixmap if isinstance(pixmap, QImage) else pixmap.toImage()
+        # 统一为RGBX8888：字节顺序固定为R,G,B,X，与平台字节序无关
+        if qimage.format() != QImage.Format_RGBX8888:
+            qimage = qimage.convertToFormat(QImage.Format_RGBX8888)
+        
+        width, height = qimage.width(), qimage.height()
+        if width == 0 or height == 0:
+            raise ValueError("空图像")
+        
+        # 每行字节数可能包含对齐填充，必须按bytesPerLine解析
+        stride = qimage.bytesPerLine()
+        buffer = qimage.constBits()
         
-        # 读取为PIL图像
-        image = Image.open(temp_path)
+        # "RGBX" -> "RGB" 解码时直接从Qt的内存拷贝到PIL自己的内存，
+        # 之后qimage释放也不会影响返回的图像
+        image = Image.frombytes("RGB", (width, height), buffer, "raw", "RGBX", stride, 1)
+        
+        # QPixmap的尺寸已经是物理像素，这里记录设备像素比对应的DPI，
+        # pytesseract保存图像时会带上该信息，便于Tesseract估算字号
+        dpi = round(96 * pixmap.devicePixelRatio())
+        image.info["dpi"] = (dpi, dpi)
+        
+        return image
+    
+    def _pixmap_to_image_file(self, pixmap):
+        """通过临时PNG文件转换（备用路径）"""
+        # 每次使用独立的临时文件，避免并发截图互相覆盖
+        fd, temp_path = tempfile.mkstemp(prefix="ocr_", suffix=".png")
+        os.close(fd)
         
-        # 删除临时文件
         try:
-            os.remove(temp_path)
-        except:
-            pass
+            pixmap.save(temp_path, "PNG")
             
-        return image 
\ No newline at end of file
+            # 读取为PIL图像，并在删除文件前完成解码
+            image = Image.open(temp_path)
+            image.load()
+        finally:
+            # 删除临时文件
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+        
+        return image
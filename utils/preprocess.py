@@ -0,0 +1,372 @@
+"""
+基于NumPy的OCR图像预处理流水线
+
+各阶段在uint8灰度数组上原地处理，需要更宽数值范围的中间结果（模糊求和、差值）
+放在按名称和形状复用的int16/uint16缓冲区里。与PIL的ImageEnhance/ImageFilter链
+相比，重复截图同一尺寸时除了输出图像外几乎不再分配整幅图像大小的内存。
+"""
+import threading
+
+import numpy as np
+from PIL import Image
+
+
+class PreprocessContext:
+    """一次预处理的工作区：记录DPI/缩放比例，并按名称、形状和类型复用缓冲区"""
+
+    def __init__(self):
+        self._buffers = {}
+        self.dpi = 96.0
+        self.scale = 1.0
+
+    def buffer(self, name, shape, dtype=np.uint8):
+        """返回指定形状和类型的缓冲区，内容未初始化"""
+        array = self._buffers.get(name)
+        if array is None or array.shape != shape or array.dtype != dtype:
+            array = np.empty(shape, dtype=dtype)
+            self._buffers[name] = array
+        return array
+
+    def scratch(self, name, size, dtype):
+        """至少size个元素的一维缓冲区，只在需要更大时重新分配（用于形状不固定的临时数据）"""
+        array = self._buffers.get(name)
+        if array is None or array.size < size or array.dtype != dtype:
+            array = np.empty(size, dtype=dtype)
+            self._buffers[name] = array
+        return array[:size]
+
+    def detach(self, array):
+        """把缓冲区交给调用方，之后同名的缓冲区重新分配；array不是缓冲区本身时返回拷贝"""
+        for name, buffer in self._buffers.items():
+            if buffer is array:
+                del self._buffers[name]
+                return array
+        return array.copy()
+
+
+def copy_image(image, out):
+    """
+    把L模式PIL图像的像素拷贝到形状相同的uint8数组
+
+    np.asarray(PIL图像)要先经过tobytes()，会临时分配两份整幅图像大小的内存；
+    这里用frombuffer得到与数组共享内存的图像，由PIL直接粘贴进去
+    （只读标记只在Python层检查，核心对象的paste直接写入）。
+    """
+    target = Image.frombuffer("L", image.size, out, "raw", "L", 0, 1)
+    target.im.paste(image.im, (0, 0) + image.size)
+    return out
+
+
+def _index_chunks(gray, rows_per_chunk, ctx):
+    """
+    按行分块，依次给出(块, 块的intp索引)
+
+    np.take和np.bincount都会把uint8索引转换成intp（每像素8字节），分块后临时内存只与块大小有关；
+    提供ctx时在复用的缓冲区里转换，整幅图像处理完也不会累计分配图像8倍大小的临时数组。
+    """
+    height, width = gray.shape
+    rows = min(rows_per_chunk, height)
+    index = None if ctx is None else ctx.scratch("index", rows * width, np.intp).reshape(rows, width)
+    for start in range(0, height, rows):
+        chunk = gray[start:start + rows]
+        if index is None:
+            yield chunk, chunk.astype(np.intp)
+        else:
+            chunk_index = index[:chunk.shape[0]]
+            chunk_index[...] = chunk
+            yield chunk, chunk_index
+
+
+def apply_lut(gray, lut, ctx=None, rows_per_chunk=64):
+    """用256项查找表原地映射uint8图像"""
+    for chunk, index in _index_chunks(gray, rows_per_chunk, ctx):
+        np.take(lut, index, out=chunk, mode="clip")
+    return gray
+
+
+def histogram(gray, ctx=None, rows_per_chunk=64):
+    """uint8图像的256级直方图（分块bincount）"""
+    hist = np.zeros(256, dtype=np.int64)
+    for _, index in _index_chunks(gray, rows_per_chunk, ctx):
+        hist += np.bincount(index.ravel(), minlength=256)
+    return hist
+
+
+def otsu_threshold(gray, ctx=None):
+    """Otsu阈值：灰度级不超过阈值的像素为一类，其余为另一类"""
+    hist = histogram(gray, ctx).astype(np.float64)
+    levels = np.arange(256, dtype=np.float64)
+
+    weight_bg = np.cumsum(hist)
+    weight_fg = weight_bg[-1] - weight_bg
+    sum_bg = np.cumsum(hist * levels)
+    mean_bg = sum_bg / np.maximum(weight_bg, 1)
+    mean_fg = (sum_bg[-1] - sum_bg) / np.maximum(weight_fg, 1)
+
+    # 类间方差最大的灰度级即为阈值
+    variance = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(variance))
+
+
+def box_sum(src, radius, ctx):
+    """
+    (2r+1)x(2r+1)窗口内的像素和（可分离的平移累加，结果为uint16）
+
+    只有距离边界至少radius的像素结果是完整窗口的和，调用方需要自行处理边界。
+    """
+    acc = ctx.buffer("box_acc", src.shape, np.uint16)
+    out = ctx.buffer("box_out", src.shape, np.uint16)
+
+    # 水平方向
+    acc[...] = src
+    for k in range(1, radius + 1):
+        acc[:, k:] += src[:, :-k]
+        acc[:, :-k] += src[:, k:]
+
+    # 垂直方向
+    out[...] = acc
+    for k in range(1, radius + 1):
+        out[k:] += acc[:-k]
+        out[:-k] += acc[k:]
+    return out
+
+
+class Grayscale:
+    """
+    转为灰度，流水线的入口阶段，输入为PIL图像
+
+    颜色转换本身交给PIL的C实现（单次遍历，不需要先展开成RGB数组），
+    结果拷贝到可复用的uint8缓冲区。
+    """
+
+    name = "grayscale"
+
+    def __call__(self, image, ctx):
+        gray_image = image if image.mode == "L" else image.convert("L")
+        return copy_image(gray_image, ctx.buffer("gray", (gray_image.height, gray_image.width)))
+
+
+class Upscale:
+    """
+    按DPI放大小字号截图
+
+    屏幕截图通常只有96 DPI，Tesseract在字高约30像素时效果最好，
+    因此把图像放大到target_dpi，同时限制最大倍数和总像素数。
+    """
+
+    name = "upscale"
+
+    def __init__(self, target_dpi=200, max_scale=3.0, max_pixels=12_000_000):
+        self.target_dpi = target_dpi
+        self.max_scale = max_scale
+        self.max_pixels = max_pixels
+
+    def __call__(self, gray, ctx):
+        height, width = gray.shape
+        scale = min(self.target_dpi / ctx.dpi, self.max_scale)
+        scale = min(scale, (self.max_pixels / (width * height)) ** 0.5)
+        if scale < 1.2:
+            return gray
+
+        size = (round(width * scale), round(height * scale))
+        resized = Image.fromarray(gray).resize(size, Image.BICUBIC)
+        ctx.scale *= size[0] / width
+
+        return copy_image(resized, ctx.buffer("upscaled", (size[1], size[0])))
+
+
+class ContrastStretch:
+    """按百分位拉伸对比度，把[low, high]百分位映射到[0, 255]"""
+
+    name = "contrast"
+
+    def __init__(self, low=1.0, high=99.0, sample_step=4):
+        self.low = low
+        self.high = high
+        self.sample_step = sample_step
+
+    def __call__(self, gray, ctx):
+        # 在降采样后的像素直方图上估计百分位即可
+        sample = gray[::self.sample_step, ::self.sample_step]
+        cdf = np.cumsum(histogram(sample, ctx))
+        low = int(np.searchsorted(cdf, cdf[-1] * self.low / 100))
+        high = int(np.searchsorted(cdf, cdf[-1] * self.high / 100))
+        if high - low < 1:
+            return gray
+
+        levels = np.arange(256, dtype=np.float32)
+        lut = np.clip((levels - low) * (255.0 / (high - low)), 0, 255).astype(np.uint8)
+        return apply_lut(gray, lut, ctx)
+
+
+class UnsharpMask:
+    """
+    反锐化掩模：gray += amount * (gray - blur(gray))
+
+    模糊使用(2r+1)x(2r+1)均值，差值在int16缓冲区里计算；边界radius像素保持不变。
+    """
+
+    name = "unsharp"
+
+    def __init__(self, radius=1, amount=1.0):
+        self.radius = radius
+        self.amount = amount
+
+    def __call__(self, gray, ctx):
+        r = self.radius
+        height, width = gray.shape
+        if height <= 2 * r or width <= 2 * r:
+            return gray
+
+        n = (2 * r + 1) ** 2
+        total = box_sum(gray, r, ctx)
+        # box_sum的两个缓冲区：复用box_acc存放有符号的差值
+        diff = ctx.buffer("box_acc", gray.shape, np.uint16).view(np.int16)
+
+        # diff = (gray * n - sum) / n * amount，amount以1/16为精度
+        np.multiply(gray, n, out=diff, dtype=np.int16)
+        diff -= total.view(np.int16)
+        diff //= n
+        diff *= round(self.amount * 16)
+        diff >>= 4
+        diff += gray
+        np.clip(diff, 0, 255, out=diff)
+
+        gray[r:-r, r:-r] = diff[r:-r, r:-r]
+        return gray
+
+
+class OtsuThreshold:
+    """全局Otsu二值化，适合背景均匀的截图"""
+
+    name = "otsu"
+
+    def __call__(self, gray, ctx):
+        threshold = otsu_threshold(gray, ctx)
+        lut = np.where(np.arange(256) > threshold, 255, 0).astype(np.uint8)
+        return apply_lut(gray, lut, ctx)
+
+
+class SauvolaThreshold:
+    """
+    Sauvola局部自适应二值化，适合光照不均或有背景纹理的截图
+
+    T = m * (1 + k * (s / R - 1))，m和s为窗口内的均值和标准差。
+    阈值曲面变化平缓，所以m和s在block x block的网格上计算，再按块展开比较。
+    """
+
+    name = "sauvola"
+
+    def __init__(self, window=25, k=0.2, r=128.0, block=4):
+        self.window = window
+        self.k = k
+        self.r = r
+        self.block = block
+
+    def __call__(self, gray, ctx):
+        b = self.block
+        height, width = gray.shape
+        rows, cols = -(-height // b), -(-width // b)
+
+        # 尺寸不是block的整数倍时按边缘像素补齐
+        padded = gray
+        if rows * b != height or cols * b != width:
+            padded = np.pad(gray, ((0, rows * b - height), (0, cols * b - width)), mode="edge")
+
+        # 每个块的均值和平方均值（先按行内分组求和，再按行分组求和）
+        mean = _block_sum(padded, b, np.uint16).astype(np.float32)
+        mean /= b * b
+        square = ctx.buffer("square", padded.shape, np.uint16)
+        np.multiply(padded, padded, out=square, dtype=np.uint16)
+        mean_sq = _block_sum(square, b, np.uint32).astype(np.float32)
+        mean_sq /= b * b
+
+        # 在块网格上做窗口平均
+        radius = max(1, self.window // (2 * b))
+        mean = _grid_box_mean(mean, radius)
+        mean_sq = _grid_box_mean(mean_sq, radius)
+        std = np.sqrt(np.maximum(mean_sq - mean * mean, 0))
+
+        threshold = mean * (1 + self.k * (std / self.r - 1))
+        threshold = np.clip(threshold, 0, 255).astype(np.uint8)
+
+        # 逐块比较，只分配一个bool掩码
+        mask = ctx.buffer("mask", padded.shape, np.bool_)
+        blocks = padded.reshape(rows, b, cols, b)
+        np.greater(blocks, threshold[:, None, :, None], out=mask.reshape(rows, b, cols, b))
+        np.multiply(mask[:height, :width], np.uint8(255), out=gray)
+        return gray
+
+
+def _block_sum(array, b, dtype):
+    """把图像划分为b x b的块并求每块像素和"""
+    height, width = array.shape
+    rows, cols = height // b, width // b
+    row_sums = array.reshape(height, cols, b).sum(axis=2, dtype=dtype)
+    return row_sums.reshape(rows, b, cols).sum(axis=1, dtype=np.uint32)
+
+
+def _grid_box_mean(grid, radius):
+    """小网格上的均值滤波（积分图），边界按实际窗口大小归一化"""
+    padded = np.pad(grid, radius, mode="edge")
+    integral = np.zeros((padded.shape[0] + 1, padded.shape[1] + 1), dtype=np.float64)
+    np.cumsum(np.cumsum(padded, axis=0), axis=1, out=integral[1:, 1:])
+
+    size = 2 * radius + 1
+    rows, cols = grid.shape
+    total = (integral[size:size + rows, size:size + cols]
+             - integral[:rows, size:size + cols]
+             - integral[size:size + rows, :cols]
+             + integral[:rows, :cols])
+    return (total / (size * size)).astype(np.float32)
+
+
+# 各预处理方案使用的阶段（Grayscale总是第一步）
+PROFILES = {
+    # 默认：对比度拉伸 + 锐化，保留灰度（德语文本通常保留灰度效果更好）
+    "default": [ContrastStretch(), UnsharpMask()],
+    # 背景均匀的截图：在默认方案后做全局二值化
+    "binary": [ContrastStretch(), UnsharpMask(), OtsuThreshold()],
+    # 扫描件/照片：局部自适应二值化
+    "document": [ContrastStretch(), SauvolaThreshold()],
+    # 小字号：先按DPI放大
+    "small_text": [Upscale(), ContrastStretch(), UnsharpMask()],
+}
+
+
+class PreprocessPipeline:
+    """由多个阶段组成的预处理流水线，每个线程复用自己的缓冲区"""
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self._local = threading.local()
+
+    @classmethod
+    def from_profile(cls, profile):
+        if profile not in PROFILES:
+            raise ValueError(f"未知的预处理方案：{profile}（可选：{', '.join(PROFILES)}）")
+        return cls(PROFILES[profile])
+
+    def _context(self):
+        ctx = getattr(self._local, "ctx", None)
+        if ctx is None:
+            ctx = self._local.ctx = PreprocessContext()
+        return ctx
+
+    def run(self, image):
+        """处理PIL图像，返回L模式的PIL图像（info中带有dpi和放大倍数scale）"""
+        ctx = self._context()
+        dpi = image.info.get("dpi")
+        ctx.dpi = float(dpi[0]) if dpi else 96.0
+        ctx.scale = 1.0
+
+        gray = Grayscale()(image, ctx)
+        for stage in self.stages:
+            gray = stage(gray, ctx)
+
+        # 输出图像直接使用最后的缓冲区（共享内存），下一次调用重新分配该缓冲区
+        result = Image.fromarray(ctx.detach(gray))
+        dpi = round(ctx.dpi * ctx.scale)
+        result.info["dpi"] = (dpi, dpi)
+        result.info["scale"] = ctx.scale
+        return result
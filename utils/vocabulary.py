@@ -0,0 +1,148 @@
+"""
+批量解释选中的单词
+
+一次请求发送原文和所有选中的单词，要求模型以JSON返回每个单词的原形、词性、性、
+在原文中的含义和例句，界面上显示为表格。结果按原文缓存，之后再查询同一段原文中的
+这些单词时直接在本地回答，不再请求API。
+"""
+import hashlib
+import json
+import re
+from collections import OrderedDict
+
+# (字段, 表头)
+VOCABULARY_FIELDS = [
+    ("word", "单词"),
+    ("lemma", "原形"),
+    ("pos", "词性"),
+    ("gender", "性"),
+    ("meaning", "含义"),
+    ("example", "例句"),
+]
+
+_EDGE_PUNCT_RE = re.compile(r"^[\W_]+|[\W_]+$")
+_JSON_RE = re.compile(r"[\[{].*[\]}]", re.S)
+
+
+def normalize_word(word):
+    """去掉单词首尾的标点（OCR分词时标点和单词连在一起）"""
+    return _EDGE_PUNCT_RE.sub("", word.strip())
+
+
+def vocabulary_prompt(words):
+    """要求模型以JSON返回每个单词信息的问题（原文作为上下文单独发送）"""
+    listing = "\n".join(f"- {word}" for word in words)
+    return (
+        "请解释原文中的以下单词，只返回一个JSON对象，不要其他内容。格式：\n"
+        '{"words": [{"word": "原文中的写法", "lemma": "原形（名词单数主格、动词不定式）", '
+        '"pos": "词性（中文）", "gender": "名词的性 der/die/das，非名词为空字符串", '
+        '"meaning": "在这段原文中的中文含义", "example": "一个简短的德语例句"}]}\n'
+        "按给出的顺序，每个单词一项：\n" + listing
+    )
+
+
+def vocabulary_max_tokens(count):
+    """批量解释的回复长度上限：每个单词大约100个token"""
+    return min(4000, 200 + 100 * count)
+
+
+class VocabularyEntry:
+    """一个单词的解释"""
+
+    def __init__(self, word, lemma="", pos="", gender="", meaning="", example=""):
+        self.word = word
+        self.lemma = lemma
+        self.pos = pos
+        self.gender = gender
+        self.meaning = meaning
+        self.example = example
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field, _ in VOCABULARY_FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        values = {field: str(data.get(field) or "").strip() for field, _ in VOCABULARY_FIELDS}
+        return cls(**values)
+
+
+def parse_vocabulary(text):
+    """
+    解析模型返回的JSON，返回VocabularyEntry列表
+
+    兼容```json代码块包裹、顶层直接是列表等情况；无法解析时返回None。
+    """
+    match = _JSON_RE.search(text or "")
+    if match is None:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return None
+
+    if isinstance(data, dict):
+        data = data.get("words", next((value for value in data.values() if isinstance(value, list)), None))
+    if not isinstance(data, list):
+        return None
+
+    entries = [
+        VocabularyEntry.from_dict(item)
+        for item in data
+        if isinstance(item, dict) and item.get("word")
+    ]
+    return entries or None
+
+
+def vocabulary_table(entries):
+    """把解释列表转换为Markdown表格"""
+    def cell(value):
+        return value.replace("|", "\\|").replace("\n", " ") or "-"
+
+    lines = [
+        "| " + " | ".join(title for _, title in VOCABULARY_FIELDS) + " |",
+        "|" + "---|" * len(VOCABULARY_FIELDS),
+    ]
+    for entry in entries:
+        lines.append("| " + " | ".join(cell(getattr(entry, field)) for field, _ in VOCABULARY_FIELDS) + " |")
+    return "\n".join(lines)
+
+
+class VocabularyCache:
+    """
+    按原文缓存单词解释（内存中，最多保留max_passages段原文，最久未使用的先淘汰）
+
+    同一个单词在不同的原文中含义可能不同，所以缓存键是(原文, 单词)。
+    """
+
+    def __init__(self, max_passages=32):
+        self.max_passages = max_passages
+        self._passages = OrderedDict()  # 原文摘要 -> {单词: VocabularyEntry}
+
+    def _passage_key(self, passage):
+        normalized = " ".join(passage.split())
+        return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+    def _word_key(self, word):
+        return normalize_word(word).casefold()
+
+    def add(self, passage, entries):
+        key = self._passage_key(passage)
+        words = self._passages.pop(key, {})
+        for entry in entries:
+            words[self._word_key(entry.word)] = entry
+        self._passages[key] = words
+
+        while len(self._passages) > self.max_passages:
+            self._passages.popitem(last=False)
+
+    def lookup(self, passage, word):
+        """返回缓存的解释，没有时返回None"""
+        key = self._passage_key(passage)
+        words = self._passages.get(key)
+        if words is None:
+            return None
+        self._passages.move_to_end(key)
+        return words.get(self._word_key(word))
+
+    def __len__(self):
+        return sum(len(words) for words in self._passages.values())
@@ -0,0 +1,307 @@
+"""
+跟随模式：定时重新截取同一屏幕区域时的变化检测和文本拼接（不依赖Qt）
+
+用户滚动PDF等长文档时，每一帧先与上一帧比较：
+- 完全相同：什么都不做
+- 内容整体上下移动（滚动）：用行指纹估计滚动的像素行数，只识别新露出的部分
+  和对齐后仍有变化的部分
+- 局部变化：按图块比较找出变化的水平条带，只识别这些条带
+条带会扩展到文本行之间的空白处，避免把一行文字从中间切开。
+
+识别结果按"文档坐标"（第一帧顶部为0，向下滚动时增加）保存为文本行，新识别的条带
+替换文档中同一位置的旧文本行，再拼接成完整文本。滚动一行只需要识别一行，
+回滚到已经识别过的位置时不需要重新识别。
+"""
+import numpy as np
+
+
+class FrameChange:
+    """一帧相对上一帧的变化"""
+
+    def __init__(self, kind, shift=0, revealed=None, changed=()):
+        self.kind = kind  # "new" / "same" / "scroll" / "changed"
+        self.shift = shift  # 内容向上移动的像素行数（向下滚动为正）
+        self.revealed = revealed  # 滚动后新露出的[top, bottom)行范围，没有时为None
+        self.changed = list(changed)  # 内容发生变化的[top, bottom)行范围
+
+    def __repr__(self):
+        return f"FrameChange({self.kind!r}, shift={self.shift}, revealed={self.revealed}, changed={self.changed})"
+
+
+def merge_ranges(ranges):
+    """合并重叠或相邻的[top, bottom)范围"""
+    merged = []
+    for top, bottom in sorted(ranges):
+        if bottom <= top:
+            continue
+        if merged and top <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], bottom))
+        else:
+            merged.append((top, bottom))
+    return merged
+
+
+def rows_in(ranges):
+    """[top, bottom)范围的总行数"""
+    return sum(bottom - top for top, bottom in ranges)
+
+
+def ink_rows(frame, contrast=48):
+    """每一行是否有文字（行内最亮和最暗的像素相差超过contrast）"""
+    return (frame.max(axis=1).astype(np.int16) - frame.min(axis=1)) > contrast
+
+
+def expand_to_lines(ranges, ink, margin=3):
+    """
+    把行范围扩展到上下最近的空白行，保证条带包含完整的文本行
+
+    扩展后上下各保留最多margin行空白，给OCR留出边距。
+    """
+    height = len(ink)
+    blank = np.flatnonzero(~ink)
+    expanded = []
+    for top, bottom in ranges:
+        i = np.searchsorted(blank, top) - 1
+        top = blank[i] + 1 if i >= 0 else 0
+        j = np.searchsorted(blank, bottom)
+        bottom = blank[j] if j < len(blank) else height
+        expanded.append((max(0, int(top) - margin), min(height, int(bottom) + margin)))
+    return merge_ranges(expanded)
+
+
+class FrameDiffer:
+    """
+    比较连续的灰度帧（二维uint8数组）
+
+    - tile: 图块边长（像素），同一行图块中有变化的图块时整行图块作为变化的条带
+    - threshold: 像素灰度差超过该值才算变化，忽略抗锯齿和压缩带来的细微差异
+    - min_pixels: 图块中至少有这么多像素变化才算变化，忽略孤立的噪点
+    - min_overlap: 滚动前后至少重叠的比例，决定滚动估计的搜索范围
+    """
+
+    def __init__(self, tile=32, threshold=32, min_pixels=4, min_overlap=0.3):
+        self.tile = tile
+        self.threshold = threshold
+        self.min_pixels = min_pixels
+        self.min_overlap = min_overlap
+        self.previous = None
+        self._previous_profile = None
+        self._weights = None
+
+    def reset(self):
+        self.previous = None
+        self._previous_profile = None
+
+    def compare(self, frame):
+        """比较新的一帧与上一帧，返回FrameChange；新的一帧成为下一次比较的基准"""
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        previous, previous_profile = self.previous, self._previous_profile
+        self.previous = frame
+        self._previous_profile = None
+        height = frame.shape[0]
+
+        if previous is None or previous.shape != frame.shape:
+            return FrameChange("new", changed=[(0, height)])
+        if np.array_equal(previous, frame):
+            self._previous_profile = previous_profile
+            return FrameChange("same")
+
+        changed = self.changed_rows(previous, frame)
+        if not changed:
+            return FrameChange("same")
+
+        if previous_profile is None:
+            previous_profile = self.row_profile(previous)
+        profile = self._previous_profile = self.row_profile(frame)
+        shift = self.estimate_shift(previous_profile, profile)
+        if shift == 0:
+            return FrameChange("changed", changed=changed)
+
+        # 按滚动量对齐后再比较重叠部分，找出滚动以外的变化
+        if shift > 0:
+            revealed = (height - shift, height)
+            aligned = self.changed_rows(previous[shift:], frame[:height - shift])
+        else:
+            revealed = (0, -shift)
+            aligned = [(top - shift, bottom - shift) for top, bottom in
+                       self.changed_rows(previous[:height + shift], frame[-shift:])]
+
+        # 内容重复（表格、相似的行）时滚动估计可能出错：取需要重新识别的行数较少的解释
+        if abs(shift) + rows_in(aligned) >= rows_in(changed):
+            return FrameChange("changed", changed=changed)
+        return FrameChange("scroll", shift, revealed, aligned)
+
+    def changed_rows(self, a, b):
+        """逐图块比较两个同样大小的帧，返回有变化的图块行对应的[top, bottom)行范围"""
+        height, width = a.shape
+        tile = self.tile
+        diff = np.abs(a.astype(np.int16) - b) > self.threshold
+
+        # 补齐到图块大小的整数倍后按(图块行, 行内, 图块列, 列内)统计变化的像素数
+        pad_h, pad_w = -height % tile, -width % tile
+        if pad_h or pad_w:
+            diff = np.pad(diff, ((0, pad_h), (0, pad_w)))
+        counts = diff.reshape(diff.shape[0] // tile, tile, diff.shape[1] // tile, tile).sum(axis=(1, 3))
+        tile_rows = np.flatnonzero((counts >= self.min_pixels).any(axis=1))
+
+        return merge_ranges((int(row) * tile, min(height, (int(row) + 1) * tile)) for row in tile_rows)
+
+    def row_profile(self, frame):
+        """
+        行指纹：每行像素按固定的随机权重加权平均
+
+        只用行平均值时不同文字的行很容易相同，加权后每行的值取决于文字的水平分布。
+        """
+        width = frame.shape[1]
+        if self._weights is None or len(self._weights) != width:
+            self._weights = np.random.default_rng(0).random(width).astype(np.float32) / width
+        return frame.astype(np.float32) @ self._weights
+
+    def estimate_shift(self, previous, current, tolerance=0.5):
+        """
+        估计内容向上移动的行数（向下滚动为正），不是滚动时返回0
+
+        用互相关一次算出所有偏移下重叠部分行指纹的均方差，取最小的偏移；
+        该偏移下的平均差必须足够小，并且明显小于不偏移时的差，避免把普通的内容变化当成滚动。
+        """
+        p = previous.astype(np.float64)
+        q = current.astype(np.float64)
+        height = len(q)
+        max_shift = int(height * (1 - self.min_overlap))
+
+        # 偏移s时当前帧第i行对应上一帧第i+s行：SSD(s) = Σp² + Σq² - 2Σp[i+s]q[i]
+        shifts = np.arange(-(height - 1), height)
+        cross = np.correlate(p, q, "full")
+        p2 = np.concatenate(([0.0], np.cumsum(p * p)))
+        q2 = np.concatenate(([0.0], np.cumsum(q * q)))
+        ahead = shifts >= 0
+        energy = np.where(
+            ahead,
+            p2[-1] - p2[np.clip(shifts, 0, height)] + q2[np.clip(height - shifts, 0, height)],
+            p2[np.clip(height + shifts, 0, height)] + q2[-1] - q2[np.clip(-shifts, 0, height)],
+        )
+        mse = np.maximum(energy - 2 * cross, 0) / (height - np.abs(shifts))
+        # 超出搜索范围的偏移不考虑；大段空白时优先选择较小的偏移
+        mse[np.abs(shifts) > max_shift] = np.inf
+        best = int(shifts[np.argmin(mse + np.abs(shifts) * 1e-9)])
+        if best == 0:
+            return 0
+
+        if best > 0:
+            error = np.abs(p[best:] - q[:height - best]).mean()
+        else:
+            error = np.abs(p[:height + best] - q[-best:]).mean()
+        if error > tolerance or error > np.abs(p - q).mean() * 0.5:
+            return 0
+        return best
+
+
+def result_lines(result):
+    """
+    从OCRResult中取出文本行[(top, bottom, 文本)]，坐标为识别图像中的像素行
+
+    没有版面信息时（旧的缓存条目）把全部文本作为一行。
+    """
+    layout = result.layout if result is not None else None
+    if layout is None or not len(layout):
+        text = " ".join(result.text.split()) if result is not None else ""
+        return [(0, 0, text)] if text else []
+
+    lines = []
+    for line_id in np.unique(layout.line_ids):
+        indices = np.flatnonzero(layout.line_ids == line_id)
+        boxes = layout.boxes[indices]
+        text = " ".join(layout.words[i] for i in indices)
+        lines.append((int(boxes[:, 1].min()), int(boxes[:, 3].max()), text))
+    return lines
+
+
+class WatchDocument:
+    """跟随模式中累积的文本：按文档坐标排列的文本行"""
+
+    def __init__(self):
+        self.lines = []  # [(top, bottom, 文本)]，按top排序
+        self.covered = []  # 已经识别过的[top, bottom)范围
+        self.offset = 0  # 当前帧顶部的文档坐标
+
+    def replace(self, top, bottom, lines):
+        """用新识别的文本行替换[top, bottom)范围内（按行的中线判断）的旧文本行"""
+        kept = [line for line in self.lines if not top <= (line[0] + line[1]) / 2 < bottom]
+        self.lines = sorted(kept + list(lines))
+        self.covered = merge_ranges(self.covered + [(top, bottom)])
+
+    def is_covered(self, top, bottom):
+        return any(start <= top and bottom <= end for start, end in self.covered)
+
+    def text(self):
+        """拼接全文：行间距明显大于行高时视为段落，段落之间保留空行"""
+        if not self.lines:
+            return ""
+
+        heights = [bottom - top for top, bottom, _ in self.lines if bottom > top]
+        line_height = float(np.median(heights)) if heights else 0.0
+        parts = []
+        previous_bottom = None
+        for top, bottom, text in self.lines:
+            if previous_bottom is not None and line_height and top - previous_bottom > line_height * 0.9:
+                parts.append("")
+            parts.append(text)
+            previous_bottom = bottom
+        return "\n".join(parts)
+
+
+class WatchSession:
+    """
+    一次跟随：比较帧、决定需要识别的条带，并把识别结果拼接到文档中
+
+    plan()返回的条带为(top, bottom, doc_top)：[top, bottom)是当前帧中的像素行，
+    doc_top是条带顶部的文档坐标。识别完成后用apply()写回文档。
+    """
+
+    def __init__(self, differ=None, reset_fraction=0.6):
+        self.differ = differ or FrameDiffer()
+        self.document = WatchDocument()
+        # 不是滚动且超过这个比例的行发生变化时（例如翻页），丢弃之前的文本重新开始
+        self.reset_fraction = reset_fraction
+
+    def plan(self, frame):
+        """比较新的一帧，返回(FrameChange, 需要识别的条带列表)"""
+        change = self.differ.compare(frame)
+        if change.kind == "same":
+            return change, []
+
+        height = frame.shape[0]
+        if change.kind == "new" or (change.kind == "changed" and rows_in(change.changed) > height * self.reset_fraction):
+            self.document = WatchDocument()
+            change.changed = [(0, height)]
+        elif change.kind == "scroll":
+            self.document.offset += change.shift
+
+        ink = ink_rows(frame)
+        offset = self.document.offset
+        ranges = list(change.changed)
+        if change.revealed is not None:
+            # 回滚到已经识别过的位置时不需要重新识别
+            top, bottom = expand_to_lines([change.revealed], ink)[0]
+            if not self.document.is_covered(top + offset, bottom + offset):
+                ranges.append((top, bottom))
+
+        strips = []
+        for top, bottom in expand_to_lines(ranges, ink):
+            if ink[top:bottom].any():
+                strips.append((top, bottom, top + offset))
+            else:
+                # 变成空白的条带直接清除原来的文本行
+                self.document.replace(top + offset, bottom + offset, [])
+        return change, strips
+
+    def apply(self, strip, lines):
+        """写回一个条带的识别结果，lines为result_lines()的输出（条带内的坐标）"""
+        top, bottom, doc_top = strip
+        self.document.replace(
+            doc_top, doc_top + bottom - top,
+            [(doc_top + line_top, doc_top + line_bottom, text) for line_top, line_bottom, text in lines]
+        )
+
+    def text(self):
+        return self.document.text()